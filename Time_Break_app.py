@@ -2,22 +2,32 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date, time, timezone, timedelta # เพิ่ม time
 import os
-import numpy as np
 import math
 import pathlib
 import base64
+import threading
+from time import monotonic
+from time_log_core import LogFrameIndex, log_frame_to_text, iter_csv_chunks, iter_frame_chunks, spool_chunks
+from log_storage import CSV_COLUMNS, CsvLogStore, SqliteLogStore, empty_log_frame
 
 # -----------------------------------------------------------------
 # กำหนดเส้นทางไฟล์ให้ชี้ไปที่ Desktop (เหมือนเดิม)
 # -----------------------------------------------------------------
 LOGS_DIR = os.path.join(os.path.expanduser('~'), 'Desktop', 'TimeLogs')
+# ไฟล์เดิมแบบไฟล์เดียว (ถ้ายังมีอยู่ จะถูกย้ายเข้า Partition รายเดือนอัตโนมัติตอนเริ่มแอป)
 DATA_FILE = os.path.join(LOGS_DIR, "time_logs.csv")
-
-# -----------------------------------------------------------------
-# 💥 แก้ไข: ชื่อคอลัมน์ใหม่
-# -----------------------------------------------------------------
-CSV_COLUMNS = ['Employee_ID', 'Date', 'Start_Time', 'End_Time', 'Activity_Type', 'Duration_Minutes']
-
+JOURNAL_FILE = os.path.join(LOGS_DIR, "time_logs_journal.csv")
+# 💥 [NEW] ที่เก็บข้อมูล (log_storage): "csv" = ไฟล์ CSV รายเดือน + Journal ใน LOGS_DIR (ค่าเดิม),
+# "sqlite" = ไฟล์ SQLite ในเครื่อง (SQLITE_FILE) — ข้อมูลบน Supabase ใช้แอป Time_app_Break_Supabase_data.py
+LOG_STORAGE_BACKEND = "csv"
+SQLITE_FILE = os.path.join(LOGS_DIR, "time_logs.sqlite3")
+JOURNAL_COMPACT_BYTES = 1024 * 1024 # รวม Journal เข้าไฟล์หลักเมื่อใหญ่เกิน 1 MB
+JOURNAL_COMPACT_INTERVAL_SECONDS = 600 # 💥 [NEW] ตรวจขนาด Journal ทุก 10 นาที (ไม่ใช่ทุก Rerun)
+# 💥 [NEW] หลังเขียน: "write_through" = แก้ DataFrame ใน Cache ตามรายการที่เพิ่งเขียน, "invalidate" = โหลดไฟล์ใหม่
+LOG_CACHE_WRITE_MODE = "write_through"
+RECONCILE_INTERVAL_SECONDS = 600 # โหลด Partition จากไฟล์ใหม่ทั้งหมดอย่างน้อยทุก 10 นาที (กันข้อมูลเพี้ยนสะสม)
+LOG_PAGE_SIZE = 100 # 💥 [NEW] จำนวนแถวต่อหน้าในตารางข้อมูลลงเวลา
+LOG_INDEX_CACHE_SIZE = 8 # 💥 [NEW] จำนวนชุด Partition (ช่วงเดือน) ที่เก็บ LogFrameIndex ไว้ในหน่วยความจำ
 
 # --- CSS (เหมือนเดิม เพิ่มนิดหน่อยสำหรับปุ่มใหม่) ---
 CUSTOM_CSS = """
@@ -56,197 +66,136 @@ div.stButton button:not([kind="primary"]):not([kind="secondary"]):not([kind="sec
 
 # --- 1. ฟังก์ชันจัดการไฟล์ข้อมูล (ปรับปรุงใหม่) ---
 
-@st.cache_data
-def load_data():
-    """โหลดข้อมูลจาก CSV และเตรียม DataFrame สำหรับแสดงผล"""
-    if os.path.exists(DATA_FILE):
-        try:
-            df = pd.read_csv(DATA_FILE)
-            if not df.empty:
-                df['Date'] = pd.to_datetime(df['Date']).dt.date.astype(str)
-                # แปลงเวลาเป็น string เพื่อแสดงผล, จัดการ NaN
-                df['Start_Time'] = df['Start_Time'].astype(str)
-                df['End_Time'] = df['End_Time'].astype(str).replace('nan', np.nan)
-                df['Duration_Minutes'] = pd.to_numeric(df['Duration_Minutes'], errors='coerce') # แปลงเป็นตัวเลข, ถ้า Error ให้เป็น NaN
-            else:
-                 # กรณีไฟล์มีแต่ Header
-                 df = pd.DataFrame(columns=CSV_COLUMNS)
-            
-            # ตรวจสอบคอลัมน์
-            for col in CSV_COLUMNS:
-                 if col not in df.columns:
-                      df[col] = np.nan # เพิ่มคอลัมน์ที่ขาดไป
+@st.cache_resource
+def get_log_store():
+    """💥 [NEW] ที่เก็บ Log ตาม LOG_STORAGE_BACKEND (ตัวเดียวใช้ร่วมกันทุก Session)"""
+    if LOG_STORAGE_BACKEND == "sqlite":
+        return SqliteLogStore(SQLITE_FILE, index_cache_size=LOG_INDEX_CACHE_SIZE)
+    return CsvLogStore(
+        LOGS_DIR, write_mode=LOG_CACHE_WRITE_MODE, reconcile_seconds=RECONCILE_INTERVAL_SECONDS,
+        index_cache_size=LOG_INDEX_CACHE_SIZE, journal_compact_bytes=JOURNAL_COMPACT_BYTES
+    )
 
-            return df.reindex(columns=CSV_COLUMNS) # จัดเรียงและคืนค่า
 
-        except pd.errors.EmptyDataError: # กรณีไฟล์ว่างเปล่า
-             return pd.DataFrame(columns=CSV_COLUMNS)
-        except Exception as e:
-             st.error(f"เกิดข้อผิดพลาดในการโหลดข้อมูล: {e}")
-             return pd.DataFrame(columns=CSV_COLUMNS)
+def load_log_index(date_from, date_to):
+    """💥 [MODIFIED] LogFrameIndex ของข้อมูลที่ทับช่วงวันที่ (frame เรียง Date, Start_Time ล่าสุดก่อน, Index = Row ID)"""
+    try:
+        return get_log_store().load_index(date_from, date_to)
+    except Exception as e:
+        st.error(f"เกิดข้อผิดพลาดในการโหลดข้อมูล: {e}")
+        return LogFrameIndex(empty_log_frame())
 
-    return pd.DataFrame(columns=CSV_COLUMNS)
+
+@st.cache_resource
+def get_storage_maintenance():
+    """💥 [NEW] สถานะงานดูแลที่เก็บ (ใช้ร่วมกันทุก Session ใน Process): เตรียม/ย้ายไฟล์เดิมแล้วหรือยัง, เวลารวม Journal ล่าสุด"""
+    return {"lock": threading.Lock(), "prepared": False, "migrated": False, "compacted_at": None}
 
 
 def initialize_data_file():
-    """สร้างโฟลเดอร์และไฟล์ CSV หากยังไม่มี"""
-    try:
-        pathlib.Path(LOGS_DIR).mkdir(parents=True, exist_ok=True)
-    except OSError as e:
-        st.error(f"ไม่สามารถสร้างโฟลเดอร์ได้: {LOGS_DIR}. โปรดตรวจสอบสิทธิ์การเข้าถึง.")
-        st.stop()
+    """💥 [MODIFIED] สร้างที่เก็บข้อมูล (CSV: ย้ายไฟล์เดิมเข้า Partition และรวม Journal ที่ใหญ่เกินกำหนด)
+
+    เตรียมที่เก็บ/ย้ายไฟล์เดิมครั้งเดียวต่อ Process (ถ้าล้มเหลวจะลองใหม่ในรอบถัดไป)
+    และรวม Journal อย่างมากทุก JOURNAL_COMPACT_INTERVAL_SECONDS — Rerun ปกติไม่แตะไฟล์เลย
+    """
+    store = get_log_store()
+    state = get_storage_maintenance()
+    with state["lock"]:
+        if not state["prepared"]:
+            try:
+                if isinstance(store, CsvLogStore):
+                    pathlib.Path(LOGS_DIR).mkdir(parents=True, exist_ok=True)
+                store.prepare()
+            except OSError as e:
+                st.error(f"ไม่สามารถสร้างโฟลเดอร์ได้: {LOGS_DIR}. โปรดตรวจสอบสิทธิ์การเข้าถึง.")
+                st.stop()
+            except Exception as e:
+                st.error(f"ไม่สามารถเตรียมที่เก็บข้อมูลได้ ({store.location}): {e}")
+                st.stop()
+            state["prepared"] = True
 
-    if not os.path.exists(DATA_FILE):
-        df = pd.DataFrame(columns=CSV_COLUMNS)
-        df.to_csv(DATA_FILE, index=False)
-        st.info(f"สร้างไฟล์ {DATA_FILE} เรียบร้อยแล้ว")
+        if not isinstance(store, CsvLogStore):
+            return
+        if not state["migrated"]:
+            state["migrated"] = migrate_legacy_data_file(store)
+        now = monotonic()
+        if state["compacted_at"] is None or now - state["compacted_at"] >= JOURNAL_COMPACT_INTERVAL_SECONDS:
+            state["compacted_at"] = now
+            compact_journal(store)
 
 
-def save_data(df):
-    """บันทึก DataFrame ลงในไฟล์ CSV"""
+def migrate_legacy_data_file(store):
+    """💥 [NEW] ย้ายข้อมูลจากไฟล์เดิม (time_logs.csv + Journal) เข้า Partition รายเดือน คืน False ถ้าล้มเหลว"""
     try:
-        # ตรวจสอบให้แน่ใจว่ามีทุกคอลัมน์ก่อนบันทึก
-        for col in CSV_COLUMNS:
-            if col not in df.columns:
-                df[col] = np.nan
-        df = df[CSV_COLUMNS] # จัดเรียงคอลัมน์ให้ตรง
-        df.to_csv(DATA_FILE, index=False)
-        st.cache_data.clear() # ล้าง Cache เพื่อโหลดข้อมูลใหม่
+        if store.migrate_legacy_file(DATA_FILE, JOURNAL_FILE):
+            st.info(f"ย้ายข้อมูลจาก {DATA_FILE} เข้าไฟล์รายเดือนเรียบร้อยแล้ว")
     except Exception as e:
-        st.error(f"เกิดข้อผิดพลาดในการบันทึกข้อมูล: {e}")
-
-# 💥 NEW: ฟังก์ชันคำนวณ Duration (ย้ายมาไว้ตรงนี้)
-def calculate_duration(start_time_str, end_time_str):
-    """คำนวณระยะเวลาเป็นนาที"""
-    try:
-        if pd.isnull(start_time_str) or pd.isnull(end_time_str) or str(start_time_str).lower() == 'nan' or str(end_time_str).lower() == 'nan':
-            return np.nan
-
-        date_time_format = '%H:%M:%S'
-        base_date = datetime(2000, 1, 1)
-
-        t_start_time = datetime.strptime(str(start_time_str), date_time_format).time()
-        t_end_time = datetime.strptime(str(end_time_str), date_time_format).time()
+        st.error(f"เกิดข้อผิดพลาดในการย้ายข้อมูลเดิม: {e}")
+        return False
+    return True
 
-        t_start = datetime.combine(base_date, t_start_time)
-        t_end = datetime.combine(base_date, t_end_time)
 
-        if t_end < t_start:
-            t_end += pd.Timedelta(days=1)
+def compact_journal(store):
+    """💥 [NEW] รวม Journal เข้าไฟล์หลัก สำหรับ Partition ที่ Journal ใหญ่เกิน JOURNAL_COMPACT_BYTES"""
+    for key in store.partition_keys():
+        try:
+            store.compact_partition(key)
+        except Exception as e:
+            st.error(f"เกิดข้อผิดพลาดในการรวม Journal ({key}): {e}")
 
-        duration_minutes = (t_end - t_start).total_seconds() / 60
-        return max(0, duration_minutes)
-    except (ValueError, TypeError, AttributeError):
-        return np.nan
 
 # 💥 NEW: ฟังก์ชัน Clock Out กิจกรรมล่าสุด
 def clock_out_latest_activity(employee_id, date_str, end_time_str):
     """ค้นหาและ Clock Out กิจกรรมล่าสุดที่ยังเปิดอยู่"""
-    df = load_data() # โหลดข้อมูลล่าสุด
-    
-    # Filter หากิจกรรมของพนักงานคนนี้ในวันนี้ที่ยังไม่มี End_Time
-    condition = (df['Employee_ID'] == employee_id) & \
-                (df['Date'] == date_str) & \
-                (df['End_Time'].isna() | (df['End_Time'].astype(str).str.lower() == 'nan') | (df['End_Time'] == ''))
-                
-    ongoing_activities = df[condition]
-
-    if not ongoing_activities.empty:
-        # หากิจกรรมล่าสุด (index สูงสุด)
-        index_to_update = ongoing_activities.index.max()
-        
-        # อัปเดต End_Time
-        df.loc[index_to_update, 'End_Time'] = end_time_str
-        
-        # คำนวณและอัปเดต Duration
-        start_time = df.loc[index_to_update, 'Start_Time']
-        duration = calculate_duration(start_time, end_time_str)
-        df.loc[index_to_update, 'Duration_Minutes'] = duration
-        
-        save_data(df)
-        return True # Clock Out สำเร็จ
-    return False # ไม่มีกิจกรรมที่ต้อง Clock Out
+    try:
+        return get_log_store().clock_out_latest(employee_id, date_str, end_time_str)
+    except Exception as e:
+        st.error(f"เกิดข้อผิดพลาดในการสิ้นสุดกิจกรรม: {e}")
+        return False
 
 # 💥 NEW: ฟังก์ชันเริ่มกิจกรรมใหม่ (รวม Clock Out อันเก่า)
 def log_activity_start(employee_id, date_str, start_time_str, activity_type):
     """บันทึกการเริ่มกิจกรรมใหม่ และ Clock Out กิจกรรมเดิม (ถ้ามี)"""
     try:
-        # 1. Clock Out กิจกรรมเดิมก่อน
-        clock_out_latest_activity(employee_id, date_str, start_time_str) # ใชเวลาเริ่มใหม่เป็นเวลาจบของอันเก่า
-
-        # 2. โหลดข้อมูลล่าสุด (อาจมีการเปลี่ยนแปลงจากการ Clock Out)
-        df = load_data()
-
-        # 3. สร้างแถวใหม่สำหรับกิจกรรมนี้
-        new_row = pd.DataFrame([{
-            'Employee_ID': employee_id,
-            'Date': date_str,
-            'Start_Time': start_time_str,
-            'End_Time': np.nan,
-            'Activity_Type': activity_type,
-            'Duration_Minutes': np.nan
-        }])
-
-        # 4. บันทึกข้อมูล
-        df_to_save = pd.concat([df, new_row], ignore_index=True)
-        save_data(df_to_save)
+        get_log_store().start_activity(employee_id, date_str, start_time_str, activity_type)
         return True
     except Exception as e:
         st.error(f"เกิดข้อผิดพลาดในการเริ่มกิจกรรม {activity_type}: {e}")
         return False
 
 
-def delete_log_entry(original_index):
-    """ลบ Log ตาม Index เดิม"""
-    df = load_data()
-    if original_index in df.index:
-        df = df.drop(index=original_index)
-        save_data(df)
-    else:
-        st.warning(f"ไม่พบ Index {original_index} ที่จะลบ")
+def delete_log_entries(row_ids):
+    """💥 [MODIFIED] ลบหลาย Log พร้อมกัน (CSV: เขียน Journal 1 ครั้งต่อ Partition, SQL: 1 Transaction)"""
+    try:
+        deleted = set(get_log_store().delete_entries(row_ids))
+    except Exception as e:
+        st.error(f"เกิดข้อผิดพลาดในการลบข้อมูล: {e}")
+        return
+    missing = [str(row_id) for row_id in row_ids if row_id not in deleted]
+    if missing:
+        st.warning(f"ไม่พบ Index {', '.join(missing)} ที่จะลบ")
 
 
-# --- 2. ฟังก์ชันคำนวณและแสดงผล ---
+def delete_selected_logs(row_ids, table_key):
+    """💥 [NEW] ปุ่ม "ลบรายการที่เลือก": ลบแล้วล้างการเลือกของตาราง (ตำแหน่งแถวเดิมไม่ตรงกับข้อมูลใหม่)"""
+    delete_log_entries(row_ids)
+    st.session_state.pop(table_key, None)
 
-def format_time_display(time_str):
-    """จัดรูปแบบเวลาเป็น HH:MM"""
-    if pd.isnull(time_str) or str(time_str).lower() == 'nan':
-        return "N/A"
-    try:
-        # ลองแปลงจาก HH:MM:SS
-        return datetime.strptime(str(time_str), '%H:%M:%S').strftime('%H:%M')
-    except (ValueError, TypeError):
-        # ถ้า Error อาจเป็น HH:MM อยู่แล้ว หรือรูปแบบอื่น
-        return str(time_str).split('.')[0] # ตัด .0 ถ้ามี
-
-def format_duration(minutes):
-    """จัดรูปแบบนาทีเป็น HH:MM"""
-    if pd.isnull(minutes) or (isinstance(minutes, float) and math.isnan(minutes)):
-        return "N/A"
-    try:
-        minutes = int(float(minutes)) # แปลงเป็น float ก่อน เผื่อเป็น string "120.0"
-    except (ValueError, TypeError):
-        return "N/A" # ถ้าแปลงไม่ได้
 
-    if minutes < 0:
-        return "00:00"
+# --- 2. ฟังก์ชันคำนวณและแสดงผล ---
+
+# 💥 [MODIFIED] จัดรูปแบบเวลา/ระยะเวลาเป็นข้อความทั้งคอลัมน์ในครั้งเดียว (add_display_columns ใน time_log_core)
+# ตอนโหลด/แพตช์ Partition แทนการเรียก format_time_display / format_duration ทีละช่องตอนแสดงผล
 
-    hours = int(minutes // 60)
-    mins = int(minutes % 60)
-    return f"{hours:02d}:{mins:02d}"
 
+# ฟังก์ชันสร้างลิงก์ดาวน์โหลด
+def export_csv_file(df_to_download):
+    """💥 [MODIFIED] สร้างไฟล์ CSV (BOM 1 ครั้ง) ของแถวที่กรองแล้ว — เรียกเมื่อกดปุ่มดาวน์โหลดเท่านั้น
 
-# ฟังก์ชันสร้างลิงก์ดาวน์โหลด (เหมือนเดิม)
-def get_csv_content_with_bom(data_file_path):
-    # ... (โค้ดเดิม) ...
-    try:
-        with open(data_file_path, "r", encoding='utf-8') as f:
-            csv_content = f.read()
-        bom = "\ufeff"
-        content_with_bom = bom + csv_content
-        return content_with_bom
-    except FileNotFoundError: return None
-    except Exception as e: return None
+    ใช้เป็น data (callable) ของ st.download_button จึงรันบน Thread แยก (คำสั่ง st ในนี้จะถูกละเว้น)
+    แปลงเป็นข้อความทีละก้อนแล้วเขียนลงไฟล์ชั่วคราว ไม่สร้างข้อความของทั้งไฟล์ในหน่วยความจำ
+    """
+    return spool_chunks(iter_csv_chunks(iter_frame_chunks(df_to_download), CSV_COLUMNS, log_frame_to_text))
 
 # --- 3. ส่วนหน้าเว็บ (UI) ---
 
@@ -257,8 +206,7 @@ st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 # --- 3.1 การเริ่มต้นไฟล์ข้อมูล ---
 initialize_data_file()
 
-# --- 3.2 โหลดข้อมูล ---
-df = load_data() # df ที่โหลดมาตอนนี้มีคอลัมน์ครบตาม CSV_COLUMNS
+# --- 3.2 💥 [MOVED] โหลดข้อมูลย้ายไปหลังส่วน Filter (โหลดเฉพาะเดือนที่ทับช่วงวันที่ที่เลือก) ---
 
 
 # -----------------------------------------------------------------
@@ -268,7 +216,7 @@ header_col1, header_col2 = st.columns([1.5, 1])
 
 with header_col1:
     st.title("ระบบบันทึกเวลากิจกรรม")
-    st.markdown(f"**บันทึกข้อมูลที่:** `{LOGS_DIR}`")
+    st.markdown(f"**บันทึกข้อมูลที่:** `{get_log_store().location}`")
 
 
 with header_col2:
@@ -367,92 +315,71 @@ filter_date_to = col_filter2.date_input(
     key="date_to_key"
 )
 
-unique_ids = ["All"]
-if not df.empty and 'Employee_ID' in df.columns:
-    unique_ids += sorted(df['Employee_ID'].dropna().unique())
+if filter_date_from and filter_date_to and filter_date_from > filter_date_to:
+    st.error("วันที่ From ต้องไม่เกินวันที่ To กรุณาแก้ไข")
+    st.stop()
+
+# 💥 [MODIFIED] ดัชนีของ Partition ที่ทับช่วงวันที่ (สร้างครั้งเดียวต่อการเปลี่ยนแปลงข้อมูล ไม่ใช่ทุก rerun)
+log_index = load_log_index(filter_date_from, filter_date_to)
+df = log_index.frame # คอลัมน์ครบตาม CSV_COLUMNS, Index = Row ID
+
+unique_ids = ["All"] + log_index.employee_ids
 filter_id = col_filter3.selectbox("กรองตาม Employee ID", options=unique_ids, key="id_filter_key")
 
+# 💥 [MODIFIED] กรองด้วย binary search บนวันที่ที่เรียงไว้แล้ว (ได้ slice ไม่ต้อง copy / sort ทุก rerun)
+# ผลลัพธ์เรียงตามวันที่และเวลาล่าสุดก่อนอยู่แล้ว, Index = Row ID ใช้ตอนลบ
+display_df = log_index.select(filter_date_from, filter_date_to, None if filter_id == "All" else filter_id)
+
 # --- สร้างตารางแสดงผล ---
 if df.empty:
     st.info("ยังไม่มีข้อมูลการลงเวลา")
 else:
-    display_df = df.copy()
-    display_df['Original_Index'] = display_df.index # เก็บ Index เดิมไว้เสมอ
-
-    # แปลง Date เป็น Object เพื่อ Filter
-    display_df['Date_Obj'] = pd.to_datetime(display_df['Date']).dt.date
-
-    # Logic การกรอง
-    if filter_date_from and filter_date_to:
-        if filter_date_from <= filter_date_to:
-            display_df = display_df[
-                (display_df['Date_Obj'] >= filter_date_from) &
-                (display_df['Date_Obj'] <= filter_date_to)
-            ]
-        else:
-            st.error("วันที่ From ต้องไม่เกินวันที่ To กรุณาแก้ไข")
-            st.stop()
-
-    if filter_id != "All":
-        display_df = display_df[display_df['Employee_ID'] == filter_id]
-
     if display_df.empty:
         st.info("ไม่พบข้อมูลการลงเวลาตามตัวกรองที่เลือก")
         st.stop()
 
-    display_df = display_df.drop(columns=['Date_Obj'], errors='ignore')
-
-    # จัดเรียงข้อมูลตามวันที่และเวลาล่าสุดก่อนแสดงผล
-    display_df = display_df.sort_values(by=['Date', 'Start_Time'], ascending=[False, False])
-
-    display_df = display_df.reset_index(drop=True) # Reset index สำหรับการแสดงผล
-
-    # --- ส่วนหัวตาราง ---
-    # 💥 แก้ไข: ปรับเป็น 7 คอลัมน์ [ลบ, ID, Date, Activity, Start, End, Duration]
-    col_ratios = [0.5, 1, 1, 1.2, 1, 1, 1.3]
-    cols = st.columns(col_ratios)
-
-    # 💥 แก้ไข Header
-    headers = ["ลบ", "Employee ID", "Date", "ประเภทกิจกรรม", "เวลาเริ่ม", "เวลาสิ้นสุด", "**ระยะเวลา**"]
-    for col, header in zip(cols, headers):
-        col.markdown(f"**{header}**")
-    st.markdown("---")
-
-    # --- วนลูปแสดงข้อมูล ---
-    for index, row in display_df.iterrows(): # ใช้ index จาก display_df ที่ reset แล้ว
-        # ใช้ Original_Index ที่เก็บไว้ในการอ้างอิงข้อมูลเดิม
-        original_index = row['Original_Index']
-
-        cols = st.columns(col_ratios)
-        time_style = "class='time-display'"
-
-        # คอลัมน์ 0: ปุ่มลบ
-        if cols[0].button(
-            "❌",
-            key=f"del_{original_index}_{index}", # เพิ่ม index เพื่อให้ key ไม่ซ้ำ
-            on_click=delete_log_entry,
-            args=(original_index,), # ส่ง Original Index ไปลบ
-            help="ลบ Log ลงเวลานี้"
-        ):
-             st.rerun()
-
-        # คอลัมน์ 1 - 2: ข้อมูลมาตรฐาน (ID, Date)
-        cols[1].write(row['Employee_ID'])
-        cols[2].write(row['Date'])
-
-        # 💥 คอลัมน์ 3: ประเภทกิจกรรม
-        cols[3].write(row['Activity_Type'])
-
-        # คอลัมน์ 4: เวลาเริ่ม (Start Time)
-        cols[4].markdown(f"<p {time_style}>{format_time_display(row['Start_Time'])}</p>", unsafe_allow_html=True)
-
-        # คอลัมน์ 5: เวลาสิ้นสุด (End Time)
-        end_time_display = format_time_display(row['End_Time'])
-        cols[5].markdown(f"<p {time_style}>{end_time_display}</p>", unsafe_allow_html=True)
-
-        # คอลัมน์ 6: ระยะเวลา (Duration)
-        duration_display = format_duration(row['Duration_Minutes'])
-        cols[6].markdown(f"<p {time_style}>{duration_display}</p>", unsafe_allow_html=True)
+    # --- 💥 [MODIFIED] ตารางเดียว (st.dataframe) แบ่งหน้า + เลือกแถวเพื่อลบ แทนการสร้าง Widget ทีละแถว ---
+    # เวลา Render ขึ้นกับ LOG_PAGE_SIZE ไม่ใช่จำนวนแถวทั้งหมดที่กรองได้
+    total_rows = len(display_df)
+    page_count = max(1, math.ceil(total_rows / LOG_PAGE_SIZE))
+    if st.session_state.get("log_page_key", 1) > page_count: # Filter เปลี่ยนจนจำนวนหน้าลดลง
+        st.session_state.log_page_key = page_count
+    page = st.number_input(
+        f"หน้า (ทั้งหมด {page_count} หน้า, {total_rows} รายการ)",
+        min_value=1, max_value=page_count, value=1, step=1,
+        key="log_page_key"
+    )
+    page_df = display_df.iloc[(page - 1) * LOG_PAGE_SIZE : page * LOG_PAGE_SIZE]
+
+    # ข้อความสำหรับแสดงผลถูกเตรียมไว้แล้วตอนโหลดข้อมูล (DISPLAY_COLUMNS)
+    view_df = pd.DataFrame({
+        "Employee ID": page_df['Employee_ID'],
+        "Date": page_df['Date'].dt.strftime('%Y-%m-%d'),
+        "ประเภทกิจกรรม": page_df['Activity_Type'],
+        "เวลาเริ่ม": page_df['Start_Time_Display'],
+        "เวลาสิ้นสุด": page_df['End_Time_Display'],
+        "ระยะเวลา": page_df['Duration_Display'],
+    })
+
+    # Key ผูกกับ Filter + หน้า เพื่อไม่ให้การเลือกแถวค้างไปใช้กับข้อมูลชุดอื่น
+    table_key = f"log_table_{filter_date_from}_{filter_date_to}_{filter_id}_{page}"
+    table_event = st.dataframe(
+        view_df,
+        hide_index=True,
+        width="stretch",
+        on_select="rerun",
+        selection_mode="multi-row",
+        key=table_key
+    )
+    selected_ids = page_df.index[table_event.selection.rows].tolist()
+    st.button(
+        f"❌ ลบรายการที่เลือก ({len(selected_ids)})",
+        key="delete_selected_key",
+        disabled=not selected_ids,
+        on_click=delete_selected_logs,
+        args=(selected_ids, table_key),
+        help="เลือกแถวในตาราง (ช่องด้านซ้าย) แล้วกดเพื่อลบ Log ลงเวลา"
+    )
 
     st.markdown("---")
 
@@ -461,24 +388,25 @@ else:
 # -----------------------------------------------------------------
 st.subheader("ดาวน์โหลดข้อมูล")
 
-csv_data = get_csv_content_with_bom(DATA_FILE)
-
-if csv_data:
-    st.download_button(
-        label="Download Log File (.csv)",
-        data=csv_data,
-        file_name=os.path.basename(DATA_FILE),
-        mime="text/csv",
-        key="download_button_key"
-    )
+# 💥 [MODIFIED] ไฟล์มีเฉพาะแถวตาม Filter (ช่วงวันที่ + Employee ID) และสร้างเมื่อกดปุ่มเท่านั้น
+# (rerun ปกติไม่ต้องแปลงข้อมูลเป็น CSV)
+st.download_button(
+    label="Download Log File (.csv)",
+    data=lambda: export_csv_file(display_df),
+    file_name=f"time_logs_{filter_date_from}_{filter_date_to}.csv",
+    mime="text/csv",
+    key="download_button_key"
+)
 
 # (Optional) ส่วนแสดงข้อมูลดิบ
-with st.expander(f"ดูข้อมูลดิบ (Raw Data from: {DATA_FILE})"):
-    # 💥 โหลดไฟล์ดิบมาแสดงผล
+with st.expander(f"ดูข้อมูลดิบ (Raw Data from: {get_log_store().location})"):
+    # 💥 [MODIFIED] ข้อมูลดิบของช่วงวันที่ที่เลือกจากที่เก็บข้อมูล (CSV: ไฟล์หลัก + Journal ของแต่ละเดือน)
     try:
-        raw_df_display = pd.read_csv(DATA_FILE)
-        st.dataframe(raw_df_display)
-    except FileNotFoundError:
-        st.warning("ยังไม่มีไฟล์ข้อมูล")
+        raw_frames = get_log_store().raw_frames(filter_date_from, filter_date_to)
+        if not raw_frames:
+            st.warning("ยังไม่มีไฟล์ข้อมูล")
+        for label, raw_df in raw_frames:
+            st.caption(label)
+            st.dataframe(raw_df)
     except Exception as e:
         st.error(f"ไม่สามารถโหลดข้อมูลดิบได้: {e}")
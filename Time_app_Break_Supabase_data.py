@@ -2,15 +2,174 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date, time, timezone, timedelta
 import numpy as np
-import math
+import os
+import re
+import tempfile
+import threading
+from time import monotonic, time_ns
 from streamlit.connections import SQLConnection
 from streamlit_qrcode_scanner import qrcode_scanner
 from sqlalchemy import text # 💥 [FIX 1/5] เพิ่มการ import นี้
+from sqlalchemy.exc import InterfaceError, OperationalError
+from time_log_core import (
+    OpenActivityIndex, EmployeeDirectory, TableGenerations, LogFrameIndex, TIME_MISSING, sort_for_display,
+    add_display_columns, compact_log_frame, concat_log_frames, upsert_log_rows, log_frame_to_text, time_to_seconds,
+    EXPORT_CHUNK_ROWS, CSV_BOM, iter_csv_chunks, iter_frame_chunks, spool_chunks, WriteAheadQueue, WriteCoalescer,
+    KeyedExecutor
+)
 
 # -----------------------------------------------------------------
 # 💥 [MODIFIED] ชื่อคอลัมน์ใน DB (id คือ PK ที่เพิ่มมา)
 DB_COLUMNS = ['id', 'Employee_ID', 'Date', 'Start_Time', 'End_Time', 'Activity_Type', 'Duration_Minutes']
+EXPORT_COLUMNS = DB_COLUMNS + ['Employee_Name', 'Employee_Surname'] # 💥 [NEW] คอลัมน์ของไฟล์ดาวน์โหลด
+# 💥 [NEW] โหลดดัชนีกิจกรรมที่เปิดอยู่ของแต่ละวันใหม่ทุก ๆ 5 นาที (รับการเปลี่ยนแปลงจาก Process อื่น)
+OPEN_INDEX_MAX_AGE = 300
+# 💥 [NEW] โหลดรายชื่อพนักงาน (user_data) ใหม่ทุก ๆ 10 นาที (รับการแก้ไขจาก Process อื่น)
+USER_DIRECTORY_MAX_AGE = 600
+
+# 💥 [NEW] Clock Out แบบ atomic ใน 1 คำสั่ง: หาแถวล่าสุดที่ยังเปิดอยู่ + ล็อกแถว + ตั้ง End_Time
+# + คำนวณ Duration ฝั่ง Postgres (ข้ามเที่ยงคืน = +1 วัน เหมือน calculate_duration_batch) แล้วคืนแถวที่ปิด
+# (FOR UPDATE + เงื่อนไข "End_Time" IS NULL กันสองเครื่องปิดแถวเดียวกันซ้ำ)
+# 💥 [MODIFIED] {end_time} = นิพจน์ SQL ของเวลาจบ (คอลัมน์ของแต่ละรายการใน SQL_ACTIVITY_BATCH)
+SQL_DURATION_MINUTES = """
+MOD(CAST(EXTRACT(EPOCH FROM ({end_time} - t."Start_Time")) AS numeric) + 86400, 86400) / 60
+"""
+# -----------------------------------------------------------------
+# 💥 [NEW] Delta sync: เก็บ time_logs ช่วง HOT_WINDOW_DAYS วันล่าสุด (แปลงประเภทแล้ว) ไว้ในหน่วยความจำ
+# แล้วดึงเฉพาะแถวที่เปลี่ยนตั้งแต่ watermark (updated_at) + แถวที่ถูกลบ (time_logs_tombstones)
+# -----------------------------------------------------------------
+LOG_SYNC_MODE = "delta" # "delta" = ซิงก์เฉพาะส่วนที่เปลี่ยน, "full" = โหลดจาก SQL ทุกครั้งที่ Cache หมดอายุ
+HOT_WINDOW_DAYS = 35 # ครอบคลุม Filter ค่าเริ่มต้น (30 วันล่าสุด)
+SYNC_MIN_INTERVAL_SECONDS = 5 # ถามหาการเปลี่ยนแปลงอย่างมากทุก 5 วินาที
+SYNC_OVERLAP = timedelta(seconds=10) # ดึงย้อนหลังเผื่อ Transaction ที่ commit ช้ากว่า timestamp ของมัน
+# 💥 [NEW] หลังเขียน: "write_through" = แก้ frame ในหน่วยความจำตามแถวที่เพิ่งเขียน, "invalidate" = ถาม DB ใหม่
+LOG_CACHE_WRITE_MODE = "write_through"
+RECONCILE_INTERVAL_SECONDS = 600 # โหลดช่วงวันล่าสุดใหม่ทั้งหมดอย่างน้อยทุก 10 นาที (กันข้อมูลเพี้ยนสะสม)
+LOG_PAGE_SIZE = 100 # 💥 [NEW] จำนวนแถวต่อหน้าในตารางข้อมูลลงเวลา
+# 💥 [NEW] ไฟล์ดาวน์โหลด: "copy" = Postgres สร้าง CSV เอง (COPY ... TO STDOUT) แล้วส่งตรงลงไฟล์ชั่วคราว,
+# "pandas" = แปลงทีละก้อนใน pandas (ช่วงวันล่าสุดใช้ข้อมูลจาก Delta sync)
+LOG_EXPORT_MODE = "copy"
+# 💥 [NEW] การบันทึกเวลา: "queue" = บันทึกลงคิวในเครื่อง (SQLite) แล้วตอบผู้ใช้ทันที Thread เบื้องหลังส่งเข้า Supabase
+# เป็นชุด (ฐานข้อมูลช้า/ล่มก็ไม่ทำให้ Kiosk ค้างหรือข้อมูลหาย), "direct" = เขียนเข้า Supabase ระหว่างกดปุ่ม (แบบเดิม)
+LOG_WRITE_MODE = "queue"
+WRITE_QUEUE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "time_log_queue.sqlite3")
+WRITE_QUEUE_BATCH_SIZE = 100
+# 💥 [NEW] โหมด "direct": รวมการกดปุ่มจากทุก Session ที่เข้ามาภายใน 20 ms เป็นคำสั่งหลายแถว ใน 1 Transaction
+WRITE_COALESCE_SECONDS = 0.02
+WRITE_RESULT_TIMEOUT_SECONDS = 30 # รอผลการเขียนจาก WriteCoalescer นานสุด (กันหน้าแอปค้างเมื่อ DB ไม่ตอบ)
+# 💥 [NEW] ปุ่มบันทึกเวลา: "async" = ตอบทันที (⏳ กำลังบันทึก) แล้วเขียนใน Thread pool และแจ้งผลในรอบถัดไป,
+# "sync" = รอจนเขียนเสร็จภายใน Callback ของปุ่ม (แบบเดิม)
+SUBMIT_MODE = "async"
+SUBMIT_WORKERS = 4 # ID ต่างกันบันทึกพร้อมกันได้ ส่วนงานของ ID เดียวกันรันตามลำดับที่กด (KeyedExecutor)
+SUBMIT_POLL_SECONDS = 0.5 # ตรวจผลของงานที่ยังไม่เสร็จทุก 0.5 วินาที
+
+# 💥 [MODIFIED] คอลัมน์ updated_at + ตาราง time_logs_tombstones + Trigger ที่ Delta sync ต้องใช้ และตาราง time_log_events
+# ของคิวเขียนล่วงหน้า สร้างด้วย Migration ครั้งเดียว (ไฟล์ด้านล่าง รันด้วย psql) — แอปตรวจแค่ว่ามีครบหรือยัง
+# ทุก SYNC_SCHEMA_CHECK_SECONDS วินาที
+SYNC_SCHEMA_MIGRATION = "migrations/time_logs_delta_sync.sql"
+SYNC_SCHEMA_CHECK_SECONDS = 300
+SQL_SYNC_SCHEMA_CHECK = """
+SELECT EXISTS (
+           SELECT 1 FROM information_schema.columns
+           WHERE table_schema = current_schema() AND table_name = 'time_logs' AND column_name = 'updated_at'
+       )
+   AND to_regclass('time_logs_tombstones') IS NOT NULL
+   AND (SELECT count(*) FROM pg_trigger
+        WHERE tgrelid = to_regclass('time_logs') AND tgname IN ('time_logs_touch', 'time_logs_tombstone')) = 2
+"""
 
+# 💥 [NEW] idempotency key ของ event จากคิว: บันทึกใน Transaction เดียวกับการเขียน event ที่ถูกส่งซ้ำจึงถูกข้าม
+SQL_EVENT_SCHEMA_CHECK = "SELECT to_regclass('time_log_events') IS NOT NULL"
+SQL_CLAIM_EVENTS = """
+INSERT INTO time_log_events (event_id) SELECT unnest(CAST(:event_ids AS text[]))
+ON CONFLICT (event_id) DO NOTHING
+RETURNING event_id
+"""
+
+# 💥 [NEW] ระยะเก็บแถวของตารางที่ใช้ซิงก์ (ลบแถวที่เก่ากว่านี้ทุก SYNC_RETENTION_CHECK_SECONDS วินาที)
+# tombstone: Delta sync อ่านย้อนหลังไม่เกิน RECONCILE_INTERVAL_SECONDS + SYNC_OVERLAP (นานกว่านั้นโหลดเต็มแทน)
+TOMBSTONE_RETENTION = timedelta(seconds=2 * RECONCILE_INTERVAL_SECONDS)
+# event_id: ต้องนานกว่าที่ event ที่เขียนแล้วอาจถูกส่งซ้ำ (เช่น แอปดับก่อนลบออกจากคิวในเครื่อง แล้วเปิดใหม่ภายหลัง)
+EVENT_RETENTION = timedelta(days=7)
+SYNC_RETENTION_CHECK_SECONDS = RECONCILE_INTERVAL_SECONDS
+SQL_PRUNE_SYNC_TABLES = {
+    "time_logs_tombstones": ("DELETE FROM time_logs_tombstones WHERE deleted_at < clock_timestamp() - :retention",
+                             TOMBSTONE_RETENTION),
+    "time_log_events": ("DELETE FROM time_log_events WHERE applied_at < clock_timestamp() - :retention",
+                        EVENT_RETENTION),
+}
+
+SQL_SELECT_LOGS = """
+SELECT id, "Employee_ID", "Date", "Start_Time", "End_Time", "Activity_Type", "Duration_Minutes"
+FROM time_logs
+"""
+# 💥 [NEW] ลำดับการแสดงผล (id ใช้ตัดสินเมื่อวันและเวลาเริ่มเท่ากัน ให้ Keyset cursor ไม่ข้าม/ซ้ำแถว)
+SQL_LOG_ORDER = 'ORDER BY "Date" DESC, "Start_Time" DESC, id DESC'
+SQL_KEYSET_AFTER = '("Date", "Start_Time", id) < (CAST(:after_date AS date), CAST(:after_time AS time), :after_id)'
+
+# 💥 [NEW] ไฟล์ดาวน์โหลดแบบ COPY: time_logs ตาม Filter + ชื่อจาก user_data (คอลัมน์ตาม EXPORT_COLUMNS)
+# {where} = เงื่อนไขจาก _log_filter_sql (แปลงพารามิเตอร์เป็นค่าจริงด้วย mogrify เพราะ COPY รับ bind parameter ไม่ได้)
+SQL_EXPORT_LOGS = """
+SELECT t.id, t."Employee_ID", t."Date",
+       to_char(t."Start_Time", 'HH24:MI:SS') AS "Start_Time", to_char(t."End_Time", 'HH24:MI:SS') AS "End_Time",
+       t."Activity_Type", t."Duration_Minutes",
+       COALESCE(u."Employee_Name", '') AS "Employee_Name", COALESCE(u."Employee_Surname", '') AS "Employee_Surname"
+FROM (SELECT * FROM time_logs WHERE {where}) AS t
+LEFT JOIN user_data AS u ON u."Employee_ID" = t."Employee_ID"
+ORDER BY t."Date" DESC, t."Start_Time" DESC, t.id DESC
+"""
+
+# 💥 [MODIFIED] เริ่ม/ปิดกิจกรรมหลายรายการในคำสั่งเดียว (WriteCoalescer และคิวเขียนล่วงหน้า)
+# req 1 แถว = 1 รายการ: Activity_Type ว่าง = Clock Out อย่างเดียว, มีค่า = ปิดกิจกรรมเดิม + INSERT แถวใหม่
+# register = ID ที่ยังไม่อยู่ใน EmployeeDirectory (ต้อง INSERT ... ON CONFLICT ลง user_data)
+# ในหนึ่งคำสั่ง (Employee_ID, Date) ต้องไม่ซ้ำกัน (data-modifying CTE ทุกตัวเห็น snapshot เดียวกัน
+# จึงไม่ปิดแถวที่เพิ่ง INSERT) — รายการซ้ำถูกแยกไปคำสั่งถัดไปใน _execute_activity_batch
+SQL_ACTIVITY_BATCH = f"""
+WITH req AS (
+    SELECT * FROM unnest(
+        CAST(:ords AS int[]), CAST(:employee_ids AS text[]), CAST(:dates AS date[]),
+        CAST(:times AS time[]), CAST(:activity_types AS text[]), CAST(:register AS boolean[])
+    ) AS r(ord, "Employee_ID", "Date", at_time, "Activity_Type", register)
+),
+target AS (
+    SELECT req.ord, req.at_time, latest.id FROM req
+    CROSS JOIN LATERAL (
+        SELECT id FROM time_logs
+        WHERE "Employee_ID" = req."Employee_ID" AND "Date" = req."Date" AND "End_Time" IS NULL
+        ORDER BY "Start_Time" DESC
+        LIMIT 1
+        FOR UPDATE
+    ) AS latest
+),
+closed AS (
+    UPDATE time_logs AS t
+    SET "End_Time" = target.at_time, "Duration_Minutes" = {SQL_DURATION_MINUTES.format(end_time="target.at_time")}
+    FROM target
+    WHERE t.id = target.id AND t."End_Time" IS NULL
+    RETURNING target.ord, t.id, t."Duration_Minutes"
+),
+inserted AS (
+    INSERT INTO time_logs
+    ("Employee_ID", "Date", "Start_Time", "End_Time", "Activity_Type", "Duration_Minutes")
+    SELECT "Employee_ID", "Date", at_time, NULL, "Activity_Type", NULL FROM req
+    WHERE "Activity_Type" IS NOT NULL
+    ORDER BY ord
+    RETURNING id, "Employee_ID", "Date"
+),
+registered AS (
+    INSERT INTO user_data ("Employee_ID")
+    SELECT DISTINCT "Employee_ID" FROM req WHERE register
+    ON CONFLICT ("Employee_ID") DO NOTHING
+    RETURNING "Employee_ID"
+)
+SELECT req.ord, inserted.id AS new_id, closed.id AS closed_id, closed."Duration_Minutes" AS closed_duration,
+       registered."Employee_ID" IS NOT NULL AS new_user, NOT req.register AS known_user
+FROM req
+LEFT JOIN inserted ON inserted."Employee_ID" = req."Employee_ID" AND inserted."Date" = req."Date"
+LEFT JOIN closed ON closed.ord = req.ord
+LEFT JOIN registered ON registered."Employee_ID" = req."Employee_ID" AND req.register
+ORDER BY req.ord
+"""
 
 # --- CSS (CLEANED) ---
 CUSTOM_CSS = """
@@ -44,72 +203,348 @@ div.stButton button[data-testid="baseButton-secondary"] {
 
 # --- 1. ฟังก์ชันจัดการข้อมูล (แก้ไขทั้งหมด) ---
 
-@st.cache_data(ttl=600) # Cache ข้อมูล 10 นาที
-def load_data():
-    """ 💥 [MODIFIED] โหลดข้อมูลจาก Supabase """
+def _db_time_to_seconds(values):
+    """💥 [NEW] คอลัมน์ time จาก DB (datetime.time / NULL) -> int32 วินาทีของวัน (ตัดเศษวินาที, NULL = TIME_MISSING)"""
+    return np.fromiter(
+        (v.hour * 3600 + v.minute * 60 + v.second if isinstance(v, time) else TIME_MISSING for v in values),
+        dtype=np.int32, count=len(values)
+    )
+
+
+def _convert_log_frame(df):
+    """💥 [MODIFIED] แปลงแถว time_logs ที่อ่านจาก DB เป็นรูปแบบ compact (ดู compact_log_frame) พร้อมแสดงผล
+
+    Start_Time / End_Time เป็น datetime.time จึงแปลงเป็นวินาทีตรงๆ ไม่ต้องผ่านข้อความ
+    """
+    return compact_log_frame(df.assign(
+        Start_Time=_db_time_to_seconds(df['Start_Time']),
+        End_Time=_db_time_to_seconds(df['End_Time'])
+    ))
+
+
+def _empty_log_frame():
+    """DataFrame ว่างที่มีคอลัมน์และชนิดข้อมูลเหมือนผลของ _convert_log_frame"""
+    return compact_log_frame(pd.DataFrame(columns=DB_COLUMNS))
+
+
+def _read_frame(session, sql, params):
+    """รัน SELECT ผ่าน session (ไม่ผ่าน Cache ของ conn.query) แล้วคืนเป็น DataFrame"""
+    result = session.execute(text(sql), params)
+    return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+def _log_filter_sql(date_from, date_to, employee_id=None):
+    """เงื่อนไข WHERE (list) และพารามิเตอร์ของ Filter ช่วงวันที่ / พนักงาน"""
+    sql_where = ['"Date" BETWEEN :date_from AND :date_to']
+    params = {"date_from": date_from, "date_to": date_to}
+    if employee_id is not None:
+        sql_where.append('"Employee_ID" = :employee_id')
+        params["employee_id"] = employee_id
+    return sql_where, params
+
+
+@st.cache_resource
+def get_table_generations():
+    """💥 [NEW] เลขรุ่นของแต่ละตาราง (time_logs) ใช้ร่วมกันทุก Session"""
+    return TableGenerations()
+
+
+class HotLogSync:
+    """💥 [NEW] สำเนา time_logs ช่วงวันล่าสุดในหน่วยความจำ ซิงก์แบบ delta ด้วย watermark
+
+    frame จะถูกแทนที่ทั้งก้อน (ไม่แก้ไขในที่) ผู้อ่านจึงใช้ reference เดิมได้อย่างปลอดภัย
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frame = None            # DataFrame (index = id) เรียง Date, Start_Time, id ล่าสุดก่อน
+        self.index = None            # 💥 [NEW] LogFrameIndex ของ frame (สร้างใหม่ทุกครั้งที่สลับ frame)
+        self.window_start = None     # วันแรกของช่วงที่เก็บไว้ ('YYYY-MM-DD') ส่วน frame เก็บ Date เป็น datetime64
+        self.watermark = None        # เวลาของ DB (clock_timestamp) ตอนซิงก์ครั้งล่าสุด
+        self.last_refresh = None     # monotonic
+        self.last_full_load = None   # monotonic
+        self.stale = True
+
+    def mark_stale(self):
+        """บังคับให้ refresh ครั้งถัดไปถาม DB ทันที (เช่น หลังเขียนข้อมูลจาก Process นี้)"""
+        self.stale = True
+
+    def refresh(self, conn, window_start):
+        """คืน LogFrameIndex ของ frame ล่าสุด: โหลดเต็มครั้งแรก/เมื่อช่วงวันขยาย ไม่งั้นดึงเฉพาะส่วนที่เปลี่ยน"""
+        with self.lock:
+            if (self.frame is None or window_start < self.window_start
+                    or monotonic() - self.last_full_load >= RECONCILE_INTERVAL_SECONDS):
+                self._full_load(conn, window_start)
+            elif self.stale or monotonic() - self.last_refresh >= SYNC_MIN_INTERVAL_SECONDS:
+                self._delta_load(conn, window_start)
+            return self.index
+
+    def _full_load(self, conn, window_start):
+        with conn.session as s:
+            synced_at = s.execute(text("SELECT clock_timestamp()")).scalar_one()
+            rows = _read_frame(s, f'{SQL_SELECT_LOGS} WHERE "Date" >= :window_start', {"window_start": window_start})
+        self._install(_convert_log_frame(rows) if not rows.empty else _empty_log_frame(), window_start, synced_at)
+        self.last_full_load = monotonic()
+
+    def _delta_load(self, conn, window_start):
+        since = self.watermark - SYNC_OVERLAP
+        with conn.session as s:
+            synced_at = s.execute(text("SELECT clock_timestamp()")).scalar_one()
+            changed = _read_frame(
+                s, f'{SQL_SELECT_LOGS} WHERE updated_at > :since AND "Date" >= :window_start',
+                {"since": since, "window_start": window_start}
+            )
+            deleted_ids = s.execute(
+                text('SELECT id FROM time_logs_tombstones WHERE deleted_at > :since'), {"since": since}
+            ).scalars().all()
+
+        frame = self.frame
+        if not changed.empty or deleted_ids:
+            changed = _convert_log_frame(changed) if not changed.empty else changed
+            frame = frame.drop(index=frame.index.intersection(list(changed['id']) + list(deleted_ids)))
+            frame = concat_log_frames([frame, changed.set_axis(changed['id'].to_numpy())]) if not changed.empty else frame
+        self._install(frame, window_start, synced_at)
+
+    # --- 💥 [NEW] Write-through: แพตช์ frame ตามแถวที่ Process นี้เพิ่งเขียน (สร้าง frame ใหม่ ไม่แก้ในที่) ---
+
+    def apply_insert(self, rows):
+        """เพิ่มแถวใหม่ (list ของ dict ตาม DB_COLUMNS ในรูปแบบเดียวกับ _convert_log_frame)"""
+        with self.lock:
+            if self.frame is None:
+                return
+            rows = [row for row in rows if row['Date'] >= self.window_start]
+            if not rows:
+                return
+            new_rows = compact_log_frame(pd.DataFrame(rows, columns=DB_COLUMNS, index=[row['id'] for row in rows]))
+            self._set_frame(sort_for_display(upsert_log_rows(self.frame, new_rows), tie_breaker='id'))
+
+    def apply_close(self, closes):
+        """ตั้ง End_Time / Duration_Minutes ของแถวที่ถูกปิด (list ของ (id, End_Time, Duration_Minutes))"""
+        with self.lock:
+            if self.frame is None:
+                return
+            closes = [close for close in closes if close[0] in self.frame.index]
+            if not closes:
+                return
+            log_ids, end_times, durations = zip(*closes)
+            closed_rows = self.frame.loc[list(log_ids)].assign(
+                End_Time=time_to_seconds(list(end_times)), Duration_Minutes=np.asarray(durations, dtype=np.float32)
+            )
+            # แถวที่ปิดอยู่ตำแหน่งเดิม (ลำดับขึ้นกับ Date / Start_Time / id ซึ่งไม่เปลี่ยน)
+            self._set_frame(upsert_log_rows(self.frame, add_display_columns(closed_rows)).reindex(self.frame.index))
+
+    def apply_delete(self, log_ids):
+        """ตัดแถวที่ถูกลบออก"""
+        with self.lock:
+            if self.frame is not None:
+                self._set_frame(self.frame.drop(index=list(log_ids), errors='ignore'))
+
+    def _install(self, frame, window_start, synced_at):
+        frame = frame.set_axis(frame['id'].to_numpy()) # Index = id (ยังเก็บคอลัมน์ id ไว้ด้วย)
+        frame = frame[frame['Date'] >= pd.Timestamp(window_start)] # ช่วงวันเลื่อนตามวันที่ปัจจุบัน
+        self._set_frame(sort_for_display(frame, tie_breaker='id'))
+        self.window_start = window_start
+        self.watermark = synced_at
+        self.last_refresh = monotonic()
+        self.stale = False
+
+    def _set_frame(self, frame):
+        """สลับ frame (เรียงตามลำดับแสดงผลแล้ว) พร้อมดัชนีของมัน"""
+        self.frame = frame
+        self.index = LogFrameIndex(frame, presorted=True)
+
+
+@st.cache_resource
+def get_hot_log_sync():
+    """💥 [NEW] HotLogSync ตัวเดียวใช้ร่วมกันทุก Session"""
+    return HotLogSync()
+
+
+@st.cache_data(ttl=SYNC_SCHEMA_CHECK_SECONDS, show_spinner=False)
+def sync_schema_ready():
+    """💥 [MODIFIED] ฐานข้อมูลมีคอลัมน์/ตาราง/Trigger ที่ Delta sync ต้องใช้แล้วหรือไม่ (ไม่รัน DDL เอง)
+
+    ผลทั้ง True/False ถูก Cache ไว้ SYNC_SCHEMA_CHECK_SECONDS วินาที: หลังรัน Migration หรือ DB กลับมาใช้ได้
+    จะเปลี่ยนเป็น Delta sync เองโดยไม่ต้องรีสตาร์ทแอป
+    """
     try:
         conn = st.connection("supabase", type=SQLConnection)
-        # เลือก "id" มาด้วย เพื่อใช้ในการลบ
-        df = conn.query('SELECT id, "Employee_ID", "Date", "Start_Time", "End_Time", "Activity_Type", "Duration_Minutes" FROM time_logs ORDER BY "Date" DESC, "Start_Time" DESC;',
-                        ttl=60) # Cache query 1 นาที
+        with conn.session as s:
+            ready = bool(s.execute(text(SQL_SYNC_SCHEMA_CHECK)).scalar())
+    except Exception as e:
+        st.warning(f"ไม่สามารถตรวจสอบ schema ของ Delta sync ได้ (ใช้การโหลดเต็มแทน): {e}")
+        return False
+    if not ready:
+        st.warning(f"ยังไม่ได้รัน Migration {SYNC_SCHEMA_MIGRATION} (ใช้การโหลดเต็มแทน Delta sync)")
+    return ready
 
-        if df.empty:
-            return pd.DataFrame(columns=DB_COLUMNS)
 
-        # -----------------------------------------------------------------
-        # 💥 [FIX] แก้ไขการแปลงประเภทข้อมูลที่นี่
-        # -----------------------------------------------------------------
-        
-        # 1. 'Date' (ประเภท date) - อันนี้ถูกต้องแล้ว
-        df['Date'] = pd.to_datetime(df['Date']).dt.date.astype(str)
-        
-        # 2. 'Start_Time' (ประเภท time)
-        # ถูกอ่านค่ามาเป็น datetime.time object
-        # เราไม่สามารถใช้ pd.to_datetime() กับมันได้ ต้อง .apply(strftime) เลย
-        df['Start_Time'] = df['Start_Time'].apply(
-            lambda x: x.strftime('%H:%M:%S') if isinstance(x, time) else str(x)
-        )
+@st.cache_data(ttl=SYNC_SCHEMA_CHECK_SECONDS, show_spinner=False)
+def event_schema_ready():
+    """💥 [NEW] มีตาราง time_log_events ที่คิวเขียนล่วงหน้าต้องใช้แล้วหรือไม่ (ไม่รัน DDL เอง — Cache เหมือน sync_schema_ready)"""
+    try:
+        conn = st.connection("supabase", type=SQLConnection)
+        with conn.session as s:
+            ready = bool(s.execute(text(SQL_EVENT_SCHEMA_CHECK)).scalar())
+    except Exception as e:
+        st.warning(f"ไม่สามารถตรวจสอบตาราง time_log_events ได้: {e}")
+        return False
+    if not ready:
+        st.warning(f"ยังไม่ได้รัน Migration {SYNC_SCHEMA_MIGRATION}: ข้อมูลลงเวลาถูกเก็บไว้ในเครื่องจนกว่าจะมีตาราง time_log_events")
+    return ready
+
+
+@st.cache_data(ttl=SYNC_RETENTION_CHECK_SECONDS, show_spinner=False)
+def prune_sync_tables():
+    """💥 [NEW] ลบ tombstone / event_id ที่เก่ากว่าระยะเก็บ (อย่างมากครั้งเดียวต่อ SYNC_RETENTION_CHECK_SECONDS วินาที)
+
+    คืน {ชื่อตาราง: จำนวนแถวที่ลบ} — ข้ามตารางที่ยังไม่ได้สร้างด้วย Migration
+    """
+    pruned = {}
+    try:
+        conn = st.connection("supabase", type=SQLConnection)
+        with conn.session as s:
+            for table, (sql, retention) in SQL_PRUNE_SYNC_TABLES.items():
+                if s.execute(text("SELECT to_regclass(:table) IS NOT NULL"), {"table": table}).scalar():
+                    pruned[table] = s.execute(text(sql), {"retention": retention}).rowcount
+            s.commit()
+    except Exception as e:
+        st.warning(f"ไม่สามารถลบข้อมูลซิงก์ที่เก่าแล้วได้: {e}")
+    return pruned
 
-        # 3. 'End_Time' (ประเภท time และมีค่า NULL)
-        # ใช้วิธีเดียวกับ Start_Time แต่เช็คค่าที่เป็น NULL (NaT/None) ด้วย
-        df['End_Time'] = df['End_Time'].apply(
-            lambda x: x.strftime('%H:%M:%S') if isinstance(x, time) else np.nan
-        )
-        # -----------------------------------------------------------------
 
-        df['Duration_Minutes'] = pd.to_numeric(df['Duration_Minutes'], errors='coerce')
+def hot_window_start():
+    """วันแรกของช่วงที่ซิงก์ไว้ในหน่วยความจำ"""
+    return (datetime.now().date() - timedelta(days=HOT_WINDOW_DAYS)).strftime('%Y-%m-%d')
 
-        return df
 
+def hot_sync_covers(date_from):
+    """💥 [NEW] ช่วงวันที่เริ่มที่ date_from อยู่ในข้อมูลที่ Delta sync เก็บไว้ในหน่วยความจำหรือไม่"""
+    return LOG_SYNC_MODE == "delta" and str(date_from) >= hot_window_start() and sync_schema_ready()
+
+
+def _load_hot_data(date_from, date_to, employee_id=None):
+    """แถวตาม Filter จาก frame ของ Delta sync (None ถ้าซิงก์ไม่สำเร็จ)"""
+    try:
+        conn = st.connection("supabase", type=SQLConnection)
+        log_index = get_hot_log_sync().refresh(conn, hot_window_start())
+    except Exception as e:
+        st.error(f"เกิดข้อผิดพลาดในการซิงก์ข้อมูลจาก Supabase: {e}")
+        return None
+
+    # 💥 [MODIFIED] binary search บนวันที่ที่เรียงไว้แล้ว + ตำแหน่งแถวของพนักงาน (ไม่สร้าง mask ทั้ง frame)
+    return log_index.select(date_from, date_to, employee_id).reset_index(drop=True)
+
+
+@st.cache_data(ttl=600, max_entries=256) # Cache แยกตาม Filter + cursor และรุ่นของ time_logs
+def _load_log_page_keyset(date_from, date_to, employee_id, after, generation=0):
+    """💥 [NEW] Keyset pagination: ดึงหนึ่งหน้าที่อยู่ถัดจาก cursor after = (Date, Start_Time, id)
+
+    ใช้ดัชนี time_logs_keyset_idx ทำให้ทุกหน้าใช้เวลาเท่ากัน (ไม่ต้องข้ามแถวแบบ OFFSET)
+    คืน (DataFrame ของหน้านั้น, cursor ของหน้าถัดไป หรือ None ถ้าเป็นหน้าสุดท้าย)
+    """
+    sql_where, params = _log_filter_sql(date_from, date_to, employee_id)
+    if after is not None:
+        sql_where.append(SQL_KEYSET_AFTER)
+        params.update({"after_date": after[0], "after_time": after[1], "after_id": after[2]})
+    params["limit"] = LOG_PAGE_SIZE + 1 # ดึงเกิน 1 แถวเพื่อรู้ว่ามีหน้าถัดไปหรือไม่
+    sql_query = f"""
+    {SQL_SELECT_LOGS}
+    WHERE {' AND '.join(sql_where)}
+    {SQL_LOG_ORDER}
+    LIMIT :limit;
+    """
+    try:
+        conn = st.connection("supabase", type=SQLConnection)
+        with conn.session as s:
+            df = _read_frame(s, sql_query, params)
     except Exception as e:
         st.error(f"เกิดข้อผิดพลาดในการโหลดข้อมูลจาก Supabase: {e}")
-        return pd.DataFrame(columns=DB_COLUMNS)
+        return _empty_log_frame(), None
+
+    if df.empty:
+        return _empty_log_frame(), None
+    has_more = len(df) > LOG_PAGE_SIZE
+    df = df.iloc[:LOG_PAGE_SIZE]
+    # cursor ใช้ค่าดิบจาก DB (Start_Time มีเศษวินาทีได้ ถ้าตัดทิ้งจะข้ามแถวที่เวลาต่างกันไม่ถึงวินาที)
+    last = df.iloc[-1]
+    next_cursor = (str(last['Date']), str(last['Start_Time']), int(last['id'])) if has_more else None
+    return _convert_log_frame(df), next_cursor
+
+
+def load_log_page(date_from, date_to, employee_id=None, cursor=None):
+    """💥 [NEW] โหลดหนึ่งหน้าของตารางข้อมูลลงเวลา คืน (DataFrame, cursor ของหน้าถัดไป หรือ None)
+
+    ช่วงวันล่าสุด (Delta sync) แบ่งหน้าจากข้อมูลในหน่วยความจำ: cursor = ตำแหน่งแถว (int)
+    ช่วงที่เก่ากว่านั้นใช้ Keyset pagination ใน SQL: cursor = (Date, Start_Time, id) ของแถวสุดท้ายหน้าก่อน
+    """
+    if hot_sync_covers(date_from):
+        df = _load_hot_data(date_from, date_to, employee_id)
+        if df is not None:
+            offset = cursor or 0
+            next_offset = offset + LOG_PAGE_SIZE
+            return df.iloc[offset:next_offset], (next_offset if len(df) > next_offset else None)
+    if isinstance(cursor, int): # ซิงก์ล้มเหลวระหว่างเปลี่ยนหน้า: เริ่มจากหน้าแรกของ SQL
+        cursor = None
+    return _load_log_page_keyset(
+        date_from, date_to, employee_id, cursor, get_table_generations().current("time_logs")
+    )
+
+
+def record_log_write(inserted=(), closed=(), deleted_ids=()):
+    """💥 [NEW] หลังเขียน time_logs สำเร็จ: แพตช์ frame ของ Delta sync ในที่ (หรือล้าง Cache ตามโหมด)
+
+    💥 [MODIFIED] รับหลายแถวต่อครั้ง (1 ชุดการเขียน = เลื่อนรุ่น/สร้าง frame ใหม่ครั้งเดียว)
+    inserted = list ของ dict แถวใหม่, closed = list ของ (id, End_Time, Duration_Minutes), deleted_ids = id ที่ถูกลบ
+    """
+    if not (inserted or closed or deleted_ids):
+        return
+    if LOG_CACHE_WRITE_MODE != "write_through":
+        invalidate_log_caches()
+        return
+    get_table_generations().bump("time_logs") # Cache ของช่วงวันเก่า (_load_log_page_keyset) ยังต้องโหลดใหม่
+    hot_sync = get_hot_log_sync()
+    if inserted:
+        hot_sync.apply_insert(inserted)
+    if closed:
+        hot_sync.apply_close(closed) # หลัง insert: แถวที่ปิดอาจเป็นแถวที่เพิ่ง INSERT ในชุดเดียวกัน
+    if deleted_ids:
+        hot_sync.apply_delete(deleted_ids)
+
+
+def invalidate_log_caches():
+    """💥 [MODIFIED] หลังเขียน time_logs: เลื่อนรุ่นของ time_logs และให้ Delta sync ถาม DB ในรอบถัดไป
+
+    Cache ของ user_data ไม่ได้รับผลกระทบ
+    """
+    get_table_generations().bump("time_logs")
+    get_hot_log_sync().mark_stale()
+
 
 # -----------------------------------------------------------------
 # 💥 [MODIFIED] ฟังก์ชันสำหรับจัดการ User Data (ID ที่ไม่ซ้ำ)
 # -----------------------------------------------------------------
 
-@st.cache_data(ttl=600)
-def load_user_data():
-    """ 💥 [MODIFIED] โหลดข้อมูล ID, ชื่อ และ นามสกุล พนักงานจาก Supabase """
-    try:
-        conn = st.connection("supabase", type=SQLConnection)
-        
-        # 💥 [FIX] เลือก "Employee_Name" และ "Employee_Surname"
-        sql_query = 'SELECT "Employee_ID", "Employee_Name", "Employee_Surname" FROM user_data;'
-        df_users = conn.query(sql_query, ttl=60)
-        
-        if df_users.empty:
-            # 💥 [FIX] คืนค่าเป็น DataFrame ที่มี 3 คอลัมน์
-            return pd.DataFrame(columns=["Employee_ID", "Employee_Name", "Employee_Surname"])
-            
-        df_users['Employee_ID'] = df_users['Employee_ID'].astype(str)
-        # 💥 [FIX] เติมค่าว่างสำหรับชื่อและนามสกุล
-        df_users['Employee_Name'] = df_users['Employee_Name'].astype(str).fillna("") 
-        df_users['Employee_Surname'] = df_users['Employee_Surname'].astype(str).fillna("") 
+@st.cache_resource
+def get_employee_directory():
+    """💥 [NEW] EmployeeDirectory ตัวเดียวใช้ร่วมกันทุก Session (แทน DataFrame ของ user_data)"""
+    return EmployeeDirectory()
 
-        return df_users.drop_duplicates(subset=['Employee_ID']) # กัน ID ซ้ำ
 
+def _load_user_rows(conn):
+    """อ่าน ID, ชื่อ และ นามสกุล พนักงานทั้งหมดจาก user_data ในรูปแบบที่ EmployeeDirectory ต้องการ"""
+    # 💥 [FIX] เลือก "Employee_Name" และ "Employee_Surname"
+    sql_query = 'SELECT "Employee_ID", "Employee_Name", "Employee_Surname" FROM user_data;'
+    with conn.session as s:
+        return s.execute(text(sql_query)).fetchall()
+
+
+def load_employee_directory():
+    """ 💥 [MODIFIED] รายชื่อพนักงาน (ID, ชื่อ, นามสกุล) จาก Supabase — โหลดใหม่ทุก USER_DIRECTORY_MAX_AGE วินาที """
+    directory = get_employee_directory()
+    try:
+        conn = st.connection("supabase", type=SQLConnection)
+        directory.ensure_loaded(lambda: _load_user_rows(conn), max_age=USER_DIRECTORY_MAX_AGE)
     except Exception as e:
         # 💥 [FIX] ตรวจสอบว่า Error เกิดเพราะไม่มีคอลัมน์หรือไม่
         if 'column "Employee_Name" does not exist' in str(e) or 'column "Employee_Surname" does not exist' in str(e):
@@ -117,187 +552,350 @@ def load_user_data():
              st.info("กรุณาตรวจสอบคอลัมน์ใน Supabase ก่อนครับ")
         else:
             st.warning(f"ไม่สามารถโหลด User List (ID/Name/Surname): {e}")
-        
-        return pd.DataFrame(columns=["Employee_ID", "Employee_Name", "Employee_Surname"])
+    return directory
 
-def save_unique_user_id(employee_id):
-    """ 💥 [MODIFIED] บันทึก ID พนักงานใหม่ที่ไม่ซ้ำลงใน Supabase """
-    employee_id = str(employee_id)
-    if not employee_id:
-        return
+# 💥 [NEW] ดัชนีกิจกรรมที่ยังเปิดอยู่ (ใช้ร่วมกันทุก Session)
+@st.cache_resource
+def get_open_activity_index():
+    """ดัชนี (Employee_ID, Date) -> กิจกรรมที่ยังไม่ปิด สำหรับ Clock Out แบบ O(1)
 
-    try:
-        conn = st.connection("supabase", type=SQLConnection)
-        
-        # 💥 [FIX 2/5] เปลี่ยนจาก conn.execute() เป็น conn.session.execute()
-        with conn.session as s:
-            s.execute(
-                text('INSERT INTO user_data ("Employee_ID") VALUES (:Employee_ID) ON CONFLICT ("Employee_ID") DO NOTHING;'),
-                params=[{"Employee_ID": employee_id}]
-            )
-            s.commit()
-            
-        st.cache_data.clear() # ล้าง cache ของ load_user_data
-    except Exception as e:
-        st.error(f"เกิดข้อผิดพลาดในการบันทึก User ID: {e}")
+    โหลด/อัปเดตเฉพาะ LOG_WRITE_MODE = "queue" (ต้องรู้ล่วงหน้าว่ามีกิจกรรมเปิดอยู่ก่อน DB เห็น event)
+    """
+    return OpenActivityIndex()
+
+
+def _load_open_activities(conn, date_str):
+    """โหลดแถวที่ยังไม่มี End_Time ของวันที่ระบุ ในรูปแบบที่ OpenActivityIndex ต้องการ"""
+    sql_open = """
+    SELECT id, "Employee_ID", "Start_Time" FROM time_logs
+    WHERE "Date" = :Date AND "End_Time" IS NULL;
+    """
+    with conn.session as s:
+        rows = s.execute(text(sql_open), {"Date": date_str}).fetchall()
+    open_rows = []
+    for log_id, employee_id, start_time_obj in rows:
+        start_time = start_time_obj.strftime('%H:%M:%S') if isinstance(start_time_obj, time) else str(start_time_obj)
+        # กิจกรรมล่าสุด = Start_Time มากที่สุด (เหมือน ORDER BY "Start_Time" DESC เดิม)
+        open_rows.append((str(employee_id), date_str, start_time, int(log_id), start_time))
+    return open_rows
+
+
+# 💥 [MODIFIED] ฟังก์ชัน Clock Out กิจกรรมล่าสุด
+def clock_out_latest_activity(employee_id, date_str, end_time_str):
+    """ค้นหาและ Clock Out กิจกรรมล่าสุดที่ยังเปิดอยู่ใน Supabase (1 คำสั่ง, atomic)
+
+    💥 [MODIFIED] คืน True/False (ปิดได้/ไม่มีกิจกรรมเปิดอยู่) และโยน Exception เมื่อบันทึกไม่สำเร็จ
+    ไม่เรียก st.* (อาจรันใน Thread pool ของ SUBMIT_MODE = "async" — perform_activity แปลงผลเป็นข้อความ)
+    """
+    if LOG_WRITE_MODE == "queue":
+        return _enqueue_log_event("close", employee_id, date_str, end_time_str)
+    # 💥 [MODIFIED] หา + ปิด + คำนวณ Duration ในคำสั่งเดียว รวมกับรายการจาก Session อื่นที่มาพร้อมกัน
+    # ไม่เชื่อดัชนีในหน่วยความจำเมื่อไม่พบ (แถวอาจถูกเพิ่มจาก Process อื่น) — DB เป็นผู้ตัดสินเสมอ
+    return _close_in_db(employee_id, date_str, end_time_str)
 
-# 💥 [NO CHANGE] ฟังก์ชันคำนวณ Duration (เหมือนเดิม)
-def calculate_duration(start_time_str, end_time_str):
-    """คำนวณระยะเวลาเป็นนาที"""
+# 💥 [MODIFIED] ฟังก์ชันเริ่มพักเบรคใหม่
+def log_activity_start(employee_id, date_str, start_time_str, activity_type):
+    """บันทึกการเริ่มพักเบรคใหม่ลง Supabase, Clock Out กิจกรรมเดิม (ถ้ามี) และบันทึก ID ผู้ใช้
+
+    💥 [MODIFIED] ทั้งหมดทำใน Transaction เดียว ด้วยคำสั่งเดียว ร่วมกับรายการจาก Session อื่นที่มาพร้อมกัน
+    โยน Exception เมื่อบันทึกไม่สำเร็จ (ไม่เรียก st.* เหมือน clock_out_latest_activity)
+    """
+    if LOG_WRITE_MODE == "queue":
+        return _enqueue_log_event("start", employee_id, date_str, start_time_str, activity_type)
+    get_write_coalescer().submit({
+        "op": "start", "Employee_ID": employee_id, "Date": date_str, "Time": start_time_str,
+        "Activity_Type": activity_type
+    }).result(timeout=WRITE_RESULT_TIMEOUT_SECONDS)
+    return True
+
+def _close_in_db(employee_id, date_str, end_time_str):
+    """ปิดกิจกรรมล่าสุดที่เปิดอยู่ด้วยคำสั่ง atomic ผ่าน WriteCoalescer คืน True ถ้า DB ปิดแถวได้จริง
+
+    (ดัชนี/Cache ถูกอัปเดตใน _after_activity_batch ก่อน Future เสร็จ)
+    """
+    result = get_write_coalescer().submit(
+        {"op": "close", "Employee_ID": employee_id, "Date": date_str, "Time": end_time_str}
+    ).result(timeout=WRITE_RESULT_TIMEOUT_SECONDS)
+    return result.closed_id is not None
+
+# -----------------------------------------------------------------
+# 💥 [NEW] เขียนเป็นชุด: รายการ (payload) = {"op": "start"/"close", "Employee_ID", "Date", "Time",
+# "Activity_Type" (เฉพาะ start), "provisional_id" (เฉพาะคิวเขียนล่วงหน้า)}
+# -----------------------------------------------------------------
+
+def _execute_activity_batch(session, payloads):
+    """รันรายการทั้งหมดตามลำดับใน session ที่ส่งมา (ยังไม่ commit) คืนแถวผลลัพธ์ของแต่ละรายการ
+
+    รายการที่ (Employee_ID, Date) ซ้ำกับรายการก่อนหน้าถูกเลื่อนไปคำสั่งถัดไป (ลำดับของพนักงานคนเดียวกันไม่สลับ)
+    จำนวนคำสั่ง = จำนวนครั้งสูงสุดที่ (Employee_ID, Date) เดียวกันปรากฏในชุด (ปกติคือ 1)
+    """
+    directory = get_employee_directory()
+    rounds, seen = [], {}
+    for position, payload in enumerate(payloads):
+        key = (payload["Employee_ID"], payload["Date"])
+        round_number = seen.get(key, 0)
+        seen[key] = round_number + 1
+        if round_number == len(rounds):
+            rounds.append([])
+        rounds[round_number].append(position)
+
+    results = [None] * len(payloads)
+    for positions in rounds:
+        batch = [payloads[position] for position in positions]
+        params = {
+            "ords": positions,
+            "employee_ids": [p["Employee_ID"] for p in batch],
+            "dates": [p["Date"] for p in batch],
+            "times": [p["Time"] for p in batch], # start: เวลาเริ่มใหม่ = เวลาจบของกิจกรรมเดิม
+            "activity_types": [p.get("Activity_Type") if p["op"] == "start" else None for p in batch],
+            "register": [p["op"] == "start" and p["Employee_ID"] not in directory for p in batch],
+        }
+        for row in session.execute(text(SQL_ACTIVITY_BATCH), params):
+            results[row.ord] = row
+    return results
+
+
+def _after_activity_batch(payloads, results):
+    """หลัง commit ชุดการเขียน: อัปเดตดัชนีกิจกรรมที่เปิดอยู่ รายชื่อพนักงาน และแพตช์ Cache ครั้งเดียวทั้งชุด"""
+    if LOG_WRITE_MODE == "queue":
+        _update_open_index(payloads, results)
+    directory = get_employee_directory()
+    inserted, closed = [], []
+    for payload, result in zip(payloads, results):
+        employee_id, date_str, time_str = payload["Employee_ID"], payload["Date"], payload["Time"]
+        if result.closed_id is not None:
+            closed.append((int(result.closed_id), time_str, float(result.closed_duration)))
+        if payload["op"] == "start":
+            inserted.append({
+                "id": int(result.new_id), "Employee_ID": employee_id, "Date": date_str,
+                "Start_Time": time_str, "End_Time": np.nan,
+                "Activity_Type": payload["Activity_Type"], "Duration_Minutes": np.nan
+            })
+            if result.new_user:
+                directory.register(employee_id) # มี ID ใหม่ใน user_data
+            elif not result.known_user:
+                directory.invalidate() # ID ถูกเพิ่มจากที่อื่น (อาจมีชื่อแล้ว): โหลดรายชื่อใหม่ครั้งถัดไป
+    record_log_write(inserted=inserted, closed=closed)
+
+
+def _update_open_index(payloads, results):
+    """อัปเดตดัชนีกิจกรรมที่เปิดอยู่ตามผลที่ commit แล้ว (ใช้เฉพาะคิวเขียนล่วงหน้า: โหมด direct ให้ DB หาแถวที่จะปิดเอง)"""
+    open_index = get_open_activity_index()
+    for payload, result in zip(payloads, results):
+        employee_id, date_str, time_str = payload["Employee_ID"], payload["Date"], payload["Time"]
+        if result.closed_id is not None:
+            open_index.discard(int(result.closed_id))
+        if payload["op"] == "start":
+            # แทน provisional id ด้วย id จริง — ถ้าไม่พบแล้ว แปลว่าถูกปิดด้วยรายการถัดไปในคิว หรือดัชนีถูกโหลดใหม่จาก DB
+            provisional_id = payload.get("provisional_id")
+            if provisional_id is None or open_index.discard(provisional_id):
+                open_index.add(employee_id, date_str, int(result.new_id), time_str, time_str, date_str)
+        elif result.closed_id is None and open_index.has_open(employee_id, date_str):
+            # ดัชนีไม่ตรงกับฐานข้อมูล (แถวถูกปิด/ลบจากที่อื่น): โหลดดัชนีของวันนั้นใหม่ครั้งถัดไป
+            # (ดัชนีก็ไม่มีแถวเปิดอยู่ = ตรงกันแล้ว ไม่ต้องโหลดใหม่)
+            open_index.invalidate(date_str)
+
+
+def _write_activity_batch(conn, payloads):
+    """flush_batch ของ WriteCoalescer: ทั้งชุดใน 1 Transaction แล้วอัปเดตสถานะในหน่วยความจำ
+
+    โยน Exception ได้เฉพาะก่อน commit (WriteCoalescer ส่งรายการที่ล้มเหลวใหม่ทีละรายการ)
+    """
+    with conn.session as s:
+        results = _execute_activity_batch(s, payloads)
+        s.commit()
     try:
-        if pd.isnull(start_time_str) or pd.isnull(end_time_str) or str(start_time_str).lower() == 'nan' or str(end_time_str).lower() == 'nan':
-            return np.nan
+        _after_activity_batch(payloads, results)
+    except Exception:
+        # commit แล้ว ห้ามให้ส่งซ้ำ: ทิ้งสถานะในหน่วยความจำแล้วโหลดจาก DB ใหม่แทน
+        get_open_activity_index().invalidate()
+        invalidate_log_caches()
+    return results
 
-        # ตรวจสอบ format (HH:MM:SS หรือ HH:MM)
-        time_formats = ['%H:%M:%S', '%H:%M']
-        t_start_time = None
-        t_end_time = None
-        
-        for fmt in time_formats:
+
+@st.cache_resource
+def get_write_coalescer():
+    """💥 [NEW] WriteCoalescer ตัวเดียวต่อ Process (ทุก Session ส่งการเขียนผ่านตัวนี้)"""
+    conn = st.connection("supabase", type=SQLConnection)
+    return WriteCoalescer(
+        lambda payloads: _write_activity_batch(conn, payloads), window_seconds=WRITE_COALESCE_SECONDS,
+        split_on_error=lambda e: not _is_transient_db_error(e) # DB ล่ม: ไม่ต้องลองทีละรายการ
+    )
+
+
+# -----------------------------------------------------------------
+# 💥 [NEW] คิวเขียนล่วงหน้า (LOG_WRITE_MODE = "queue")
+# ปุ่มกด = เขียนลงไฟล์ SQLite ในเครื่อง + อัปเดตดัชนีกิจกรรมที่เปิดอยู่ล่วงหน้า (provisional id ติดลบ)
+# Thread ของ WriteAheadQueue ส่ง event เข้า Supabase ตามลำดับ แล้วแทน provisional id ด้วย id จริง
+# -----------------------------------------------------------------
+
+def _is_transient_db_error(error):
+    """Error ที่ควรลองส่งทั้งชุดใหม่ภายหลัง (เชื่อมต่อไม่ได้/หลุด, deadlock, timeout) แทนการทิ้ง event"""
+    return isinstance(error, (OperationalError, InterfaceError)) or getattr(error, "connection_invalidated", False)
+
+
+class SupabaseEventWriter:
+    """ส่ง event หนึ่งชุดจาก WriteAheadQueue เข้า Postgres ใน 1 Transaction
+
+    💥 [MODIFIED] ปกติทั้งชุดใช้คำสั่งหลายแถว (_execute_activity_batch) ถ้ามี event ที่ผิดถาวร (เช่น ข้อมูลไม่ถูกต้อง)
+    จะส่งใหม่ทีละ event ด้วย SAVEPOINT เพื่อแยก event นั้นไป failed_events
+    Cache ในหน่วยความจำถูกแพตช์หลัง commit เท่านั้น
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.schema_ready = False
+
+    def __call__(self, events):
+        with self.conn.session as s:
+            if not self.schema_ready:
+                # ตารางสร้างด้วย Migration: ยังไม่มี = ส่งไม่ได้ (event ค้างในคิวตามลำดับเดิม แล้วลองใหม่ภายหลัง)
+                if not s.execute(text(SQL_EVENT_SCHEMA_CHECK)).scalar():
+                    raise RuntimeError(f"ไม่พบตาราง time_log_events (ยังไม่ได้รัน Migration {SYNC_SCHEMA_MIGRATION})")
+                self.schema_ready = True
             try:
-                t_start_time = datetime.strptime(str(start_time_str), fmt).time()
-                break
-            except ValueError:
-                continue
-        
-        for fmt in time_formats:
+                payloads, results = self._apply(s, events)
+                s.commit()
+                outcomes = [None] * len(events)
+            except Exception as e:
+                if _is_transient_db_error(e):
+                    raise
+                s.rollback()
+                payloads, results, outcomes = self._apply_one_by_one(s, events)
+        _after_activity_batch(payloads, results)
+        return outcomes
+
+    @staticmethod
+    def _apply(session, events):
+        """บันทึก event_id ที่ยังไม่เคยเขียน แล้วเขียนเฉพาะ event เหล่านั้น (event ที่ส่งซ้ำถูกข้าม)"""
+        claimed = set(session.execute(text(SQL_CLAIM_EVENTS), {"event_ids": [e[1] for e in events]}).scalars())
+        payloads = [payload for _, event_id, payload in events if event_id in claimed]
+        return payloads, (_execute_activity_batch(session, payloads) if payloads else [])
+
+    def _apply_one_by_one(self, session, events):
+        payloads, results, outcomes = [], [], []
+        for event in events:
             try:
-                t_end_time = datetime.strptime(str(end_time_str), fmt).time()
-                break
-            except ValueError:
-                continue
+                with session.begin_nested():
+                    applied_payloads, applied_results = self._apply(session, [event])
+            except Exception as e:
+                if _is_transient_db_error(e):
+                    raise
+                outcomes.append(f"{type(e).__name__}: {getattr(e, 'orig', None) or e}")
+            else:
+                payloads += applied_payloads
+                results += applied_results
+                outcomes.append(None) # สำเร็จ หรือ event_id นี้เคยเขียนแล้ว
+        session.commit()
+        return payloads, results, outcomes
 
-        if t_start_time is None or t_end_time is None:
-            return np.nan
 
-        base_date = datetime(2000, 1, 1)
-        t_start = datetime.combine(base_date, t_start_time)
-        t_end = datetime.combine(base_date, t_end_time)
+@st.cache_resource
+def get_write_queue():
+    """WriteAheadQueue ตัวเดียวต่อ Process (เริ่มส่ง event ที่ค้างจากรอบก่อนทันที)"""
+    conn = st.connection("supabase", type=SQLConnection)
+    return WriteAheadQueue(WRITE_QUEUE_FILE, SupabaseEventWriter(conn), batch_size=WRITE_QUEUE_BATCH_SIZE)
 
-        if t_end < t_start:
-            t_end += pd.Timedelta(days=1)
 
-        duration_minutes = (t_end - t_start).total_seconds() / 60
-        return max(0, duration_minutes)
-    except (ValueError, TypeError, AttributeError):
-        return np.nan
+def _write_queue_idle(queue):
+    """คิวไม่มี event ค้าง และส่งได้ปกติ (ดัชนีตรงกับ DB — โหลดใหม่/เขียน DB ตรงได้โดยไม่ข้ามลำดับ)"""
+    return not queue.last_error and queue.pending_count() == 0
 
-# 💥 [MODIFIED] ฟังก์ชัน Clock Out กิจกรรมล่าสุด
-def clock_out_latest_activity(employee_id, date_str, end_time_str):
-    """ค้นหาและ Clock Out กิจกรรมล่าสุดที่ยังเปิดอยู่ใน Supabase"""
-    try:
-        conn = st.connection("supabase", type=SQLConnection)
-        
-        # 1. ค้นหา 'id' ของแถวล่าสุดที่ยังไม่ปิด
-        sql_find = """
-        SELECT id FROM time_logs 
-        WHERE "Employee_ID" = :Employee_ID AND "Date" = :Date AND "End_Time" IS NULL 
-        ORDER BY "Start_Time" DESC 
-        LIMIT 1;
-        """
-        result_df = conn.query(sql_find, params=[{"Employee_ID": employee_id, "Date": date_str}])
-        
-        if not result_df.empty:
-            log_id_to_update = result_df['id'].iloc[0]
-            
-            # 2. ดึง Start_Time มาคำนวณ
-            start_time_df = conn.query('SELECT "Start_Time" FROM time_logs WHERE id = :id;',params=[{"id": int(log_id_to_update)}])
-            
-            # -----------------------------------------------------------------
-            # 💥 [FIX] แก้ไขจุดนี้: conn.query() คืนค่า object datetime.time
-            # เราจึงไม่สามารถใช้ pd.to_datetime() กับมันได้
-            # ให้เราดึง object .iloc[0] แล้ว .strftime() โดยตรง
-            start_time_obj = start_time_df['Start_Time'].iloc[0]
-            start_time = start_time_obj.strftime('%H:%M:%S')
-            # -----------------------------------------------------------------
-
-            duration = calculate_duration(start_time, end_time_str)
-            
-            # 3. อัปเดตแถวนั้น
-            sql_update = """
-            UPDATE time_logs 
-            SET "End_Time" = :End_Time, "Duration_Minutes" = :Duration_Minutes 
-            WHERE id = :id;
-            """
-            
-            # (ส่วนนี้ถูกต้องแล้วจากครั้งก่อน)
-            with conn.session as s:
-                s.execute(
-                    text(sql_update),
-                    params=[{
-                        "End_Time": end_time_str,
-                        "Duration_Minutes": duration,
-                        "id": int(log_id_to_update)
-                    }]
-                )
-                s.commit()
 
-            
-            st.cache_data.clear() # ล้าง cache ของ load_data
-            return True
-            
-    except Exception as e:
-        st.warning(f"Internal Clock-out Error for ID {employee_id}: {e}")
-        raise
-    return False
+def _enqueue_log_event(op, employee_id, date_str, time_str, activity_type=None):
+    """บันทึก event "start"/"close" ลงคิวในเครื่อง คืน True เมื่อบันทึกแล้ว (ไม่รอ Supabase) — บันทึกไม่ได้ = โยน Exception
 
-# 💥 [MODIFIED] ฟังก์ชันเริ่มพักเบรคใหม่
-def log_activity_start(employee_id, date_str, start_time_str, activity_type):
-    """บันทึกการเริ่มพักเบรคใหม่ลง Supabase และ Clock Out กิจกรรมเดิม (ถ้ามี)"""
-    try:
-        # 1. Clock out กิจกรรมเดิมก่อน
-        clock_out_latest_activity(employee_id, date_str, start_time_str) 
-        
-        # 2. เพิ่มแถวใหม่
-        conn = st.connection("supabase", type=SQLConnection)
-        
-        sql_insert = """
-        INSERT INTO time_logs 
-        ("Employee_ID", "Date", "Start_Time", "End_Time", "Activity_Type", "Duration_Minutes") 
-        VALUES (:Employee_ID, :Date, :Start_Time, :End_Time, :Activity_Type, :Duration_Minutes);
-        """
-        
-        # 💥 [FIX 4/5] เปลี่ยนจาก conn.execute() เป็น conn.session.execute()
-        with conn.session as s:
-            s.execute(
-                text(sql_insert),
-                params=[{
-                    "Employee_ID": employee_id,
-                    "Date": date_str,
-                    "Start_Time": start_time_str,
-                    "End_Time": None,
-                    "Activity_Type": activity_type,
-                    "Duration_Minutes": None
-                }]
+    close ที่ดัชนีไม่พบกิจกรรมเปิดอยู่ ถาม DB ตรง ๆ (ปิดแบบ atomic) และคืน False เฉพาะเมื่อ DB ไม่มีแถวให้ปิด
+    ถ้า DB ใช้ไม่ได้ จะลงคิวไว้ให้ DB ตัดสินตอนส่ง
+
+    ระหว่างที่คิวยังมี event ค้าง ดัชนีมี provisional id ของ start ที่ DB ยังไม่เห็น: ห้ามโหลดดัชนีใหม่จาก DB
+    (จะลบ provisional id ทิ้ง) และห้ามเขียน DB ตรง (close จะแซง start ที่ยังอยู่ในคิว) — ทุกอย่างลงคิวตามลำดับ
+    """
+    queue = get_write_queue()
+    open_index = get_open_activity_index()
+    known_open = True # ไม่รู้สถานะกิจกรรมที่เปิดอยู่: ให้ DB ตัดสินตอนส่ง
+    if _write_queue_idle(queue):
+        try:
+            conn = st.connection("supabase", type=SQLConnection)
+            open_index.ensure_scope(
+                date_str, lambda: _load_open_activities(conn, date_str), max_age=OPEN_INDEX_MAX_AGE
             )
-            s.commit()
-        
-        # 3. บันทึก ID ผู้ใช้
-        save_unique_user_id(employee_id)
-        
-        st.cache_data.clear() # ล้าง cache ของ load_data
-        return True
+            known_open = open_index.has_open(employee_id, date_str)
+        except Exception:
+            pass # โหลดดัชนีไม่ได้
+
+    # ตรวจคิวซ้ำ: Session อื่นอาจลง event ระหว่างโหลดดัชนี
+    if op == "close" and not known_open and _write_queue_idle(queue):
+        # ดัชนีไม่พบ (อาจถูกเพิ่มจาก Process อื่นหลังโหลดดัชนี): ปิดใน DB ทันทีแทนการตอบว่าไม่มี
+        try:
+            return _close_in_db(employee_id, date_str, time_str)
+        except Exception:
+            pass # DB ใช้ไม่ได้: ลงคิวไว้ให้ DB ตัดสินตอนส่ง
+
+    payload = {"op": op, "Employee_ID": employee_id, "Date": date_str, "Time": time_str}
+    open_index.pop_latest(employee_id, date_str) # start ก็ปิดกิจกรรมเดิมเช่นกัน
+    if op == "start":
+        payload.update({"Activity_Type": activity_type, "provisional_id": -time_ns()})
+        open_index.add(employee_id, date_str, payload["provisional_id"], time_str, time_str, date_str)
+    try:
+        queue.enqueue(payload)
     except Exception as e:
-        st.error(f"เกิดข้อผิดพลาดในการเริ่มพักเบรค {activity_type}: {e}")
-        return False
+        open_index.invalidate(date_str)
+        raise RuntimeError(f"ไม่สามารถบันทึกลงคิวในเครื่องได้ ({op} ID {employee_id}): {e}") from e
+    return True
+
 
 # 💥 [MODIFIED] ฟังก์ชันลบ
-def delete_log_entry(log_id):
-    """ลบ Log ตาม 'id' จาก Supabase"""
+def delete_log_entries(log_ids):
+    """💥 [NEW] ลบหลาย Log ตาม 'id' ในคำสั่งเดียว"""
+    log_ids = [int(log_id) for log_id in log_ids]
     try:
         conn = st.connection("supabase", type=SQLConnection)
         
         # 💥 [FIX 5/5] เปลี่ยนจาก conn.execute() เป็น conn.session.execute()
         with conn.session as s:
-            s.execute(
-                text('DELETE FROM time_logs WHERE id = :id;'),
-                params=[{"id": int(log_id)}]
-            )
+            deleted_ids = s.execute(
+                text('DELETE FROM time_logs WHERE id = ANY(:ids) RETURNING id;'),
+                {"ids": log_ids}
+            ).scalars().all()
             s.commit()
-            
-        st.cache_data.clear() # ล้าง cache ของ load_data
+
+        for log_id in deleted_ids:
+            get_open_activity_index().discard(int(log_id))
+        record_log_write(deleted_ids=[int(log_id) for log_id in deleted_ids])
     except Exception as e:
-        st.error(f"เกิดข้อผิดพลาดในการลบ Log ID {log_id}: {e}")
+        st.error(f"เกิดข้อผิดพลาดในการลบ Log ID {', '.join(map(str, log_ids))}: {e}")
+
+
+def go_next_log_page(next_cursor):
+    """💥 [NEW] ปุ่ม "ถัดไป": เก็บ cursor ของหน้าถัดไปไว้บน stack"""
+    st.session_state.log_cursor_stack.append(next_cursor)
+
+
+def go_prev_log_page():
+    """💥 [NEW] ปุ่ม "ก่อนหน้า": ย้อนกลับไปใช้ cursor ของหน้าก่อน"""
+    if len(st.session_state.log_cursor_stack) > 1:
+        st.session_state.log_cursor_stack.pop()
+
+
+def attach_employee_names(df, directory):
+    """💥 [MODIFIED] เติมคอลัมน์ Employee_Name / Employee_Surname (ว่างถ้าไม่พบ) ให้เฉพาะแถวที่ส่งมา
+
+    เรียกกับหน้าที่แสดง (หรือไฟล์ที่ดาวน์โหลด) เท่านั้น: ค้นหาชื่อใน EmployeeDirectory ครั้งเดียวต่อ ID
+    แทนการ merge กับ user_data ทั้งตาราง
+    """
+    names = {employee_id: directory.lookup(employee_id) or ("", "") for employee_id in pd.unique(df['Employee_ID'])}
+    employee_ids = df['Employee_ID'].astype(object)
+    return df.assign(
+        Employee_Name=employee_ids.map({k: v[0] for k, v in names.items()}).fillna(""),
+        Employee_Surname=employee_ids.map({k: v[1] for k, v in names.items()}).fillna("")
+    )
+
+
+def delete_selected_logs(log_ids, table_key):
+    """💥 [NEW] ปุ่ม "ลบรายการที่เลือก": ลบแล้วล้างการเลือกของตาราง (ตำแหน่งแถวเดิมไม่ตรงกับข้อมูลใหม่)"""
+    delete_log_entries(log_ids)
+    st.session_state.pop(table_key, None)
 def update_employee_details(employee_id, new_name, new_surname):
     """อัปเดตชื่อและนามสกุลในตาราง user_data"""
     try:
@@ -322,7 +920,7 @@ def update_employee_details(employee_id, new_name, new_surname):
             )
             s.commit()
         
-        st.cache_data.clear() # ล้าง cache ทั้งหมด
+        get_employee_directory().update(employee_id, new_name, new_surname) # 💥 [MODIFIED] Write-through
         st.session_state.last_message = ("success", f"✅ อัปเดตข้อมูล ID: {employee_id} สำเร็จ!")
         return True
     except Exception as e:
@@ -331,50 +929,96 @@ def update_employee_details(employee_id, new_name, new_surname):
 
 # --- 2. ฟังก์ชันคำนวณและแสดงผล (เหมือนเดิม) ---
 
-def format_time_display(time_str):
-    """จัดรูปแบบเวลาเป็น HH:MM"""
-    if pd.isnull(time_str) or str(time_str).lower() == 'nan':
-        return "N/A"
-    try:
-        # Supabase อาจคืนค่าเป็น HH:MM:SS.microseconds
-        time_str = str(time_str).split('.')[0]
-        return datetime.strptime(time_str, '%H:%M:%S').strftime('%H:%M')
-    except (ValueError, TypeError):
-        return str(time_str)
-
-def format_duration(minutes):
-    """จัดรูปแบบนาทีเป็น HH:MM"""
-    if pd.isnull(minutes) or (isinstance(minutes, float) and math.isnan(minutes)):
-        return "N/A"
-    try:
-        minutes = int(float(minutes)) 
-    except (ValueError, TypeError):
-        return "N/A" 
+# 💥 [MODIFIED] จัดรูปแบบเวลา/ระยะเวลาทั้งคอลัมน์ครั้งเดียวตอนโหลดข้อมูล (add_display_columns ใน _convert_log_frame)
+# แทนการเรียก format_time_display / format_duration ทีละช่องตอนแสดงผล
 
-    if minutes < 0:
-        return "00:00"
 
-    hours = int(minutes // 60)
-    mins = int(minutes % 60)
-    return f"{hours:02d}:{mins:02d}"
+def _iter_export_frames(conn, date_from, date_to, employee_id=None):
+    """💥 [NEW] แถวตาม Filter จาก DB ทีละ EXPORT_CHUNK_ROWS แถว (server-side cursor ไม่โหลดทั้งช่วงในครั้งเดียว)"""
+    sql_where, params = _log_filter_sql(date_from, date_to, employee_id)
+    sql_query = f"{SQL_SELECT_LOGS} WHERE {' AND '.join(sql_where)} {SQL_LOG_ORDER}"
+    with conn.session as s:
+        result = s.execute(text(sql_query).execution_options(stream_results=True), params)
+        columns = list(result.keys())
+        for rows in result.partitions(EXPORT_CHUNK_ROWS):
+            yield _convert_log_frame(pd.DataFrame(rows, columns=columns))
 
 
-def get_csv_content_with_bom(df_to_download):
-    """ 💥 [MODIFIED] สร้างลิงก์ดาวน์โหลด CSV จาก DataFrame พร้อม BOM """
-    try:
-        # ไม่ต้องอ่านไฟล์แล้ว ใช้ DataFrame ที่ส่งเข้ามาได้เลย
-        csv_content = df_to_download.to_csv(index=False, encoding='utf-8-sig')
-        bom = "\ufeff"
-        content_with_bom = bom + csv_content
-        return content_with_bom
-    except Exception as e:
-        st.error(f"เกิดข้อผิดพลาดในการสร้างไฟล์ CSV: {e}")
-        return None
+def export_csv_file_copy(conn, date_from, date_to, employee_id=None):
+    """💥 [NEW] สร้างไฟล์ CSV ด้วย COPY (SELECT ...) TO STDOUT — Postgres ทำ JOIN และสร้าง CSV เอง
+
+    psycopg2 เขียนข้อมูลที่ได้ลงไฟล์ชั่วคราวทีละส่วน (ไม่ผ่าน pandas) หน่วยความจำไม่โตตามจำนวนแถว
+    """
+    sql_where, params = _log_filter_sql(date_from, date_to, employee_id)
+    where = re.sub(r":(\w+)", r"%(\1)s", " AND ".join(sql_where)) # :name -> %(name)s ของ psycopg2
+    spooled = tempfile.TemporaryFile()
+    spooled.write(CSV_BOM.encode("utf-8"))
+    with conn.session as s:
+        cursor = s.connection().connection.cursor()
+        select_sql = cursor.mogrify(SQL_EXPORT_LOGS.format(where=where), params).decode("utf-8")
+        cursor.copy_expert(f"COPY ({select_sql}) TO STDOUT WITH (FORMAT csv, HEADER, ENCODING 'UTF8')", spooled)
+    spooled.seek(0)
+    return spooled
+
+
+def export_csv_file(conn, directory, date_from, date_to, employee_id=None, hot_rows=None):
+    """ 💥 [MODIFIED] สร้างไฟล์ CSV (BOM 1 ครั้ง) ของแถวตาม Filter — เรียกเมื่อกดปุ่มดาวน์โหลดเท่านั้น
+
+    ใช้เป็น data (callable) ของ st.download_button จึงรันบน Thread แยก (คำสั่ง st ในนี้จะถูกละเว้น)
+    hot_rows = แถวจาก Delta sync (ถ้ามี) ไม่งั้นอ่านจาก DB ทีละก้อน แล้วเขียน CSV ลงไฟล์ชั่วคราวทีละก้อน
+    """
+    frames = (iter_frame_chunks(hot_rows) if hot_rows is not None
+              else _iter_export_frames(conn, date_from, date_to, employee_id))
+    to_text = lambda frame: attach_employee_names(log_frame_to_text(frame), directory)
+    return spool_chunks(iter_csv_chunks(frames, EXPORT_COLUMNS, to_text))
 
 
 # -----------------------------------------------------------------
-# 💥 [NO CHANGE] ฟังก์ชัน Callback submit_activity (เหมือนเดิม)
+# 💥 [MODIFIED] ฟังก์ชัน Callback submit_activity (SUBMIT_MODE = "async": ไม่รอฐานข้อมูล)
 # -----------------------------------------------------------------
+@st.cache_resource
+def get_submit_executor():
+    """💥 [NEW] Thread pool สำหรับงานบันทึกเวลาของทุก Session (SUBMIT_MODE = "async") แยกลำดับตาม Employee_ID"""
+    return KeyedExecutor(SUBMIT_WORKERS, thread_name_prefix="submit-activity")
+
+
+def perform_activity(emp_id, activity_type, current_date_str, current_time_str):
+    """💥 [NEW] บันทึกกิจกรรม (Clock Out หรือเริ่มกิจกรรมใหม่) คืน (ประเภทข้อความ, ข้อความ) สำหรับ last_message
+
+    💥 [MODIFIED] Error ทุกกรณีกลายเป็นข้อความที่คืนไป (ไม่เรียก st.* ใน Thread pool — ข้อความจะหายไป)
+    ผู้เรียกแสดงผลใน Thread ของสคริปต์ (submit_activity / collect_finished_submissions)
+    """
+    if activity_type == "End_Activity":
+        try:
+            closed = clock_out_latest_activity(emp_id, current_date_str, current_time_str)
+        except Exception as e:
+            return ("error", f"เกิดข้อผิดพลาดในการสิ้นสุดกิจกรรม สำหรับ ID: **{emp_id}**: {e}")
+        if closed:
+            return ("success", f"✅ สิ้นสุดกิจกรรมล่าสุด สำหรับ ID: **{emp_id}** เวลา {current_time_str} เรียบร้อยแล้ว!")
+        return ("warning", f"⚠️ ไม่พบกิจกรรมที่กำลังดำเนินอยู่สำหรับ ID: **{emp_id}** วันที่ {current_date_str}")
+
+    # (activity_type คือ "Break", "Smoking", "Toilet")
+    try:
+        log_activity_start(emp_id, current_date_str, current_time_str, activity_type)
+    except Exception as e:
+        return ("error", f"เกิดข้อผิดพลาดในการเริ่มพักเบรค {activity_type}: {e}")
+    success_message = f"✅ เริ่มพักเบรค **{activity_type}** สำหรับ ID: **{emp_id}** เวลา {current_time_str} เรียบร้อยแล้ว!"
+    if activity_type == "Break":
+        success_message = f"▶️ เริ่มงาน สำหรับ ID: **{emp_id}** เวลา {current_time_str} เรียบร้อยแล้ว!"
+    elif activity_type == "Smoking":
+        success_message = f"🚭 เริ่มสูบบุหรี่ สำหรับ ID: **{emp_id}** เวลา {current_time_str} เรียบร้อยแล้ว!"
+    elif activity_type == "Toilet":
+        success_message = f"🚻 เริ่มเข้าห้องน้ำ สำหรับ ID: **{emp_id}** เวลา {current_time_str} เรียบร้อยแล้ว!"
+    return ("success", success_message)
+
+
+def reset_emp_input():
+    """ล้าง ID ที่กรอก/เลือกไว้ พร้อมรับการสแกนครั้งถัดไป"""
+    st.session_state["current_emp_id"] = ""
+    st.session_state["manual_emp_id_input_outside_form"] = ""
+    st.session_state["selectbox_chooser"] = "ค้นหา ID"
+
+
 def submit_activity(activity_type):
     """
     Callback function to handle button clicks, validation, logging,
@@ -393,41 +1037,47 @@ def submit_activity(activity_type):
     current_date_str = now_thailand.date().strftime('%Y-%m-%d')
     current_time_str = now_thailand.time().strftime('%H:%M:%S') # ใช้ Format H:M:S
 
-    # 3. Logic การบันทึก
-    if activity_type == "End_Activity":
-        if clock_out_latest_activity(emp_id, current_date_str, current_time_str):
-            # 4. ตั้งค่า Message และล้างค่า
-            st.session_state.last_message = ("success", f"✅ สิ้นสุดกิจกรรมล่าสุด สำหรับ ID: **{emp_id}** เวลา {current_time_str} เรียบร้อยแล้ว!")
-            st.session_state["current_emp_id"] = "" 
-            st.session_state["manual_emp_id_input_outside_form"] = "" 
-            st.session_state["selectbox_chooser"] = "ค้นหา ID" 
-        else:
-            st.session_state.last_message = ("warning", f"⚠️ ไม่พบกิจกรรมที่กำลังดำเนินอยู่สำหรับ ID: **{emp_id}** วันที่ {current_date_str}")
-            
-    else:
-        # (activity_type คือ "Break", "Smoking", "Toilet")
-        if log_activity_start(emp_id, current_date_str, current_time_str, activity_type):
-            success_message = f"✅ เริ่มพักเบรค **{activity_type}** สำหรับ ID: **{emp_id}** เวลา {current_time_str} เรียบร้อยแล้ว!"
-            if activity_type == "Break":
-                success_message = f"▶️ เริ่มงาน สำหรับ ID: **{emp_id}** เวลา {current_time_str} เรียบร้อยแล้ว!"
-            elif activity_type == "Smoking":
-                success_message = f"🚭 เริ่มสูบบุหรี่ สำหรับ ID: **{emp_id}** เวลา {current_time_str} เรียบร้อยแล้ว!"
-            elif activity_type == "Toilet":
-                success_message = f"🚻 เริ่มเข้าห้องน้ำ สำหรับ ID: **{emp_id}** เวลา {current_time_str} เรียบร้อยแล้ว!"
-            
-            # 4. ตั้งค่า Message และล้างค่า
-            st.session_state.last_message = ("success", success_message)
-            st.session_state["current_emp_id"] = "" 
-            st.session_state["manual_emp_id_input_outside_form"] = "" 
-            st.session_state["selectbox_chooser"] = "ค้นหา ID" 
-        else:
-            st.session_state.last_message = ("error", f"เกิดข้อผิดพลาดในการเริ่มพักเบรค {activity_type}")
+    # 3. 💥 [NEW] โหมด async: ส่งงานเข้า Thread pool แล้วคืนทันที (ผลแสดงผ่าน collect_finished_submissions)
+    if SUBMIT_MODE == "async":
+        future = get_submit_executor().submit(
+            emp_id, perform_activity, emp_id, activity_type, current_date_str, current_time_str
+        )
+        st.session_state.pending_submissions.append(future)
+        st.session_state.last_message = ("pending", f"⏳ กำลังบันทึก สำหรับ ID: **{emp_id}** เวลา {current_time_str} ...")
+        reset_emp_input()
+        return
+
+    # 4. Logic การบันทึก + ตั้งค่า Message และล้างค่า (เฉพาะเมื่อสำเร็จ)
+    st.session_state.last_message = perform_activity(emp_id, activity_type, current_date_str, current_time_str)
+    if st.session_state.last_message[0] == "success":
+        reset_emp_input()
             
     # 💥 [FIX] ลบ st.rerun() ที่ไม่จำเป็นออก (แก้ Warning: no-op)
     # on_click ใน form_submit_button จะ rerun ให้อัตโนมัติอยู่แล้ว
     # st.rerun() 
 
 
+def collect_finished_submissions():
+    """💥 [NEW] ข้อความผลของงานใน Thread pool ที่เสร็จแล้ว (นำออกจาก pending_submissions)"""
+    messages, still_pending = [], []
+    for future in st.session_state.pending_submissions:
+        if not future.done():
+            still_pending.append(future)
+        elif future.exception() is not None:
+            messages.append(("error", f"เกิดข้อผิดพลาดในการบันทึก: {future.exception()}"))
+        else:
+            messages.append(future.result())
+    st.session_state.pending_submissions = still_pending
+    return messages
+
+
+@st.fragment(run_every=SUBMIT_POLL_SECONDS)
+def watch_pending_submissions():
+    """💥 [NEW] ระหว่างมีงานที่ยังไม่เสร็จ: ตรวจเป็นระยะ แล้ว rerun ทั้งหน้าเมื่อมีงานเสร็จ (แสดงผล + ข้อมูลล่าสุด)"""
+    if any(future.done() for future in st.session_state.pending_submissions):
+        st.rerun()
+
+
 # -----------------------------------------------------------------
 # 💥 [MODIFIED] ฟังก์ชัน MAIN (ปรับ Layout)
 # -----------------------------------------------------------------
@@ -444,22 +1094,17 @@ def main():
         st.session_state["manual_emp_id_input_outside_form"] = ""
     if "last_message" not in st.session_state:
         st.session_state.last_message = None
+    if "pending_submissions" not in st.session_state:
+        st.session_state.pending_submissions = [] # 💥 [NEW] Future ของงานบันทึกที่ยังไม่แจ้งผล
     if "selectbox_chooser" not in st.session_state:
         st.session_state["selectbox_chooser"] = "ค้นหา ID"
 
     # --- 3.2 โหลดข้อมูล ---
-    df = load_data() 
-    df_users = load_user_data() 
-    existing_ids = sorted(df_users['Employee_ID'].unique().tolist()) 
-
-    # (Merge ข้อมูล - เหมือนเดิม)
-    if not df.empty and not df_users.empty:
-        df = pd.merge(df, df_users, on="Employee_ID", how="left")
-        df['Employee_Name'] = df['Employee_Name'].fillna("")
-        df['Employee_Surname'] = df['Employee_Surname'].fillna("")
-    elif not df.empty:
-        df['Employee_Name'] = ""
-        df['Employee_Surname'] = ""
+    # 💥 [MOVED] load_log_page() ย้ายไปหลังส่วน Filter (ส่งค่า Filter เข้า SQL)
+    # 💥 [MODIFIED] รายชื่อพนักงานจาก EmployeeDirectory (ค้นหาด้วย dict, รายการ ID เรียงไว้แล้ว)
+    directory = load_employee_directory()
+    existing_ids = directory.ids
+    prune_sync_tables() # 💥 [NEW] ลบ tombstone / event_id เก่า (ตาม TTL ของ Cache ไม่ใช่ทุก rerun)
 
     # -----------------------------------------------------------------
     # --- Layout หลัก ---
@@ -468,19 +1113,37 @@ def main():
     with main_col1:
         st.title("ระบบบันทึกเวลา")
         st.success("💾 เชื่อมต่อฐานข้อมูล Supabase สำเร็จ")
+        if LOG_WRITE_MODE == "queue":
+            # 💥 [NEW] สถานะคิวเขียนล่วงหน้า
+            event_schema_ready()
+            write_queue = get_write_queue()
+            pending_count, failed_count = write_queue.pending_count(), write_queue.failed_count()
+            if write_queue.last_error:
+                st.warning(f"⏳ ส่งข้อมูลเข้า Supabase ไม่ได้ชั่วคราว — เก็บไว้ในเครื่อง {pending_count} รายการ (จะส่งให้อัตโนมัติ)")
+            elif pending_count:
+                st.caption(f"⏳ กำลังส่งข้อมูลเข้า Supabase {pending_count} รายการ")
+            if failed_count:
+                st.error(f"⚠️ มี {failed_count} รายการที่บันทึกเข้า Supabase ไม่ได้ (ดูตาราง failed_events ใน {WRITE_QUEUE_FILE})")
         
         # -----------------------------------------------------------------
         # แสดง Message
         # -----------------------------------------------------------------
-        if st.session_state.last_message:
-            msg_type, msg_content = st.session_state.last_message
+        # 💥 [MODIFIED] รวมผลของงานที่เสร็จแล้ว (ข้อความ "กำลังบันทึก" ไม่ต้องแสดงถ้ามีผลแล้ว)
+        messages = collect_finished_submissions()
+        if st.session_state.last_message and not (messages and st.session_state.last_message[0] == "pending"):
+            messages.insert(0, st.session_state.last_message)
+        for msg_type, msg_content in messages:
             if msg_type == "success":
                 st.success(msg_content)
             elif msg_type == "warning":
                 st.warning(msg_content)
             elif msg_type == "error":
                 st.error(msg_content)
-            st.session_state.last_message = None 
+            elif msg_type == "pending":
+                st.info(msg_content)
+        st.session_state.last_message = None 
+        if st.session_state.pending_submissions:
+            watch_pending_submissions()
         
         # -----------------------------------------------------------------
         # 1. Selectbox (ตัวเลือกเสริม)
@@ -497,7 +1160,7 @@ def main():
             typed_val = st.session_state.manual_emp_id_input_outside_form.strip()
             st.session_state.current_emp_id = typed_val
             
-            if typed_val in existing_ids:
+            if typed_val in directory: # ค้นหาใน dict ของ EmployeeDirectory (ไม่สแกน list)
                 st.session_state.selectbox_chooser = typed_val
             else:
                 st.session_state.selectbox_chooser = "ค้นหา ID"
@@ -527,12 +1190,7 @@ def main():
         # -----------------------------------------------------------------
         with st.form("activity_form", clear_on_submit=False): 
             if emp_id_input:
-                emp_name = ""
-                emp_surname = ""
-                if not df_users.empty and emp_id_input in df_users['Employee_ID'].values:
-                    details = df_users[df_users['Employee_ID'] == emp_id_input].iloc[0]
-                    emp_name = details.get('Employee_Name', '')
-                    emp_surname = details.get('Employee_Surname', '')
+                emp_name, emp_surname = directory.lookup(emp_id_input) or ("", "")
                 full_name = f"{emp_name} {emp_surname}".strip()
                 if full_name:
                     st.info(f"ID: **{emp_id_input}** (คุณ: **{full_name}**)")
@@ -564,7 +1222,7 @@ def main():
             st.session_state["current_emp_id"] = scanned_id
             st.session_state["manual_emp_id_input_outside_form"] = scanned_id 
             
-            if scanned_id in existing_ids:
+            if scanned_id in directory: # ค้นหาใน dict ของ EmployeeDirectory (ไม่สแกน list)
                 st.session_state["selectbox_chooser"] = scanned_id
             else:
                 st.session_state["selectbox_chooser"] = "ค้นหา ID"
@@ -591,57 +1249,67 @@ def main():
         unique_ids = ["All"] + existing_ids 
         filter_id = col_filter3.selectbox("กรองตาม Employee ID", options=unique_ids, key="id_filter_key")
 
-
-        # --- สร้างตารางแสดงผล (เหมือนเดิม) ---
-        if df.empty:
-            st.info("ยังไม่มีข้อมูลการลงเวลา")
+        if filter_date_from and filter_date_to and filter_date_from > filter_date_to:
+            st.error("วันที่ From ต้องไม่เกินวันที่ To กรุณาแก้ไข")
+            st.stop() 
+
+        employee_filter = None if filter_id == "All" else filter_id
+        # 💥 [NEW] cursor ของแต่ละหน้าที่ผ่านมา (หน้าแรก = None) เริ่มใหม่เมื่อ Filter เปลี่ยน
+        view_signature = (str(filter_date_from), str(filter_date_to), filter_id)
+        if st.session_state.get("log_view_signature") != view_signature:
+            st.session_state.log_view_signature = view_signature
+            st.session_state.log_cursor_stack = [None]
+        cursor_stack = st.session_state.log_cursor_stack
+        page_number = len(cursor_stack)
+
+        # 💥 [MODIFIED] โหลดเฉพาะหน้าที่แสดง (กรองใน SQL / หน่วยความจำ, Keyset pagination สำหรับช่วงเก่า)
+        page_df, next_cursor = load_log_page(filter_date_from, filter_date_to, employee_filter, cursor_stack[-1])
+        page_df = attach_employee_names(page_df, directory) # 💥 [MODIFIED] ค้นหาชื่อเฉพาะแถวในหน้านี้
+
+        # --- สร้างตารางแสดงผล ---
+        if page_df.empty and page_number == 1:
+            st.info("ไม่พบข้อมูลการลงเวลาตามตัวกรองที่เลือก")
         else:
-            # (โค้ดกรอง display_df - เหมือนเดิม)
-            display_df = df.copy()
-            display_df['Date_Obj'] = pd.to_datetime(display_df['Date']).dt.date
-            if filter_date_from and filter_date_to:
-                if filter_date_from <= filter_date_to:
-                    display_df = display_df[
-                        (display_df['Date_Obj'] >= filter_date_from) &
-                        (display_df['Date_Obj'] <= filter_date_to)
-                    ]
-                else:
-                    st.error("วันที่ From ต้องไม่เกินวันที่ To กรุณาแก้ไข")
-                    st.stop() 
-            if filter_id != "All":
-                display_df = display_df[display_df['Employee_ID'] == filter_id]
-
-            if display_df.empty:
-                st.info("ไม่พบข้อมูลการลงเวลาตามตัวกรองที่เลือก")
-            else:
-                # (โค้ดแสดงตาราง - เหมือนเดิม)
-                display_df = display_df.drop(columns=['Date_Obj'], errors='ignore')
-                display_df = display_df.reset_index(drop=True) 
-                col_ratios = [0.5, 1, 1.5, 1, 1.2, 1, 1, 1.3] 
-                cols = st.columns(col_ratios)
-                headers = ["ลบ", "Employee ID", "ชื่อ-สกุล", "Date", "ประเภทกิจกรรม", "เวลาเริ่ม", "เวลาสิ้นสุด", "**ระยะเวลา**"]
-                for col, header in zip(cols, headers):
-                    col.markdown(f"**{header}**")
-                st.markdown('<hr style="margin: 0px 0px 0px 0px;">', unsafe_allow_html=True) 
-
-                for index, row in display_df.iterrows(): 
-                    log_id = row['id'] 
-                    cols = st.columns(col_ratios)
-                    time_style = "class='time-display'"
-                    if cols[0].button("❌", key=f"del_{log_id}_{index}", on_click=delete_log_entry, args=(log_id,), help="ลบ Log ลงเวลานี้"):
-                         st.rerun()
-                    cols[1].write(row['Employee_ID'])
-                    emp_name = row.get('Employee_Name', '')
-                    emp_surname = row.get('Employee_Surname', '')
-                    full_name = f"{emp_name} {emp_surname}".strip()
-                    cols[2].write(full_name if full_name else "N/A") 
-                    cols[3].write(row['Date'])
-                    cols[4].write(row['Activity_Type'])
-                    cols[5].markdown(f"<p {time_style}>{format_time_display(row['Start_Time'])}</p>", unsafe_allow_html=True)
-                    end_time_display = format_time_display(row['End_Time'])
-                    cols[6].markdown(f"<p {time_style}>{end_time_display}</p>", unsafe_allow_html=True)
-                    duration_display = format_duration(row['Duration_Minutes'])
-                    cols[7].markdown(f"<p {time_style}>{duration_display}</p>", unsafe_allow_html=True)
+            # 💥 [MODIFIED] ตารางเดียว (st.dataframe) แบ่งหน้า + เลือกแถวเพื่อลบ แทนการสร้าง Widget ทีละแถว
+            # เวลา Render ขึ้นกับ LOG_PAGE_SIZE ไม่ใช่จำนวนแถวทั้งหมดที่กรองได้
+            full_names = (page_df['Employee_Name'] + " " + page_df['Employee_Surname']).str.strip()
+            view_df = pd.DataFrame({
+                "Employee ID": page_df['Employee_ID'],
+                "ชื่อ-สกุล": full_names.where(full_names != "", "N/A"),
+                "Date": page_df['Date'].dt.strftime('%Y-%m-%d'),
+                "ประเภทกิจกรรม": page_df['Activity_Type'],
+                "เวลาเริ่ม": page_df['Start_Time_Display'],
+                "เวลาสิ้นสุด": page_df['End_Time_Display'],
+                "ระยะเวลา": page_df['Duration_Display'],
+            })
+
+            # Key ผูกกับ Filter + หน้า เพื่อไม่ให้การเลือกแถวค้างไปใช้กับข้อมูลชุดอื่น
+            table_key = f"log_table_{filter_date_from}_{filter_date_to}_{filter_id}_{page_number}"
+            table_event = st.dataframe(
+                view_df,
+                hide_index=True,
+                width="stretch",
+                on_select="rerun",
+                selection_mode="multi-row",
+                key=table_key
+            )
+            selected_ids = page_df['id'].iloc[table_event.selection.rows].tolist()
+
+            nav_prev_col, nav_label_col, nav_next_col, delete_col = st.columns([1, 1, 1, 2])
+            nav_prev_col.button("◀ ก่อนหน้า", key="log_prev_page_key", disabled=page_number == 1, on_click=go_prev_log_page)
+            nav_label_col.markdown(f"หน้า **{page_number}**")
+            nav_next_col.button(
+                "ถัดไป ▶", key="log_next_page_key", disabled=next_cursor is None,
+                on_click=go_next_log_page, args=(next_cursor,)
+            )
+            delete_col.button(
+                f"❌ ลบรายการที่เลือก ({len(selected_ids)})",
+                key="delete_selected_key",
+                disabled=not selected_ids,
+                on_click=delete_selected_logs,
+                args=(selected_ids, table_key),
+                help="เลือกแถวในตาราง (ช่องด้านซ้าย) แล้วกดเพื่อลบ Log ลงเวลา"
+            )
         
         # -----------------------------------------------------------------
         # 💥 [FIX] จัด Layout ใหม่ตามที่ขอ
@@ -657,10 +1325,10 @@ def main():
         with admin_col: # ใส่ในคอลัมน์ซ้าย
             st.subheader("แก้ไขข้อมูลพนักงาน")
             with st.expander("📝 (Admin) "):
-                if df_users.empty:
+                if not directory.ids:
                     st.warning("ไม่สามารถโหลดข้อมูลพนักงานเพื่อแก้ไข")
                 else:
-                    all_ids_list = df_users['Employee_ID'].tolist()
+                    all_ids_list = directory.ids
                     
                     selected_id_to_edit = st.selectbox(
                         "เลือก ID พนักงานที่จะแก้ไข:",
@@ -669,17 +1337,17 @@ def main():
                     )
                     
                     if selected_id_to_edit:
-                        current_details = df_users[df_users['Employee_ID'] == selected_id_to_edit].iloc[0]
+                        current_name, current_surname = directory.lookup(selected_id_to_edit) or ("", "")
                         
                         with st.form("edit_employee_form", clear_on_submit=False):
                             st.info(f"กำลังแก้ไข ID: {selected_id_to_edit}")
                             new_name = st.text_input(
                                 "ชื่อ (Name):", 
-                                value=current_details.get('Employee_Name', '')
+                                value=current_name
                             )
                             new_surname = st.text_input(
                                 "นามสกุล (Surname):", 
-                                value=current_details.get('Employee_Surname', '')
+                                value=current_surname
                             )
                             submitted_edit = st.form_submit_button("บันทึกการเปลี่ยนแปลง")
                             
@@ -696,15 +1364,21 @@ def main():
         # -----------------------------------------------------------------
         with download_col: # ใส่ในคอลัมน์ขวา
             st.subheader("ดาวน์โหลดข้อมูล")
-            csv_data = get_csv_content_with_bom(df) 
-            if csv_data:
-                st.download_button(
-                    label="Download Log File (.csv)",
-                    data=csv_data,
-                    file_name=f"time_logs_{datetime.now().strftime('%Y%m%d')}.csv", 
-                    mime="text/csv",
-                    key="download_button_key"
-                )
+            # 💥 [MODIFIED] สร้างไฟล์เมื่อกดปุ่มเท่านั้น (rerun ปกติไม่ต้องโหลด/แปลงข้อมูลเป็น CSV)
+            conn = st.connection("supabase", type=SQLConnection)
+            if LOG_EXPORT_MODE == "copy":
+                build_export = lambda: export_csv_file_copy(conn, filter_date_from, filter_date_to, employee_filter)
+            else:
+                # ช่วงวันล่าสุดใช้แถวจาก Delta sync (slice ไม่ copy) ส่วนช่วงเก่าอ่านจาก DB ทีละก้อนตอนกดปุ่ม
+                hot_rows = _load_hot_data(filter_date_from, filter_date_to, employee_filter) if hot_sync_covers(filter_date_from) else None
+                build_export = lambda: export_csv_file(conn, directory, filter_date_from, filter_date_to, employee_filter, hot_rows)
+            st.download_button(
+                label="Download Log File (.csv)",
+                data=build_export,
+                file_name=f"time_logs_{datetime.now().strftime('%Y%m%d')}.csv", 
+                mime="text/csv",
+                key="download_button_key"
+            )
 
 # -----------------------------------------------------------------
 # 💥 การเรียกใช้งานฟังก์ชันหลัก
@@ -0,0 +1,108 @@
+"""เปรียบเทียบ calculate_duration แบบเดิม (strptime ทีละแถว) กับ calculate_duration_batch (ทั้งคอลัมน์)
+
+รัน: python benchmarks/bench_duration.py [--rows 200000]
+ตรวจว่าผลลัพธ์ตรงกันทุกแถว (รวมกรณีข้ามเที่ยงคืน/ค่าว่าง/รูปแบบผิด) แล้วพิมพ์เวลาที่ใช้และอัตราเร่ง
+แอปไม่มีฟังก์ชันแบบทีละแถวแล้ว — reference_calculate_duration คือโค้ดเดิมของแอปที่เก็บไว้เป็นค่าอ้างอิง
+"""
+import argparse
+import os
+import sys
+import time as _time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from log_storage import calculate_duration  # noqa: E402
+from time_log_core import calculate_duration_batch  # noqa: E402
+
+# แอป -> (รูปแบบเวลาที่ calculate_duration เดิมยอมรับ, allow_hhmm ของ calculate_duration_batch)
+APP_VARIANTS = {
+    "Time_Break_app.py": (("%H:%M:%S",), False),
+    "Time_app_Break_Supabase_data.py": (("%H:%M:%S", "%H:%M"), True),
+}
+
+EDGE_CASES = [
+    ("23:50:00", "00:10:00"), ("10:00:00", "10:00:00"), ("00:00:00", "23:59:59"),
+    ("8:05:00", "09:00:00"), ("10:00", "10:30"), ("10:00:00", "10:30"),
+    ("10:00:00.5", "11:00:00"), ("24:00:00", "01:00:00"), ("10:00:60", "11:00:00"),
+    (None, "10:00:00"), ("10:00:00", np.nan), ("nan", "10:00:00"), ("", "10:00:00"),
+    (" 10:00:00", "11:00:00"), ("abc", "def"),
+]
+
+
+def reference_calculate_duration(start_time_str, end_time_str, time_formats):
+    """calculate_duration เดิมของแอป (ทีละแถวด้วย datetime.strptime) — ใช้เป็นค่าอ้างอิงเท่านั้น"""
+    if pd.isnull(start_time_str) or pd.isnull(end_time_str) or str(start_time_str).lower() == 'nan' \
+            or str(end_time_str).lower() == 'nan':
+        return np.nan
+
+    def parse(value):
+        for fmt in time_formats:
+            try:
+                return datetime.strptime(str(value), fmt).time()
+            except ValueError:
+                continue
+        return None
+
+    t_start_time, t_end_time = parse(start_time_str), parse(end_time_str)
+    if t_start_time is None or t_end_time is None:
+        return np.nan
+    base_date = datetime(2000, 1, 1)
+    t_start = datetime.combine(base_date, t_start_time)
+    t_end = datetime.combine(base_date, t_end_time)
+    if t_end < t_start:
+        t_end += pd.Timedelta(days=1)
+    return max(0, (t_end - t_start).total_seconds() / 60)
+
+
+def make_times(rows, seed):
+    """เวลาเริ่ม/จบสุ่ม (มีค่าว่าง ~5% และข้ามเที่ยงคืนบางส่วน) + กรณีพิเศษ"""
+    rng = np.random.default_rng(seed)
+    start = rng.integers(0, 24 * 3600, rows)
+    end = (start + rng.integers(0, 4 * 3600, rows)) % (24 * 3600)
+    to_text = lambda secs: pd.Series(pd.to_datetime(secs, unit="s").strftime("%H:%M:%S"), dtype=object)
+    start_text, end_text = to_text(start), to_text(end)
+    end_text[rng.random(rows) < 0.05] = np.nan # กิจกรรมที่ยังไม่ปิด
+    edge_start, edge_end = zip(*EDGE_CASES)
+    return (pd.concat([start_text, pd.Series(edge_start, dtype=object)], ignore_index=True),
+            pd.concat([end_text, pd.Series(edge_end, dtype=object)], ignore_index=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start_times, end_times = make_times(args.rows, args.seed)
+    for app_file, (time_formats, allow_hhmm) in APP_VARIANTS.items():
+        t0 = _time.perf_counter()
+        scalar = np.array([reference_calculate_duration(s, e, time_formats)
+                           for s, e in zip(start_times, end_times)], dtype=float)
+        scalar_seconds = _time.perf_counter() - t0
+
+        t0 = _time.perf_counter()
+        batch = calculate_duration_batch(start_times, end_times, allow_hhmm=allow_hhmm)
+        batch_seconds = _time.perf_counter() - t0
+
+        mismatches = np.flatnonzero(~((scalar == batch) | (np.isnan(scalar) & np.isnan(batch))))
+        assert not len(mismatches), [
+            (start_times[i], end_times[i], scalar[i], batch[i]) for i in mismatches[:10]
+        ]
+        print(f"{app_file}: {len(start_times):,} แถว | ทีละแถว {scalar_seconds:.3f}s | "
+              f"batch {batch_seconds:.3f}s | เร็วขึ้น {scalar_seconds / batch_seconds:.1f}x | ผลตรงกันทุกแถว")
+
+    # log_storage.calculate_duration (ที่ CsvLogStore / SqliteLogStore ใช้ตอน Clock Out) = รูปแบบของ Time_Break_app.py
+    for start_time, end_time in EDGE_CASES:
+        expected = reference_calculate_duration(start_time, end_time, APP_VARIANTS["Time_Break_app.py"][0])
+        actual = calculate_duration(start_time, end_time)
+        assert actual == expected or (np.isnan(actual) and np.isnan(expected)), (start_time, end_time, actual, expected)
+    print("log_storage.calculate_duration: ผลตรงกับค่าอ้างอิงทุกกรณีพิเศษ")
+
+
+if __name__ == "__main__":
+    main()
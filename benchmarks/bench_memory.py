@@ -0,0 +1,83 @@
+"""เปรียบเทียบหน่วยความจำของ DataFrame Log แบบข้อความ (เดิม) กับแบบ compact (compact_log_frame)
+
+รัน: python benchmarks/bench_memory.py [--rows 1000000]
+พิมพ์ memory_usage(deep=True) รายคอลัมน์ของทั้งสองแบบ และตรวจว่าแปลงกลับเป็นข้อความ (log_frame_to_text) ได้ค่าเดิม
+"""
+import argparse
+import os
+import sys
+import time as _time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from time_log_core import (  # noqa: E402
+    compact_log_frame, format_duration_column, format_seconds_column, log_frame_to_text, time_to_seconds
+)
+
+ACTIVITY_TYPES = ["Break", "Toilet", "Smoking"]
+
+
+def make_text_frame(rows, seed, employees=500):
+    """Log สุ่มในรูปแบบเดียวกับที่อ่านจาก CSV (ข้อความทั้งหมด, กิจกรรมที่ยังไม่ปิด ~5%)"""
+    rng = np.random.default_rng(seed)
+    start = rng.integers(6 * 3600, 20 * 3600, rows)
+    minutes = rng.integers(1, 60, rows)
+    to_text = lambda secs: pd.to_datetime(secs, unit="s").strftime("%H:%M:%S").to_numpy(dtype=object)
+    end_text = to_text((start + minutes * 60) % (24 * 3600))
+    duration = minutes.astype(float)
+    still_open = rng.random(rows) < 0.05
+    end_text[still_open] = np.nan
+    duration[still_open] = np.nan
+    dates = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+    return pd.DataFrame({
+        "Employee_ID": np.char.zfill(rng.integers(1, employees + 1, rows).astype(str), 3).astype(object),
+        "Date": dates.strftime("%Y-%m-%d").to_numpy(dtype=object),
+        "Start_Time": to_text(start),
+        "End_Time": end_text,
+        "Activity_Type": np.array(ACTIVITY_TYPES, dtype=object)[rng.integers(0, len(ACTIVITY_TYPES), rows)],
+        "Duration_Minutes": duration,
+    })
+
+
+def text_frame_with_display(df):
+    """รูปแบบเดิมใน Cache: คอลัมน์ข้อความ + ข้อความแสดงผลแบบ object"""
+    as_text = lambda values: np.asarray(format_seconds_column(time_to_seconds(values)), dtype=object)
+    return df.assign(
+        Start_Time_Display=as_text(df["Start_Time"]),
+        End_Time_Display=as_text(df["End_Time"]),
+        Duration_Display=format_duration_column(df["Duration_Minutes"]).to_numpy(),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    text_df = make_text_frame(args.rows, args.seed)
+    before = text_frame_with_display(text_df)
+    t0 = _time.perf_counter()
+    after = compact_log_frame(text_df)
+    compact_seconds = _time.perf_counter() - t0
+
+    restored = log_frame_to_text(after)
+    pd.testing.assert_frame_equal(restored, text_df, check_dtype=False)
+
+    before_usage = before.memory_usage(deep=True, index=False)
+    after_usage = after.memory_usage(deep=True, index=False)
+    mb = lambda n: n / 1024 ** 2
+    print(f"{args.rows:,} แถว (compact_log_frame ใช้เวลา {compact_seconds:.2f}s)")
+    print(f"{'คอลัมน์':<20}{'เดิม (MB)':>12}{'compact (MB)':>14}  ชนิดข้อมูล")
+    for col in before.columns:
+        print(f"{col:<20}{mb(before_usage[col]):>12.1f}{mb(after_usage[col]):>14.1f}  {after[col].dtype.name}")
+    print(f"{'รวม':<20}{mb(before_usage.sum()):>12.1f}{mb(after_usage.sum()):>14.1f}  "
+          f"(ลดลง {before_usage.sum() / after_usage.sum():.1f}x) | แปลงกลับเป็นข้อความได้ค่าเดิม")
+
+
+if __name__ == "__main__":
+    main()
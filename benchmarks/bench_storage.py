@@ -0,0 +1,499 @@
+"""วัดเวลาโหลด / เริ่มกิจกรรม / Clock Out / ลบ / แสดงผล ของทั้งสองแอปตามขนาดข้อมูล
+
+รัน: python benchmarks/bench_storage.py [--sizes 10000 100000 1000000] [--backends csv sqlite supabase]
+     [--postgres-url postgresql+psycopg2://...] [--output results.json]
+สร้าง Log สังเคราะห์ (N พนักงาน x M วัน สิ้นสุดวันนี้, Break/Smoking/Toilet, มีกิจกรรมที่ยังไม่ปิด) ลงแต่ละ Backend
+แล้วพิมพ์ผลเป็น JSON (ไฟล์ --output หรือ stdout) สำหรับเทียบระหว่างเวอร์ชัน — ความคืบหน้าพิมพ์ลง stderr
+
+csv / sqlite  = ที่เก็บของ Time_Break_app.py (log_storage) — แอปเรียกเมธอดของ LogStore ตรง ๆ
+supabase      = ฟังก์ชันของ Time_app_Break_Supabase_data.py บน Postgres ของ --postgres-url: เขียนผ่าน
+                WriteCoalescer / คิวเขียนล่วงหน้า (SQL_ACTIVITY_BATCH), โหลดผ่าน HotLogSync และ Keyset pagination
+                ใช้ Schema ชั่วคราว (bench_<pid>) ที่ถูกลบเมื่อจบ ไม่แตะตาราง time_logs เดิม
+render_app    = รันสคริปต์แอปจริงด้วย AppTest (Filter ค่าเริ่มต้น) รวมการแปลง st.dataframe เป็น Arrow
+                (Time_Break_app.py แสดงผลจาก Backend csv ซึ่งเป็นค่าเริ่มต้นของแอปเท่านั้น)
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time as _time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit import config
+from streamlit.logger import set_log_level
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from log_storage import CSV_COLUMNS, PARTITION_FORMAT, CsvLogStore, SqliteLogStore  # noqa: E402
+from time_log_core import log_frame_to_text  # noqa: E402
+
+# สัดส่วนกิจกรรม และช่วงระยะเวลา (นาที) ของแต่ละประเภท
+ACTIVITY_MIX = {"Break": 0.5, "Smoking": 0.3, "Toilet": 0.2}
+ACTIVITY_MINUTES = {"Break": (10, 30), "Smoking": (4, 12), "Toilet": (3, 10)}
+TIME_BREAK_APP = os.path.join(ROOT, "Time_Break_app.py")
+SUPABASE_APP = os.path.join(ROOT, "Time_app_Break_Supabase_data.py")
+
+# ตาราง time_logs / user_data ตามคอลัมน์ที่ Time_app_Break_Supabase_data.py ใช้ (บน Supabase มีอยู่แล้ว)
+# ส่วนที่ Delta sync / Keyset pagination ต้องใช้มาจากไฟล์ Migration ของแอป (SYNC_SCHEMA_MIGRATION)
+SUPABASE_BASE_SCHEMA = """
+CREATE TABLE time_logs (
+    id bigserial PRIMARY KEY, "Employee_ID" text NOT NULL, "Date" date NOT NULL, "Start_Time" time NOT NULL,
+    "End_Time" time, "Activity_Type" text, "Duration_Minutes" double precision
+);
+CREATE TABLE user_data ("Employee_ID" text PRIMARY KEY, "Employee_Name" text, "Employee_Surname" text)
+"""
+
+
+def make_log_frame(rows, employees, per_day, open_ratio, seed):
+    """Log สังเคราะห์ในรูปแบบข้อความเดียวกับไฟล์ CSV (เรียงตาม Date, Start_Time) วันสุดท้าย = วันนี้
+
+    แต่ละพนักงาน-วันมีกิจกรรมต่อเนื่องกันตั้งแต่ 07:00 (ห่างกัน 30-90 นาที) เฉลี่ย per_day รายการ
+    กิจกรรมสุดท้ายของวันล่าสุดยังไม่ปิด ~50% และวันอื่น ๆ ลืม Clock Out ด้วยโอกาส open_ratio
+    """
+    rng = np.random.default_rng(seed)
+    days = max(1, math.ceil(rows / (employees * per_day)))
+    first_day = pd.Timestamp(date.today()) - pd.Timedelta(days=days - 1) # ให้ Filter ค่าเริ่มต้นของแอปมีข้อมูล
+    group = np.sort(rng.integers(0, employees * days, rows)) # พนักงาน-วัน ของแต่ละแถว
+    day, employee = np.divmod(group, employees)
+    # ลำดับกิจกรรมภายในพนักงาน-วัน (0, 1, 2, ...)
+    first_of_group = np.r_[True, group[1:] != group[:-1]]
+    group_start = np.maximum.accumulate(np.where(first_of_group, np.arange(rows), 0))
+    order = np.arange(rows) - group_start
+    last_of_group = np.r_[group[1:] != group[:-1], True]
+
+    activity = rng.choice(list(ACTIVITY_MIX), rows, p=list(ACTIVITY_MIX.values()))
+    low = np.vectorize(lambda a: ACTIVITY_MINUTES[a][0])(activity)
+    high = np.vectorize(lambda a: ACTIVITY_MINUTES[a][1])(activity)
+    minutes = rng.integers(low, high + 1)
+    start = (7 * 3600 + order * rng.integers(30, 91, rows) * 60 + rng.integers(0, 60, rows)) % 86400
+    end = (start + minutes * 60) % 86400
+
+    still_open = last_of_group & np.where(day == days - 1, rng.random(rows) < 0.5, rng.random(rows) < open_ratio)
+    to_text = lambda secs: pd.to_datetime(secs, unit="s").strftime("%H:%M:%S").to_numpy(dtype=object)
+    end_text = to_text(end)
+    end_text[still_open] = np.nan
+    duration = minutes.astype(float)
+    duration[still_open] = np.nan
+
+    df = pd.DataFrame({
+        "Employee_ID": np.char.zfill((employee + 1).astype(str), 5).astype(object),
+        "Date": (first_day + pd.to_timedelta(day, unit="D")).strftime("%Y-%m-%d").to_numpy(dtype=object),
+        "Start_Time": to_text(start),
+        "End_Time": end_text,
+        "Activity_Type": activity.astype(object),
+        "Duration_Minutes": duration,
+    })
+    return df.sort_values(["Date", "Start_Time"], kind="stable", ignore_index=True), days
+
+
+def date_range(df):
+    """(วันแรก, วันสุดท้าย) ของ Log ที่เรียงแล้ว"""
+    return date.fromisoformat(df["Date"].iloc[0]), date.fromisoformat(df["Date"].iloc[-1])
+
+
+# --- เตรียมข้อมูลลงแต่ละ Backend ---
+
+def seed_csv(workdir, df):
+    """เขียน Log ลงไฟล์หลักของแต่ละ Partition (ไม่มี Journal) ใน LOGS_DIR ของ Time_Break_app.py เมื่อ HOME = workdir
+
+    Backend ทุกตัวคืน factory ของ Store ใหม่ที่ Cache ว่าง (ข้อมูลอยู่ใน workdir ที่ถูกลบเมื่อจบ)
+    """
+    logs_dir = os.path.join(workdir, "Desktop", "TimeLogs")
+    store = CsvLogStore(logs_dir)
+    store.prepare()
+    for key, part in df.groupby(pd.to_datetime(df["Date"]).dt.strftime(PARTITION_FORMAT)):
+        store.save_partition(key, part.reset_index(drop=True))
+    return lambda: CsvLogStore(logs_dir)
+
+
+def seed_sqlite(workdir, df):
+    path = os.path.join(workdir, "time_logs.sqlite3")
+    SqliteLogStore(path).prepare()
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO time_logs (Employee_ID, Date, Start_Time, End_Time, Activity_Type, Duration_Minutes) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            df[CSV_COLUMNS].astype(object).where(df[CSV_COLUMNS].notna(), None).itertuples(index=False, name=None)
+        )
+    return lambda: _prepared(SqliteLogStore(path))
+
+
+def _prepared(store):
+    store.prepare()
+    return store
+
+
+def migration_statements(path):
+    """คำสั่งในไฟล์ Migration ทีละคำสั่ง (ข้ามคอมเมนต์และคำสั่งของ psql เช่น \\set) สำหรับรันแบบ autocommit
+
+    รันทีละคำสั่งเหมือน psql -f เพราะ CREATE INDEX CONCURRENTLY อยู่ใน Transaction / หลายคำสั่งรวมกันไม่ได้
+    """
+    statements, lines, in_body = [], [], False
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            stripped = line.strip()
+            if not in_body and (not stripped or stripped.startswith(("--", "\\"))):
+                continue
+            lines.append(line)
+            in_body ^= line.count("$$") % 2 == 1 # เนื้อฟังก์ชัน $$ ... $$ มี ; ได้
+            if not in_body and stripped.endswith(";"):
+                statements.append("".join(lines))
+                lines = []
+    return statements
+
+
+def supabase_url(url):
+    """URL ของ --postgres-url ที่ตั้ง search_path เป็น Schema ชั่วคราว (ทั้งแอปและ AppTest ใช้ URL นี้)"""
+    from sqlalchemy.engine import make_url
+    schema = f"bench_{os.getpid()}"
+    return schema, make_url(url).update_query_dict({"options": f"-csearch_path={schema}"})
+
+
+def seed_supabase(engine, schema, df, employees):
+    """สร้าง Schema ชั่วคราว + ตาราง, COPY Log และรายชื่อพนักงาน แล้วรัน Migration ของแอป (เหมือนตารางเดิมบน Supabase)"""
+    import Time_app_Break_Supabase_data as app
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.exec_driver_sql(f"CREATE SCHEMA {schema}")
+        for statement in SUPABASE_BASE_SCHEMA.split(";"):
+            conn.exec_driver_sql(statement)
+    users = pd.DataFrame({"Employee_ID": np.char.zfill(np.arange(1, employees + 1).astype(str), 5)})
+    users["Employee_Name"] = "Name" + users["Employee_ID"]
+    users["Employee_Surname"] = "Surname" + users["Employee_ID"]
+    raw = engine.raw_connection()
+    try:
+        for table, frame in (("time_logs", df[CSV_COLUMNS]), ("user_data", users)):
+            with tempfile.TemporaryFile("w+", encoding="utf-8") as buf:
+                frame.to_csv(buf, index=False, header=False)
+                buf.seek(0)
+                columns = ", ".join(f'"{column}"' for column in frame.columns)
+                raw.cursor().copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buf)
+        raw.commit()
+    finally:
+        raw.close()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for statement in migration_statements(os.path.join(ROOT, app.SYNC_SCHEMA_MIGRATION)):
+            conn.exec_driver_sql(statement)
+        # แถวเดิมแก้ไขล่าสุดเมื่อวาน (ไม่งั้น Delta sync ใน SYNC_OVERLAP แรกดึงทุกแถวที่ Migration เพิ่งตั้ง updated_at)
+        conn.exec_driver_sql("ALTER TABLE time_logs DISABLE TRIGGER time_logs_touch")
+        conn.exec_driver_sql("UPDATE time_logs SET updated_at = now() - interval '1 day'")
+        conn.exec_driver_sql("ALTER TABLE time_logs ENABLE TRIGGER time_logs_touch")
+        conn.exec_driver_sql("VACUUM ANALYZE time_logs")
+        conn.exec_driver_sql("ANALYZE user_data")
+
+
+@contextmanager
+def supabase_connection(url):
+    """ให้ st.connection("supabase") ของแอปชี้ไปที่ url (secrets.toml ชั่วคราว) ตลอดการวัด แล้วลบ Schema เมื่อจบ"""
+    from sqlalchemy import create_engine
+
+    schema, bench_url = supabase_url(url)
+    url_text = bench_url.render_as_string(hide_password=False)
+    with tempfile.TemporaryDirectory() as secrets_dir:
+        secrets_file = os.path.join(secrets_dir, "secrets.toml")
+        with open(secrets_file, "w", encoding="utf-8") as handle:
+            handle.write(f"[connections.supabase]\nurl = {json.dumps(url_text)}\n")
+        config.set_option("secrets.files", [secrets_file])
+        engine = create_engine(bench_url)
+        try:
+            yield engine, schema, url_text
+        finally:
+            st.cache_resource.clear() # ปิด Connection pool ของแอปก่อนลบ Schema
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+            engine.dispose()
+
+
+# --- การวัด ---
+
+def timed(fn):
+    t0 = _time.perf_counter()
+    result = fn()
+    return (_time.perf_counter() - t0) * 1000, result
+
+
+def summarize(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        "repeats": int(samples.size),
+        "mean_ms": round(float(samples.mean()), 3),
+        "median_ms": round(float(np.median(samples)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "min_ms": round(float(samples.min()), 3),
+    }
+
+
+@contextmanager
+def home_directory(path):
+    """ตั้ง HOME ชั่วคราว (Time_Break_app.py เก็บ Log ที่ ~/Desktop/TimeLogs)"""
+    saved = {name: os.environ.get(name) for name in ("HOME", "USERPROFILE")}
+    os.environ.update(HOME=path, USERPROFILE=path)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def render_app(script, repeats, secrets=None):
+    """รันสคริปต์แอปด้วย AppTest: รันแรกหลังล้าง Cache (โหลดข้อมูลจริง) และรันซ้ำ (Rerun ปกติของผู้ใช้)
+
+    แต่ละรันรวมการโหลดตาม Filter ค่าเริ่มต้น สร้างตาราง และแปลง st.dataframe เป็น Arrow ที่ส่งให้เบราว์เซอร์
+    """
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    at = AppTest.from_file(script, default_timeout=600)
+    at.secrets.update(secrets or {})
+
+    def run():
+        at.run()
+        errors = [element.value for element in at.exception] + [element.value for element in at.error]
+        if errors or not len(at.dataframe):
+            raise RuntimeError(f"{os.path.basename(script)} แสดงผลไม่สำเร็จ: {errors or 'ไม่มีตาราง'}")
+        return len(at.dataframe[0].value)
+
+    first_ms, rendered_rows = timed(run)
+    reruns = [timed(run)[0] for _ in range(repeats)]
+    return {
+        "render_app_first": dict(summarize([first_ms]), rendered_rows=rendered_rows),
+        "render_app_rerun": dict(summarize(reruns), rendered_rows=rendered_rows),
+    }
+
+
+def render_iterrows(log_index, day, max_rows):
+    """เส้นทางแสดงผลเดิม: วน iterrows() ทุกแถวที่กรองได้ แล้วสร้างข้อความทีละช่อง (จำกัด max_rows แถว)"""
+    display_df = log_frame_to_text(log_index.select(day, day, None).iloc[:max_rows])
+    cells = []
+    for row_id, row in display_df.iterrows():
+        end_time = row["End_Time"] if isinstance(row["End_Time"], str) else "N/A"
+        duration = row["Duration_Minutes"]
+        cells.append((
+            row_id, row["Employee_ID"], row["Date"], row["Activity_Type"], row["Start_Time"][:5], end_time[:5],
+            "N/A" if pd.isna(duration) else f"{int(duration // 60):02d}:{int(duration % 60):02d}",
+        ))
+    return len(cells)
+
+
+def bench_backend(make_store, df, args, rng):
+    """วัดทุกการทำงานของ LogStore หนึ่ง (Time_Break_app.py) คืน dict: ชื่อการทำงาน -> สถิติเวลา (+ รายละเอียด)"""
+    date_from, date_to = date_range(df)
+    last_day = date_to.strftime("%Y-%m-%d")
+    results = {}
+
+    # โหลดครั้งแรก (Store ใหม่ = Cache ว่าง) และโหลดซ้ำโดยไม่มีการเขียน
+    cold = []
+    for _ in range(args.load_repeats):
+        store = make_store()
+        cold.append(timed(lambda: store.load_index(date_from, date_to))[0])
+    results["load_cold"] = summarize(cold)
+    results["load_warm"] = summarize([timed(lambda: store.load_index(date_from, date_to))[0]
+                                      for _ in range(args.repeats)])
+
+    # เริ่มกิจกรรม (ปิดอันเดิมของพนักงานในวันนั้นด้วย) / Clock Out / โหลดหลังเขียน
+    employees = df.loc[df["Date"] == last_day, "Employee_ID"].unique()
+    start, clock_out, load_after_write = [], [], []
+    for i in range(args.repeats):
+        employee_id = str(rng.choice(employees))
+        at = f"23:{i // 60 % 60:02d}:{i % 60:02d}"
+        start.append(timed(lambda: store.start_activity(employee_id, last_day, at, "Break"))[0])
+        load_after_write.append(timed(lambda: store.load_index(date_from, date_to))[0])
+        clock_out.append(timed(lambda: store.clock_out_latest(employee_id, last_day, at))[0])
+    results["start_activity"] = summarize(start)
+    results["clock_out"] = summarize(clock_out)
+    results["load_after_write"] = summarize(load_after_write)
+
+    # ลบทีละแถว (สุ่มจากข้อมูลเดิม)
+    row_ids = store.load_index(date_from, date_to).frame.index.to_numpy()
+    targets = rng.choice(row_ids, size=min(args.repeats, len(row_ids)), replace=False).tolist()
+    results["delete"] = summarize([timed(lambda: store.delete_entries([row_id]))[0] for row_id in targets])
+
+    # แสดงผลแบบเดิม (iterrows) ตาม Filter ค่าเริ่มต้นของแอป (วันนี้) — ค่าอ้างอิงสำหรับ render_app
+    log_index = store.load_index(date_from, date_to)
+    iter_samples = [timed(lambda: render_iterrows(log_index, date_to, args.iterrows_max_rows))
+                    for _ in range(args.load_repeats)]
+    results["render_iterrows"] = dict(summarize([ms for ms, _ in iter_samples]), rendered_rows=iter_samples[0][1])
+    return results
+
+
+def bench_supabase(url_text, workdir, df, args, rng):
+    """วัดฟังก์ชันของ Time_app_Break_Supabase_data.py ที่หน้าแอปเรียกจริง (ข้อมูลถูก seed_supabase แล้ว)"""
+    import Time_app_Break_Supabase_data as app
+
+    st.cache_data.clear()
+    st.cache_resource.clear() # HotLogSync / ดัชนี / รายชื่อ / WriteCoalescer ใหม่ของชุดข้อมูลนี้
+    date_from, date_to = date_range(df)
+    today = date_to.strftime("%Y-%m-%d")
+    view_from = date_to - timedelta(days=30) # Filter ค่าเริ่มต้นของแอป (30 วันล่าสุด)
+    results = {}
+
+    # โหลดหน้าแรกของ Filter ค่าเริ่มต้น: HotLogSync โหลดเต็ม (ครั้งแรก) / ในหน่วยความจำ / Delta sync
+    cold = []
+    for _ in range(args.load_repeats):
+        app.get_hot_log_sync.clear()
+        cold.append(timed(lambda: app.load_log_page(view_from, date_to))[0])
+    results["load_cold"] = summarize(cold)
+    results["load_warm"] = summarize([timed(lambda: app.load_log_page(view_from, date_to))[0]
+                                      for _ in range(args.repeats)])
+
+    def load_delta():
+        app.get_hot_log_sync().mark_stale()
+        return app.load_log_page(view_from, date_to)
+    results["load_delta"] = summarize([timed(load_delta)[0] for _ in range(args.repeats)])
+
+    # Keyset pagination (ช่วงวันที่เก่ากว่า HotLogSync) ทั้งช่วงข้อมูล: หน้าแรก และหน้าที่ 10 (ตาม cursor)
+    def keyset_page(after):
+        app._load_log_page_keyset.clear() # วัดคำสั่ง SQL ไม่ใช่ Cache
+        return app._load_log_page_keyset(date_from, date_to, None, after)
+    cursor = None
+    for _ in range(9):
+        cursor = keyset_page(cursor)[1]
+    results["load_page_keyset_first"] = summarize([timed(lambda: keyset_page(None))[0] for _ in range(args.repeats)])
+    results["load_page_keyset_page10"] = summarize([timed(lambda: keyset_page(cursor))[0]
+                                                    for _ in range(args.repeats)])
+
+    # เขียนตรง (LOG_WRITE_MODE = "direct"): WriteCoalescer -> SQL_ACTIVITY_BATCH ทีละรายการ และพร้อมกันหลาย Session
+    employees = df.loc[df["Date"] == today, "Employee_ID"].unique()
+    app.LOG_WRITE_MODE = "direct"
+    start, clock_out, load_after_write = [], [], []
+    for i in range(args.repeats):
+        employee_id = str(rng.choice(employees))
+        at = f"23:{i // 60 % 60:02d}:{i % 60:02d}"
+        start.append(timed(lambda: app.log_activity_start(employee_id, today, at, "Break"))[0])
+        load_after_write.append(timed(lambda: app.load_log_page(view_from, date_to))[0])
+        clock_out.append(timed(lambda: app.clock_out_latest_activity(employee_id, today, at))[0])
+    results["start_activity"] = summarize(start)
+    results["clock_out"] = summarize(clock_out)
+    results["load_after_write"] = summarize(load_after_write)
+
+    burst_size = min(args.burst, len(employees))
+    bursts = []
+    with ThreadPoolExecutor(burst_size) as pool:
+        for i in range(args.load_repeats):
+            burst_ids = rng.choice(employees, size=burst_size, replace=False).tolist()
+            at = f"22:{i // 60 % 60:02d}:{i % 60:02d}"
+            bursts.append(timed(lambda: list(pool.map(
+                lambda employee_id: app.log_activity_start(employee_id, today, at, "Smoking"), burst_ids
+            )))[0])
+    results["start_activity_burst"] = dict(summarize(bursts), writes=burst_size,
+                                           writes_per_second=round(burst_size / (np.median(bursts) / 1000), 1))
+
+    # คิวเขียนล่วงหน้า (LOG_WRITE_MODE = "queue" ค่าเริ่มต้น): เวลาที่ปุ่มกดรอ และเวลาส่งทั้งคิวเข้า Postgres
+    app.LOG_WRITE_MODE = "queue"
+    app.WRITE_QUEUE_FILE = os.path.join(workdir, "time_log_queue.sqlite3")
+    queued = []
+    for i in range(args.repeats):
+        employee_id = str(rng.choice(employees))
+        queued.append(timed(lambda: app.log_activity_start(employee_id, today, f"21:{i // 60 % 60:02d}:{i % 60:02d}",
+                                                           "Toilet"))[0])
+    queue = app.get_write_queue()
+    drain_ms, _ = timed(lambda: queue.flush(timeout=600))
+    pending, failed = queue.pending_count(), queue.failed_count()
+    queue.close()
+    if pending or failed:
+        raise RuntimeError(f"คิวเขียนล่วงหน้าส่งไม่ครบ (ค้าง {pending}, ล้มเหลว {failed})")
+    results["start_activity_queued"] = summarize(queued)
+    results["queue_drain"] = dict(summarize([drain_ms]), events=len(queued))
+
+    # ลบทีละแถว (สุ่มจาก id ของข้อมูลเดิม: COPY ได้ id 1..N)
+    targets = (rng.choice(len(df), size=min(args.repeats, len(df)), replace=False) + 1).tolist()
+    results["delete"] = summarize([timed(lambda: app.delete_log_entries([log_id]))[0] for log_id in targets])
+
+    # แสดงผลทั้งหน้าแอป: รันสำเนาของสคริปต์ใน workdir (คิวเขียนล่วงหน้าอยู่ข้างไฟล์สคริปต์ ไม่ใช้ไฟล์คิวของ repo)
+    script = shutil.copy(SUPABASE_APP, os.path.join(workdir, os.path.basename(SUPABASE_APP)))
+    results.update(render_app(script, args.repeats, {"connections": {"supabase": {"url": url_text}}}))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--backends", nargs="+", default=["csv", "sqlite"], choices=["csv", "sqlite", "supabase"])
+    parser.add_argument("--postgres-url", help="SQLAlchemy URL ของ Postgres (เพิ่ม supabase เข้า --backends อัตโนมัติ)")
+    parser.add_argument("--employees", type=int, default=200)
+    parser.add_argument("--per-day", type=float, default=5.0, help="จำนวนกิจกรรมเฉลี่ยต่อพนักงานต่อวัน")
+    parser.add_argument("--open-ratio", type=float, default=0.01, help="โอกาสลืม Clock Out ในวันก่อน ๆ")
+    parser.add_argument("--repeats", type=int, default=30, help="จำนวนครั้งของการทำงานที่เร็ว (เขียน/ลบ/แสดงผล)")
+    parser.add_argument("--load-repeats", type=int, default=3, help="จำนวนครั้งของการทำงานที่ช้า (โหลดครั้งแรก/iterrows)")
+    parser.add_argument("--burst", type=int, default=20, help="จำนวนการเขียนพร้อมกัน (หลาย Session) ของ supabase")
+    parser.add_argument("--iterrows-max-rows", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="ไฟล์ JSON ผลลัพธ์ (ไม่ระบุ = stdout)")
+    args = parser.parse_args()
+    args.backends = list(dict.fromkeys(args.backends + (["supabase"] if args.postgres_url else [])))
+    if "supabase" in args.backends and not args.postgres_url:
+        parser.error("--backends supabase ต้องระบุ --postgres-url")
+    # st.* ที่ถูกเรียกนอก streamlit run (ฟังก์ชันของแอป / ล้าง Cache) พิมพ์คำเตือนทุกครั้ง — เหลือเฉพาะ Error
+    config.set_option("logger.level", "error")
+    set_log_level("error")
+
+    report = {
+        "benchmark": "bench_storage",
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "pandas": pd.__version__, "numpy": np.__version__, "sqlite": sqlite3.sqlite_version},
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("output", "postgres_url")},
+        "results": [],
+    }
+    with ExitStack() as stack:
+        if "supabase" in args.backends:
+            engine, schema, url_text = stack.enter_context(supabase_connection(args.postgres_url))
+        for rows in args.sizes:
+            df, days = make_log_frame(rows, args.employees, args.per_day, args.open_ratio, args.seed)
+            dataset = {"rows": rows, "employees": args.employees, "days": days,
+                       "open_rows": int(df["End_Time"].isna().sum())}
+            for backend in args.backends:
+                print(f"[{backend}] {rows:,} แถว ({days} วัน) ...", file=sys.stderr, flush=True)
+                rng = np.random.default_rng(args.seed)
+                with tempfile.TemporaryDirectory() as workdir:
+                    if backend == "supabase":
+                        seed_ms, _ = timed(lambda: seed_supabase(engine, schema, df, args.employees))
+                        operations = bench_supabase(url_text, workdir, df, args, rng)
+                    else:
+                        seed_ms, make_store = timed(lambda: (
+                            seed_csv(workdir, df) if backend == "csv" else seed_sqlite(workdir, df)
+                        ))
+                        operations = bench_backend(make_store, df, args, rng)
+                        if backend == "csv":
+                            with home_directory(workdir):
+                                operations.update(render_app(TIME_BREAK_APP, args.repeats))
+                for operation, stats in operations.items():
+                    report["results"].append(dict(backend=backend, operation=operation, **dataset, **stats))
+                report["results"].append(dict(backend=backend, operation="seed", **dataset,
+                                              **summarize([seed_ms])))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+        print(f"บันทึกผลที่ {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
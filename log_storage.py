@@ -0,0 +1,759 @@
+import os
+import re
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from time import monotonic
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl # POSIX
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+from time_log_core import (
+    OpenActivityIndex, LogFrameIndex, TIME_MISSING, add_display_columns, calculate_duration_batch,
+    compact_log_frame, concat_log_frames, log_frame_to_text, time_to_seconds, upsert_log_rows
+)
+
+# -----------------------------------------------------------------
+# 💥 [NEW] ที่เก็บ Log ลงเวลาแบบเปลี่ยน Backend ได้: CSV รายเดือน / SQLite ในเครื่อง
+# Supabase/Postgres ไม่เป็น Backend ของ LogStore (ตั้งใจ): Time_app_Break_Supabase_data.py (และ Time_Break_app_camera_old.py
+# ที่เปิดแอปนั้น) รวมการเขียนจากทุก Session เป็นชุด (WriteCoalescer / คิวเขียนล่วงหน้า) และซิงก์ Cache แบบ delta
+# ซึ่งไม่เข้ากับเมธอดทีละรายการแบบ synchronous ของ LogStore — ที่เก็บในเครื่อง (CSV/SQLite) ใช้ LogStore เท่านั้น
+# ทุก Backend มีเมธอดตาม LogStore และคืน DataFrame แบบ compact (compact_log_frame) ที่มีคอลัมน์
+# ตาม CSV_COLUMNS + DISPLAY_COLUMNS, Index = Row ID ของ Backend นั้น — ไม่มีการเรียก streamlit ในไฟล์นี้
+# -----------------------------------------------------------------
+
+CSV_COLUMNS = ['Employee_ID', 'Date', 'Start_Time', 'End_Time', 'Activity_Type', 'Duration_Minutes']
+# Journal: Op = 'start' (แถวใหม่) / 'close' (End_Time + Duration) / 'delete', Row_Index = ลำดับแถวใน Partition
+JOURNAL_COLUMNS = ['Op', 'Row_Index'] + CSV_COLUMNS
+# ไฟล์หลักเก็บ Row_Index ไว้ในคอลัมน์แรก: Row ID คงเดิมหลัง Compaction (ไฟล์เดิมที่ไม่มีคอลัมน์นี้ใช้ลำดับบรรทัด)
+BASE_COLUMNS = ['Row_Index'] + CSV_COLUMNS
+
+# แบ่งไฟล์ตามเดือน (Partition): time_logs_2025-01.csv + time_logs_2025-01_journal.csv
+PARTITION_FORMAT = "%Y-%m"
+PARTITION_FILE_PATTERN = "time_logs_{}.csv"
+PARTITION_JOURNAL_PATTERN = "time_logs_{}_journal.csv"
+PARTITION_FILE_REGEX = re.compile(r"^time_logs_(\d{4}-\d{2})(?:_journal)?\.csv$")
+ROW_ID_SEP = "#" # Row ID ของ CSV = "<Partition>#<ลำดับแถวใน Partition>" เช่น "2025-01#42"
+LOCK_FILE_PATTERN = ".time_logs_{}.lock" # ไฟล์ล็อกของแต่ละ Partition (ไม่ตรงกับ PARTITION_FILE_REGEX)
+ROW_COUNTER_PATTERN = ".time_logs_{}.next_row" # ลำดับแถวถัดไปของ Partition (ไม่ลดลง: Row ID ที่ถูกลบไม่ถูกนำมาใช้ซ้ำ)
+
+
+def calculate_duration(start_time_str, end_time_str):
+    """ระยะเวลาเป็นนาที (เวลาจบน้อยกว่าเวลาเริ่ม = ข้ามเที่ยงคืน, เวลาว่าง/อ่านไม่ได้ = NaN)"""
+    return float(calculate_duration_batch([start_time_str], [end_time_str])[0])
+
+
+def empty_log_frame():
+    """DataFrame ว่างที่มีคอลัมน์และชนิดข้อมูลเหมือนข้อมูลที่ Backend คืน"""
+    return compact_log_frame(pd.DataFrame(columns=CSV_COLUMNS))
+
+
+class LogStore(ABC):
+    """ส่วนต่อประสาน (interface) ของที่เก็บ Log — Backend ต้อง implement ทุกเมธอด (สร้าง instance ไม่ได้ถ้าขาด)
+
+    การเขียนแต่ละครั้งเป็น atomic และเห็นผลทันทีใน load_index ครั้งถัดไป (รวมการเขียนจาก Process อื่น
+    ตามที่ Backend รองรับ) ข้อผิดพลาดโยนเป็น Exception ให้แอปแสดงผลเอง
+    """
+
+    location = "" # ที่เก็บข้อมูล (แสดงในหน้าแอป)
+
+    @abstractmethod
+    def prepare(self):
+        """เตรียมที่เก็บ (โฟลเดอร์ / ตาราง / ดัชนี) — เรียกครั้งเดียวตอนเริ่มแอป"""
+
+    @abstractmethod
+    def load_index(self, date_from, date_to):
+        """LogFrameIndex ของข้อมูลที่ครอบคลุมช่วงวันที่ (อาจมีแถวนอกช่วงติดมา ให้กรองต่อด้วย select)"""
+
+    @abstractmethod
+    def start_activity(self, employee_id, date_str, start_time_str, activity_type):
+        """ปิดกิจกรรมล่าสุดที่ยังเปิดอยู่ของพนักงานในวันนั้น (เวลาจบ = เวลาเริ่มใหม่) แล้วเพิ่มแถวใหม่ คืน Row ID"""
+
+    @abstractmethod
+    def clock_out_latest(self, employee_id, date_str, end_time_str):
+        """ปิดกิจกรรมล่าสุดที่ยังเปิดอยู่ คืน True ถ้ามีแถวถูกปิด"""
+
+    @abstractmethod
+    def delete_entries(self, row_ids):
+        """ลบหลายแถว คืน list ของ Row ID ที่ลบได้จริง (ไม่พบ = ข้าม)"""
+
+    @abstractmethod
+    def raw_frames(self, date_from, date_to):
+        """list ของ (ชื่อแหล่งข้อมูล, DataFrame ข้อความดิบ) สำหรับส่วน "ดูข้อมูลดิบ" ของแอป"""
+
+
+# -----------------------------------------------------------------
+# Backend: CSV รายเดือน + Journal (append-only)
+# -----------------------------------------------------------------
+
+def _read_csv_or_empty(file_path, columns):
+    """อ่านไฟล์ CSV ทุกคอลัมน์เป็น string (คืน DataFrame ว่างถ้าไม่มีไฟล์/ไฟล์ว่าง)"""
+    if not os.path.exists(file_path):
+        return pd.DataFrame(columns=columns)
+    try:
+        # อ่านเป็น str ทั้งหมด เพื่อไม่ให้ ID อย่าง "00123" กลายเป็นตัวเลข
+        return pd.read_csv(file_path, dtype=str)
+    except pd.errors.EmptyDataError: # กรณีไฟล์ว่างเปล่า
+        return pd.DataFrame(columns=columns)
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Advisory lock ข้าม Process บนไฟล์ path (รอจนได้ล็อก)
+
+    POSIX ใช้ fcntl.flock (shared = ผู้อ่านหลายรายพร้อมกันได้), Windows ใช้ msvcrt.locking ซึ่งมีแต่แบบ exclusive
+    ล็อกผูกกับ file handle จึงกันกันเองได้ทั้งระหว่าง Process และระหว่าง Thread ที่เปิดไฟล์แยกกัน
+    """
+    with open(path, 'a+b') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1) # ลองซ้ำ 10 ครั้ง (~10 วินาที) แล้ว OSError
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def write_file_atomic(file_path, write):
+    """เขียนไฟล์ใหม่ทั้งไฟล์แบบ atomic: write(handle) ลงไฟล์ชั่วคราวในโฟลเดอร์เดียวกัน, fsync แล้ว os.replace
+
+    ผู้อ่านเห็นไฟล์เดิมทั้งไฟล์ หรือไฟล์ใหม่ทั้งไฟล์เท่านั้น (ไม่มีไฟล์ที่เขียนค้างครึ่งเดียว)
+    """
+    temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp" # สิทธิ์ไฟล์ตาม umask เหมือนไฟล์ปกติ
+    try:
+        with open(temp_path, 'w', encoding='utf-8', newline='') as handle:
+            write(handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def make_row_id(key, row_index):
+    """Row ID ที่ไม่ซ้ำข้าม Partition: <Partition>#<ลำดับแถว>"""
+    return f"{key}{ROW_ID_SEP}{int(row_index)}"
+
+
+def split_row_id(row_id):
+    """แยก Row ID กลับเป็น (Partition, ลำดับแถว)"""
+    key, row_index = str(row_id).split(ROW_ID_SEP)
+    return key, int(row_index)
+
+
+def _fold_journal(df, journal):
+    """นำรายการใน Journal (start / close / delete) มาประกอบกับข้อมูลหลักตามลำดับที่บันทึก"""
+    # overlay: Row_Index -> แถวใหม่ (dict ครบทุกคอลัมน์), แพตช์ปิดกิจกรรม (dict เฉพาะ End/Duration) หรือ None (ถูกลบ)
+    overlay = {}
+    for op, row_index, *values in journal[JOURNAL_COLUMNS].itertuples(index=False, name=None):
+        row_index = int(row_index)
+        record = dict(zip(CSV_COLUMNS, values))
+        if op == 'start':
+            overlay[row_index] = record
+        elif op == 'close':
+            close_patch = {'End_Time': record['End_Time'], 'Duration_Minutes': record['Duration_Minutes']}
+            if row_index not in overlay:
+                overlay[row_index] = close_patch
+            elif overlay[row_index] is not None:
+                overlay[row_index].update(close_patch)
+        elif op == 'delete':
+            overlay[row_index] = None
+
+    new_rows = {i: rec for i, rec in overlay.items() if rec is not None and len(rec) == len(CSV_COLUMNS)}
+    close_patches = {i: rec for i, rec in overlay.items() if rec is not None and len(rec) < len(CSV_COLUMNS)}
+    # แถวที่ถูกลบ หรือถูกแทนที่ด้วยแถวใหม่ (Index เดิมถูกนำมาใช้ซ้ำหลังการลบ)
+    dropped = [i for i, rec in overlay.items() if rec is None or i in new_rows]
+
+    df = df.drop(index=df.index.intersection(dropped))
+    if close_patches:
+        patch_df = pd.DataFrame.from_dict(close_patches, orient='index')
+        target = patch_df.index.intersection(df.index)
+        df.loc[target, ['End_Time', 'Duration_Minutes']] = patch_df.loc[target, ['End_Time', 'Duration_Minutes']]
+    if new_rows:
+        df = pd.concat([df, pd.DataFrame.from_dict(new_rows, orient='index', columns=CSV_COLUMNS)])
+    return df.sort_index()
+
+
+def build_text_log_frame(base_file, journal_file):
+    """อ่านไฟล์หลัก + Journal แล้วประกอบเป็น DataFrame ปัจจุบัน (คอลัมน์ข้อความ ไม่ผ่าน Cache)
+
+    ใช้ตอนย้ายข้อมูล/Compaction ที่ต้องเขียนกลับลงไฟล์ตามรูปแบบเดิม
+    """
+    df = _read_csv_or_empty(base_file, BASE_COLUMNS)
+    if 'Row_Index' in df.columns:
+        df.index = pd.Index(df.pop('Row_Index').astype(np.int64).to_numpy())
+    journal = _read_csv_or_empty(journal_file, JOURNAL_COLUMNS)
+    if not journal.empty:
+        df = _fold_journal(df, journal)
+
+    if not df.empty:
+        df['Date'] = pd.to_datetime(df['Date']).dt.date.astype(str)
+        # แปลงเวลาเป็น string เพื่อแสดงผล, จัดการ NaN
+        df['Start_Time'] = df['Start_Time'].astype(str)
+        df['End_Time'] = df['End_Time'].astype(str).replace('nan', np.nan)
+        df['Duration_Minutes'] = pd.to_numeric(df['Duration_Minutes'], errors='coerce') # แปลงเป็นตัวเลข, ถ้า Error ให้เป็น NaN
+
+    # ตรวจสอบคอลัมน์
+    for col in CSV_COLUMNS:
+        if col not in df.columns:
+            df[col] = np.nan # เพิ่มคอลัมน์ที่ขาดไป
+
+    return df.reindex(columns=CSV_COLUMNS) # จัดเรียงและคืนค่า
+
+
+def _apply_journal_records(frame, records):
+    """แพตช์ DataFrame แบบ compact ด้วยรายการ Journal ที่เพิ่งเขียน (ผลเท่ากับอ่านไฟล์ใหม่)"""
+    for record in records:
+        row_index = int(record['Row_Index'])
+        if record['Op'] == 'start':
+            new_row = compact_log_frame(pd.DataFrame([record], columns=CSV_COLUMNS, index=[row_index]))
+            frame = upsert_log_rows(frame, new_row).sort_index()
+        elif record['Op'] == 'close' and row_index in frame.index:
+            closed_row = frame.loc[[row_index]].assign(
+                End_Time=time_to_seconds([record['End_Time']]),
+                Duration_Minutes=np.float32(record['Duration_Minutes'])
+            )
+            frame = upsert_log_rows(frame, add_display_columns(closed_row)).sort_index()
+        elif record['Op'] == 'delete':
+            frame = frame.drop(index=[row_index], errors='ignore')
+    return frame
+
+
+class PartitionFrameCache:
+    """DataFrame ของแต่ละ Partition ในหน่วยความจำ พร้อม stamp ของไฟล์ตอนที่ตรงกัน
+
+    frame ที่คืนไปจะไม่ถูกแก้ไขในที่ (การแพตช์สร้าง DataFrame ใหม่แล้วสลับ reference)
+    ถ้า stamp ของไฟล์ไม่ตรง (Process อื่นเขียน) หรือเก่ากว่า reconcile_seconds จะโหลดจากไฟล์ใหม่
+    การตรวจ stamp + อ่านไฟล์ทำภายใต้ล็อกไฟล์แบบ shared (file_lock(key)) จึงไม่เห็นไฟล์ที่กำลังถูกเขียน
+    """
+
+    def __init__(self, build, stamp, reconcile_seconds, file_lock):
+        self.lock = threading.Lock()
+        self.entries = {} # key -> (stamp, เวลาที่โหลดจากไฟล์ (monotonic), DataFrame)
+        self._build = build # key -> DataFrame แบบ compact
+        self._stamp = stamp # key -> stamp ของไฟล์
+        self._reconcile_seconds = reconcile_seconds
+        self._file_lock = file_lock # (key, shared) -> context manager ล็อกไฟล์ของ Partition
+
+    def get(self, key):
+        # ล็อกไฟล์ก่อนล็อกของ Cache เสมอ (ลำดับเดียวกับฝั่งเขียน ไม่ให้ deadlock)
+        with self._file_lock(key, shared=True), self.lock:
+            stamp = self._stamp(key)
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != stamp or monotonic() - entry[1] >= self._reconcile_seconds:
+                entry = (stamp, monotonic(), self._build(key))
+                self.entries[key] = entry
+            return entry[2]
+
+    def apply(self, key, records, stamp_before):
+        """แพตช์รายการ Journal ที่เพิ่งเขียนเข้า frame (ใช้ได้เฉพาะเมื่อ frame ตรงกับไฟล์ก่อนเขียน)"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            if entry[0] != stamp_before:
+                del self.entries[key] # มีการเขียนจากที่อื่นแทรกเข้ามา: โหลดใหม่ครั้งถัดไป
+                return
+            self.entries[key] = (self._stamp(key), entry[1], _apply_journal_records(entry[2], records))
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class LogIndexCache:
+    """LogFrameIndex ของชุดที่ถูกเรียกดูล่าสุด (เก็บไม่เกิน size ชุด)
+
+    จำ frame ของแต่ละส่วน (Partition) ที่ใช้สร้างดัชนีไว้ ถ้าส่วนใดถูกแพตช์/โหลดใหม่ (ได้ frame ตัวใหม่)
+    หรือเลขรุ่นของข้อมูล (version) เปลี่ยน จึงสร้างดัชนีใหม่ ไม่งั้นทุก rerun ใช้ดัชนีเดิม (ไม่ต้องรวม/เรียงข้อมูลซ้ำ)
+    """
+
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.entries = {} # key ของชุด -> (list ของ frame ของแต่ละส่วน, version, LogFrameIndex)
+        self._size = size
+
+    def get(self, key, parts, build, version=None):
+        """ดัชนีของชุด key — สร้างใหม่ด้วย build() ถ้า parts ไม่ใช่ object ชุดเดิม (เทียบด้วย is) หรือ version ไม่เท่าเดิม
+
+        version เทียบด้วย == (เช่น PRAGMA data_version: int ที่เกิน 256 เป็นคนละ object แม้ค่าเท่ากัน)
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if (entry is None or entry[1] != version or len(entry[0]) != len(parts)
+                    or any(old is not new for old, new in zip(entry[0], parts))):
+                entry = (parts, version, build())
+            self.entries[key] = entry # ย้ายไปท้ายสุด = ใช้ล่าสุด
+            while len(self.entries) > self._size:
+                self.entries.pop(next(iter(self.entries)))
+            return entry[2]
+
+
+class CsvLogStore(LogStore):
+    """Backend ไฟล์ CSV แบ่งตามเดือน (Partition) + Journal
+
+    การเริ่ม/ปิด/ลบกิจกรรม = เขียนต่อท้าย Journal ของเดือนนั้น 1 บรรทัด (ไม่เขียนทับทั้งไฟล์)
+    Journal ถูกรวมเข้าไฟล์หลักเมื่อใหญ่เกิน journal_compact_bytes (compact_partition)
+    write_mode: "write_through" = แก้ DataFrame ใน Cache ตามรายการที่เพิ่งเขียน, "invalidate" = โหลดไฟล์ใหม่
+
+    ใช้ได้หลาย Process พร้อมกัน (เช่น Streamlit หลาย Worker บนเครื่องเดียว): การเขียนทุกครั้งถือล็อกไฟล์
+    แบบ exclusive ของ Partition แล้วตรวจ stamp ใหม่ (Cache / ดัชนีกิจกรรมที่เปิดอยู่ / ลำดับแถวถัดไป
+    จึงไม่ค้างข้อมูลเก่าของ Process อื่น), ผู้อ่านถือล็อกแบบ shared และการเขียนทับไฟล์หลักใช้ write_file_atomic
+
+    Row ID ("<Partition>#<Row_Index>") คงที่ตลอดอายุของแถว: ไฟล์หลักเก็บ Row_Index ไว้ในคอลัมน์ และลำดับแถวใหม่
+    จองจากไฟล์ตัวนับ (ROW_COUNTER_PATTERN) ที่ไม่ลดลง — การเลือกแถวที่ค้างอยู่บนหน้าจอจึงไม่ชี้ไปแถวอื่นหลังลบ/Compaction
+    """
+
+    def __init__(self, logs_dir, write_mode="write_through", reconcile_seconds=600, index_cache_size=8,
+                 journal_compact_bytes=1024 * 1024):
+        self.logs_dir = logs_dir
+        self.location = logs_dir
+        self.write_mode = write_mode
+        self.journal_compact_bytes = journal_compact_bytes
+        self.open_index = OpenActivityIndex() # (Employee_ID, Date) -> กิจกรรมที่ยังไม่ปิด สำหรับ Clock Out แบบ O(1)
+        self._open_stamps = {} # key -> stamp ของ Partition ที่ open_index ตรงกับไฟล์
+        self._partitions = PartitionFrameCache(
+            lambda key: compact_log_frame(build_text_log_frame(*self.partition_files(key))),
+            self.partition_stamp, reconcile_seconds, self._locked
+        )
+        self._indexes = LogIndexCache(index_cache_size)
+        self._held = threading.local() # ชื่อล็อกไฟล์ที่ Thread นี้ถืออยู่ (ล็อกซ้อนในเมธอดเดียวกันได้)
+
+    # --- Partition ---
+
+    @staticmethod
+    def partition_key(day):
+        """ชื่อ Partition (เดือน) ของวันที่ (date หรือ 'YYYY-MM-DD')"""
+        if isinstance(day, str):
+            day = datetime.strptime(day, '%Y-%m-%d').date()
+        return day.strftime(PARTITION_FORMAT)
+
+    def partition_files(self, key):
+        """คืน (ไฟล์หลัก, ไฟล์ Journal) ของ Partition"""
+        return (os.path.join(self.logs_dir, PARTITION_FILE_PATTERN.format(key)),
+                os.path.join(self.logs_dir, PARTITION_JOURNAL_PATTERN.format(key)))
+
+    def partition_keys(self):
+        """ทุก Partition ที่มีไฟล์อยู่ใน logs_dir (เรียงตามเดือน)"""
+        if not os.path.isdir(self.logs_dir):
+            return []
+        keys = {m.group(1) for m in map(PARTITION_FILE_REGEX.match, os.listdir(self.logs_dir)) if m}
+        return sorted(keys)
+
+    def partition_keys_between(self, date_from, date_to):
+        """Partition ที่ทับช่วงวันที่ [date_from, date_to] (เฉพาะที่มีไฟล์อยู่จริง)"""
+        keys = []
+        month = date(date_from.year, date_from.month, 1)
+        while month <= date_to:
+            key = month.strftime(PARTITION_FORMAT)
+            if any(os.path.exists(f) for f in self.partition_files(key)):
+                keys.append(key)
+            month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        return keys
+
+    def partition_stamp(self, key):
+        """(inode, mtime_ns, ขนาด) ของไฟล์หลักและ Journal — เปลี่ยนทุกครั้งที่มีการเขียน/แทนที่ไฟล์ของ Partition"""
+        stamp = []
+        for file_path in self.partition_files(key):
+            try:
+                st_info = os.stat(file_path)
+                stamp.append((st_info.st_ino, st_info.st_mtime_ns, st_info.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    @contextmanager
+    def _locked(self, name, shared=False):
+        """ล็อกไฟล์ของ Partition (หรือชื่ออื่น เช่น "migrate") — ถ้า Thread นี้ถืออยู่แล้วจะไม่ล็อกซ้ำ
+
+        ล็อกซ้อนต้องไม่อัปเกรดจาก shared เป็น exclusive (ฝั่งเขียนล็อก exclusive ก่อนแล้วค่อยอ่าน)
+        """
+        held = self._held.__dict__.setdefault('names', set())
+        if name in held:
+            yield
+            return
+        with file_lock(os.path.join(self.logs_dir, LOCK_FILE_PATTERN.format(name)), shared):
+            held.add(name)
+            try:
+                yield
+            finally:
+                held.discard(name)
+
+    def _next_row_index(self, key, frame):
+        """ลำดับแถวถัดไปที่ยังไม่เคยใช้ใน Partition (ถือล็อก exclusive อยู่) — frame = ข้อมูลปัจจุบันของ Partition"""
+        counter_file = os.path.join(self.logs_dir, ROW_COUNTER_PATTERN.format(key))
+        candidates = [0]
+        try:
+            with open(counter_file, encoding='utf-8') as handle:
+                candidates.append(int(handle.read().strip()))
+        except FileNotFoundError:
+            # Partition ที่สร้างก่อนมีไฟล์ตัวนับ: นับรวมแถวที่ถูกลบไปแล้วใน Journal ด้วย
+            journal = _read_csv_or_empty(self.partition_files(key)[1], JOURNAL_COLUMNS)
+            if not journal.empty:
+                candidates.append(int(pd.to_numeric(journal['Row_Index']).max()) + 1)
+        except ValueError:
+            pass # ไฟล์ตัวนับเสีย: ใช้ค่าจากข้อมูลแทน
+        if not frame.empty:
+            candidates.append(int(frame.index.max()) + 1)
+        return max(candidates)
+
+    def _reserve_row_indexes(self, key, count, frame):
+        """จองลำดับแถวใหม่ count แถว (บันทึกตัวนับลงไฟล์ก่อนใช้) คืนลำดับแรก"""
+        first = self._next_row_index(key, frame)
+        counter_file = os.path.join(self.logs_dir, ROW_COUNTER_PATTERN.format(key))
+        write_file_atomic(counter_file, lambda handle: handle.write(str(first + count)))
+        return first
+
+    def _sync_open_index(self, key):
+        """ให้ open_index ของ Partition ตรงกับไฟล์ (ถือล็อก exclusive อยู่) — Process อื่นเขียนมา = โหลดใหม่"""
+        stamp = self.partition_stamp(key)
+        if self._open_stamps.get(key) != stamp:
+            self.open_index.invalidate(key)
+            self._open_stamps[key] = stamp
+        self.open_index.ensure_scope(key, lambda: self._iter_open_activities(key))
+
+    def load_partition(self, key):
+        """DataFrame แบบ compact ของ Partition เดียว (Index = ลำดับแถวภายใน Partition) — ห้ามแก้ไข"""
+        return self._partitions.get(key)
+
+    def _concat_partitions(self, keys, parts):
+        """รวม DataFrame ของหลาย Partition โดยเปลี่ยน Index เป็น Row ID ("<Partition>#<ลำดับแถว>")"""
+        frames = [
+            part.set_axis(key + ROW_ID_SEP + part.index.astype(str)) # ไม่แก้ frame ที่ Cache ไว้
+            for key, part in zip(keys, parts) if not part.empty
+        ]
+        if not frames:
+            return empty_log_frame()
+        return concat_log_frames(frames) # รวม category ของแต่ละเดือน
+
+    # --- LogStore ---
+
+    def prepare(self):
+        os.makedirs(self.logs_dir, exist_ok=True)
+
+    def load_index(self, date_from, date_to):
+        keys = tuple(self.partition_keys_between(date_from, date_to))
+        parts = [self.load_partition(key) for key in keys]
+        return self._indexes.get(keys, parts, lambda: LogFrameIndex(self._concat_partitions(keys, parts)))
+
+    def clock_out_latest(self, employee_id, date_str, end_time_str):
+        # ค้นหาจากดัชนีแทนการสแกนทั้ง DataFrame (กิจกรรมล่าสุด = ลำดับแถวสูงสุด)
+        key = self.partition_key(date_str)
+        with self._locked(key):
+            self._sync_open_index(key)
+            latest = self.open_index.pop_latest(employee_id, date_str)
+            if latest is None:
+                return False # ไม่มีกิจกรรมที่ต้อง Clock Out
+
+            row_id, start_time = latest
+            row_index = split_row_id(row_id)[1]
+            # บันทึก End_Time / Duration เป็นรายการ "close" ต่อท้าย Journal ของเดือนนั้น
+            try:
+                self.append_journal(key, [{
+                    'Op': 'close',
+                    'Row_Index': row_index,
+                    'End_Time': end_time_str,
+                    'Duration_Minutes': calculate_duration(start_time, end_time_str)
+                }])
+            except Exception:
+                # เขียนไม่สำเร็จ: คืนกิจกรรมกลับเข้าดัชนี
+                self.open_index.add(employee_id, date_str, row_id, start_time, row_index, key)
+                raise
+            return True
+
+    def start_activity(self, employee_id, date_str, start_time_str, activity_type):
+        key = self.partition_key(date_str)
+        with self._locked(key): # ปิดอันเก่า + จองลำดับแถวใหม่ภายใต้ล็อกเดียวกัน
+            # 1. Clock Out กิจกรรมเดิมก่อน (ใช้เวลาเริ่มใหม่เป็นเวลาจบของอันเก่า)
+            self.clock_out_latest(employee_id, date_str, start_time_str)
+
+            # 2. บันทึกแถวใหม่เป็นรายการ "start" ต่อท้าย Journal (ลำดับแถวที่ไม่เคยใช้ใน Partition)
+            df = self.load_partition(key) # ตรวจ stamp แล้ว: รวมแถวที่ Process อื่นเพิ่งเขียน
+            next_index = self._reserve_row_indexes(key, 1, df)
+            self.append_journal(key, [{
+                'Op': 'start',
+                'Row_Index': next_index,
+                'Employee_ID': employee_id,
+                'Date': date_str,
+                'Start_Time': start_time_str,
+                'End_Time': np.nan,
+                'Activity_Type': activity_type,
+                'Duration_Minutes': np.nan
+            }])
+            row_id = make_row_id(key, next_index)
+            self.open_index.add(employee_id, date_str, row_id, start_time_str, next_index, key)
+            return row_id
+
+    def delete_entries(self, row_ids):
+        # เขียน Journal 1 ครั้งต่อ Partition
+        rows_by_partition = {}
+        for row_id in dict.fromkeys(row_ids): # ตัด Row ID ซ้ำ
+            key, row_index = split_row_id(row_id)
+            rows_by_partition.setdefault(key, []).append((row_id, row_index))
+
+        deleted = []
+        for key, rows in rows_by_partition.items():
+            with self._locked(key):
+                df = self.load_partition(key)
+                rows = [(row_id, row_index) for row_id, row_index in rows if row_index in df.index]
+                if not rows:
+                    continue
+                self.append_journal(key, [{'Op': 'delete', 'Row_Index': row_index} for _, row_index in rows])
+                for row_id, _ in rows:
+                    self.open_index.discard(row_id)
+                    deleted.append(row_id)
+        return deleted
+
+    def raw_frames(self, date_from, date_to):
+        frames = []
+        for key in self.partition_keys_between(date_from, date_to):
+            base_file, journal_file = self.partition_files(key)
+            with self._locked(key, shared=True):
+                if os.path.exists(base_file):
+                    frames.append((base_file, pd.read_csv(base_file)))
+                # รายการที่ยังอยู่ใน Journal (ยังไม่ถูกรวมเข้าไฟล์หลัก)
+                if os.path.exists(journal_file):
+                    frames.append((f"Journal (ยังไม่ Compaction): {journal_file}", pd.read_csv(journal_file)))
+        return frames
+
+    # --- เขียนไฟล์ ---
+
+    def append_journal(self, key, records):
+        """เขียนรายการต่อท้าย Journal ของ Partition (append-only) โดยไม่แตะข้อมูลเดิม
+
+        ถือล็อก exclusive ของ Partition และเขียนข้อความทั้งก้อนด้วย write ครั้งเดียว + fsync
+        (ผู้อ่านที่ถือล็อก shared จะไม่เห็นบรรทัดที่เขียนค้างครึ่งเดียว)
+        """
+        journal_file = self.partition_files(key)[1]
+        with self._locked(key):
+            stamp_before = self.partition_stamp(key)
+            write_header = not os.path.exists(journal_file) or os.path.getsize(journal_file) == 0
+            text = pd.DataFrame(records, columns=JOURNAL_COLUMNS).to_csv(header=write_header, index=False)
+            with open(journal_file, 'a', encoding='utf-8', newline='') as handle:
+                handle.write(text)
+                handle.flush()
+                os.fsync(handle.fileno())
+            if self._open_stamps.get(key) == stamp_before:
+                self._open_stamps[key] = self.partition_stamp(key) # open_index ยังตรงกับไฟล์ (แก้ตามไปแล้ว)
+            if self.write_mode == "write_through":
+                self._partitions.apply(key, records, stamp_before) # แพตช์ Cache แทนการโหลดไฟล์ใหม่
+            else:
+                self._partitions.invalidate(key)
+
+    def save_partition(self, key, df):
+        """บันทึก DataFrame (ข้อความ, Index = Row_Index) ทั้ง Partition ลงไฟล์หลัก (ใช้ตอน Compaction/ย้ายข้อมูล) แล้วล้าง Journal"""
+        base_file, journal_file = self.partition_files(key)
+        with self._locked(key):
+            # ตรวจสอบให้แน่ใจว่ามีทุกคอลัมน์ก่อนบันทึก
+            df = df.reindex(columns=CSV_COLUMNS) # จัดเรียงคอลัมน์ให้ตรง
+            # เก็บตัวนับก่อนล้าง Journal (แถวที่ถูกลบหายไปจากไฟล์ แต่ลำดับของมันต้องไม่ถูกใช้ซ้ำ)
+            self._reserve_row_indexes(key, 0, df)
+            write_file_atomic(base_file, lambda handle: df.to_csv(handle, index_label='Row_Index'))
+            # ข้อมูลใน Journal ถูกรวมเข้าไฟล์หลักแล้ว
+            if os.path.exists(journal_file):
+                os.remove(journal_file)
+            self.open_index.invalidate(key) # ไฟล์ถูกแทนที่: โหลดดัชนีใหม่จากไฟล์ (Row ID เดิม)
+            self._open_stamps.pop(key, None)
+            self._partitions.invalidate(key) # โหลด Partition นี้จากไฟล์ใหม่
+
+    def compact_partition(self, key):
+        """รวม Journal เข้าไฟล์หลัก ถ้า Journal ใหญ่เกิน journal_compact_bytes คืน True ถ้ารวมแล้ว"""
+        base_file, journal_file = self.partition_files(key)
+        with self._locked(key): # ตรวจขนาดซ้ำภายใต้ล็อก (Process อื่นอาจรวมไปแล้ว)
+            if not os.path.exists(journal_file) or os.path.getsize(journal_file) < self.journal_compact_bytes:
+                return False
+            self.save_partition(key, build_text_log_frame(base_file, journal_file))
+            return True
+
+    def migrate_legacy_file(self, data_file, journal_file):
+        """ย้ายข้อมูลจากไฟล์เดิมแบบไฟล์เดียว (+ Journal) เข้า Partition รายเดือน คืน True ถ้ามีการย้าย"""
+        if not os.path.exists(data_file) and not os.path.exists(journal_file):
+            return False
+        with self._locked("migrate"): # ทุก Process เรียกตอนเริ่มแอป: ย้ายได้ครั้งเดียว
+            if not os.path.exists(data_file) and not os.path.exists(journal_file):
+                return False
+            legacy = build_text_log_frame(data_file, journal_file)
+            if not legacy.empty:
+                partition_keys = pd.to_datetime(legacy['Date']).dt.strftime(PARTITION_FORMAT)
+                for key, part in legacy.groupby(partition_keys):
+                    with self._locked(key):
+                        existing = build_text_log_frame(*self.partition_files(key))
+                        # แถวที่ย้ายมาได้ลำดับแถวใหม่ต่อจากตัวนับ (Row ID ของแถวเดิมใน Partition ไม่เปลี่ยน)
+                        first = self._reserve_row_indexes(key, len(part), existing)
+                        part = part.set_axis(range(first, first + len(part)))
+                        self.save_partition(key, pd.concat([existing, part]))
+
+            if os.path.exists(data_file):
+                os.replace(data_file, data_file + ".migrated") # เก็บไฟล์เดิมไว้เป็นสำเนา
+            if os.path.exists(journal_file):
+                os.remove(journal_file)
+            return True
+
+    def _iter_open_activities(self, key):
+        """แถวที่ยังไม่มี End_Time ของ Partition ในรูปแบบที่ OpenActivityIndex ต้องการ"""
+        df = self.load_partition(key)
+        open_rows = log_frame_to_text(df[df['End_Time'] == TIME_MISSING]) # วันที่/เวลาเป็นข้อความตามรูปแบบของดัชนี
+        for row_index, row in open_rows.iterrows():
+            yield row['Employee_ID'], row['Date'], row_index, make_row_id(key, row_index), row['Start_Time']
+
+
+# -----------------------------------------------------------------
+# Backend: SQLite ในเครื่อง — Row ID = id
+# -----------------------------------------------------------------
+
+def _sql_rows_to_frame(rows):
+    """DataFrame ข้อความจาก SQL (id + CSV_COLUMNS เรียงตามลำดับแสดงผลแล้ว) -> compact, Index = id"""
+    if rows.empty:
+        return empty_log_frame()
+    return compact_log_frame(rows[CSV_COLUMNS].set_axis(rows['id'].to_numpy()))
+
+
+# ดัชนี (Employee_ID, Date) สำหรับหากิจกรรมของพนักงาน, (Date, Start_Time, id) สำหรับช่วงวันที่ + ลำดับแสดงผล
+# และ partial index เฉพาะแถวที่ยังเปิดอยู่ (Clock Out ไม่ต้องแตะแถวที่ปิดแล้ว)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS time_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    Employee_ID TEXT NOT NULL,
+    Date TEXT NOT NULL,
+    Start_Time TEXT NOT NULL,
+    End_Time TEXT,
+    Activity_Type TEXT,
+    Duration_Minutes REAL
+);
+CREATE INDEX IF NOT EXISTS time_logs_employee_date_idx ON time_logs (Employee_ID, Date);
+CREATE INDEX IF NOT EXISTS time_logs_date_idx ON time_logs (Date, Start_Time, id);
+CREATE INDEX IF NOT EXISTS time_logs_open_idx ON time_logs (Employee_ID, Date, Start_Time) WHERE End_Time IS NULL;
+"""
+SQLITE_SELECT_LOGS = "SELECT id, Employee_ID, Date, Start_Time, End_Time, Activity_Type, Duration_Minutes FROM time_logs"
+SQLITE_LOG_ORDER = "ORDER BY Date DESC, Start_Time DESC, id DESC"
+
+
+class SqliteLogStore(LogStore):
+    """Backend ไฟล์ SQLite ในเครื่อง (WAL): มีดัชนี, ทุกการเขียนเป็น Transaction, ใช้ได้หลาย Process พร้อมกัน
+
+    Date / เวลาเก็บเป็นข้อความ 'YYYY-MM-DD' / 'HH:MM:SS' (เรียงตามตัวอักษร = เรียงตามเวลา)
+    ดัชนีของช่วงวันที่ถูก Cache ไว้จนกว่าจะมีการ commit (ตรวจด้วย PRAGMA data_version ซึ่งเปลี่ยนเมื่อ
+    Connection อื่น — ทั้งใน Process นี้และ Process อื่น — commit)
+    """
+
+    def __init__(self, path, busy_timeout=10.0, index_cache_size=8):
+        self.path = path
+        self.location = path
+        self._busy_timeout = busy_timeout
+        self._reader = None # Connection สำหรับอ่าน (ใช้ร่วมกัน ถือ _read_lock)
+        self._writer = None # Connection สำหรับเขียน (ใช้ร่วมกัน ถือ _write_lock)
+        self._read_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._indexes = LogIndexCache(index_cache_size)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self._busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL") # ผู้อ่านไม่ถูกบล็อกระหว่างเขียน
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction สำหรับเขียน (BEGIN IMMEDIATE: จองสิทธิ์เขียนตั้งแต่ต้น ไม่ deadlock ตอนอัปเกรด lock)"""
+        with self._write_lock:
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def prepare(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if self._writer is None:
+            self._writer = self._connect()
+            self._writer.executescript(SQLITE_SCHEMA)
+            self._reader = self._connect()
+
+    def load_index(self, date_from, date_to):
+        with self._read_lock:
+            version = self._reader.execute("PRAGMA data_version").fetchone()[0]
+            return self._indexes.get(
+                (date_from, date_to), [], lambda: LogFrameIndex(self._read_frame(date_from, date_to), presorted=True),
+                version=version
+            )
+
+    def _read_frame(self, date_from, date_to):
+        rows = pd.read_sql_query(
+            f"{SQLITE_SELECT_LOGS} WHERE Date BETWEEN ? AND ? {SQLITE_LOG_ORDER}",
+            self._reader, params=(str(date_from), str(date_to)), dtype={'Employee_ID': str}
+        )
+        return _sql_rows_to_frame(rows)
+
+    @staticmethod
+    def _close_latest(conn, employee_id, date_str, end_time_str):
+        """ปิดแถวล่าสุดที่ยังเปิดอยู่ (ใช้ time_logs_open_idx) ภายใน Transaction ที่เปิดอยู่ คืน True ถ้ามี"""
+        latest = conn.execute(
+            "SELECT id, Start_Time FROM time_logs WHERE Employee_ID = ? AND Date = ? AND End_Time IS NULL "
+            "ORDER BY Start_Time DESC, id DESC LIMIT 1",
+            (str(employee_id), date_str)
+        ).fetchone()
+        if latest is None:
+            return False
+        conn.execute(
+            "UPDATE time_logs SET End_Time = ?, Duration_Minutes = ? WHERE id = ?",
+            (end_time_str, calculate_duration(latest[1], end_time_str), latest[0])
+        )
+        return True
+
+    def clock_out_latest(self, employee_id, date_str, end_time_str):
+        with self._transaction() as conn:
+            return self._close_latest(conn, employee_id, date_str, end_time_str)
+
+    def start_activity(self, employee_id, date_str, start_time_str, activity_type):
+        with self._transaction() as conn:
+            self._close_latest(conn, employee_id, date_str, start_time_str)
+            cursor = conn.execute(
+                "INSERT INTO time_logs (Employee_ID, Date, Start_Time, End_Time, Activity_Type, Duration_Minutes) "
+                "VALUES (?, ?, ?, NULL, ?, NULL)",
+                (str(employee_id), date_str, start_time_str, activity_type)
+            )
+            return cursor.lastrowid
+
+    def delete_entries(self, row_ids):
+        row_ids = [int(row_id) for row_id in row_ids]
+        if not row_ids:
+            return []
+        with self._transaction() as conn:
+            placeholders = ", ".join("?" * len(row_ids))
+            return [row[0] for row in conn.execute(
+                f"DELETE FROM time_logs WHERE id IN ({placeholders}) RETURNING id", row_ids
+            ).fetchall()]
+
+    def raw_frames(self, date_from, date_to):
+        with self._read_lock:
+            rows = pd.read_sql_query(
+                f"{SQLITE_SELECT_LOGS} WHERE Date BETWEEN ? AND ? ORDER BY id",
+                self._reader, params=(str(date_from), str(date_to))
+            )
+        return [(f"time_logs ({self.path})", rows)]
@@ -0,0 +1,61 @@
+-- 💥 [NEW] Migration ครั้งเดียวสำหรับ Delta sync + Keyset pagination + คิวเขียนล่วงหน้าของ Time_app_Break_Supabase_data.py
+-- (แอปไม่รัน DDL เองแล้ว — ตรวจแค่ว่ามี schema นี้ใน sync_schema_ready / event_schema_ready)
+-- แถวเก่าของ time_logs_tombstones / time_log_events ถูกลบโดยแอป (prune_sync_tables) ไม่ต้องตั้ง Job เพิ่ม
+--
+-- รันด้วย psql (แต่ละคำสั่ง commit แยกกัน):
+--     psql "<Supabase connection string>" -f migrations/time_logs_delta_sync.sql
+-- ห้ามรันใน Transaction เดียว (psql -1 / SQL Editor ของ Supabase): CREATE INDEX CONCURRENTLY ทำใน Transaction ไม่ได้
+-- รันซ้ำได้ (IF NOT EXISTS / OR REPLACE) — ถ้าสร้างดัชนีแบบ CONCURRENTLY ค้างกลางทาง จะเหลือดัชนี INVALID
+-- ให้ DROP INDEX CONCURRENTLY ดัชนีนั้นแล้วรันไฟล์นี้ใหม่
+
+\set ON_ERROR_STOP on
+
+-- ไม่รอล็อกนานจนคำสั่งอื่นของแอปต่อคิวตาม (ALTER TABLE ต้องใช้ ACCESS EXCLUSIVE ชั่วครู่) — ล้มเหลวก็รันใหม่ได้
+SET lock_timeout = '5s';
+
+-- DEFAULT now() (stable) = เพิ่มคอลัมน์โดยไม่เขียนตารางใหม่ทั้งตาราง (clock_timestamp() เป็น volatile จะ rewrite)
+-- แถวเดิมได้เวลาที่รัน migration, แถวใหม่/ที่ถูกแก้ได้เวลาจริงจาก Trigger time_logs_touch
+ALTER TABLE time_logs ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+
+RESET lock_timeout;
+
+-- ดัชนีสร้างแบบ CONCURRENTLY: ไม่ล็อกการเขียนของแอประหว่างสร้าง
+CREATE INDEX CONCURRENTLY IF NOT EXISTS time_logs_updated_at_idx ON time_logs (updated_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS time_logs_date_employee_idx ON time_logs ("Date", "Employee_ID");
+-- สำหรับ Keyset pagination (ORDER BY "Date" DESC, "Start_Time" DESC, id DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS time_logs_keyset_idx ON time_logs ("Date", "Start_Time", id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS time_logs_employee_keyset_idx ON time_logs ("Employee_ID", "Date", "Start_Time", id);
+
+-- id ที่ถูก DELETE (Delta sync ลบแถวเหล่านี้ออกจากข้อมูลในหน่วยความจำ)
+CREATE TABLE IF NOT EXISTS time_logs_tombstones (
+    id bigint PRIMARY KEY,
+    deleted_at timestamptz NOT NULL DEFAULT clock_timestamp()
+);
+CREATE INDEX IF NOT EXISTS time_logs_tombstones_deleted_at_idx ON time_logs_tombstones (deleted_at);
+
+-- Trigger ตั้ง updated_at ทุกครั้งที่ INSERT/UPDATE และเก็บ id ที่ถูก DELETE ลง time_logs_tombstones
+CREATE OR REPLACE FUNCTION time_logs_touch() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+CREATE OR REPLACE TRIGGER time_logs_touch
+    BEFORE INSERT OR UPDATE ON time_logs FOR EACH ROW EXECUTE FUNCTION time_logs_touch();
+
+CREATE OR REPLACE FUNCTION time_logs_tombstone() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO time_logs_tombstones (id) VALUES (OLD.id)
+    ON CONFLICT (id) DO UPDATE SET deleted_at = clock_timestamp();
+    RETURN OLD;
+END $$ LANGUAGE plpgsql;
+CREATE OR REPLACE TRIGGER time_logs_tombstone
+    AFTER DELETE ON time_logs FOR EACH ROW EXECUTE FUNCTION time_logs_tombstone();
+
+-- idempotency key ของ event จากคิวเขียนล่วงหน้า (LOG_WRITE_MODE = "queue"): บันทึกใน Transaction เดียวกับการเขียน
+-- event ที่ถูกส่งซ้ำจึงถูกข้าม — ถ้ายังไม่มีตารางนี้ event จะค้างอยู่ในคิวในเครื่องจนกว่าจะรันไฟล์นี้
+CREATE TABLE IF NOT EXISTS time_log_events (
+    event_id text PRIMARY KEY,
+    applied_at timestamptz NOT NULL DEFAULT clock_timestamp()
+);
+-- (ตารางอาจมีอยู่แล้วจากแอปรุ่นก่อนที่สร้างเองตอนรัน: สร้างดัชนีแบบ CONCURRENTLY ไม่ล็อกการเขียน)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS time_log_events_applied_at_idx ON time_log_events (applied_at);
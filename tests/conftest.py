@@ -0,0 +1,5 @@
+import os
+import sys
+
+# ให้ import โมดูลของแอป (time_log_core, log_storage, ไฟล์แอป) จากรากของ repo ได้
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
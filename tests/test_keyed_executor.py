@@ -0,0 +1,45 @@
+"""KeyedExecutor: งานของ key เดียวกันรันตามลำดับ, ต่าง key รันพร้อมกัน"""
+import threading
+
+import pytest
+
+from time_log_core import KeyedExecutor
+
+
+def test_same_key_runs_in_submit_order():
+    executor = KeyedExecutor(4)
+    gate, order = threading.Event(), []
+
+    def step(n):
+        if n == 0:
+            gate.wait(5) # งานแรกช้า: งานถัดไปของ key เดียวกันต้องไม่แซง
+        order.append(n)
+        return n
+
+    futures = [executor.submit("001", step, n) for n in range(5)]
+    gate.set()
+    assert [f.result(timeout=5) for f in futures] == [0, 1, 2, 3, 4]
+    assert order == [0, 1, 2, 3, 4]
+
+
+def test_other_keys_are_not_blocked():
+    executor = KeyedExecutor(2)
+    gate = threading.Event()
+    slow = executor.submit("001", gate.wait, 5)
+    assert executor.submit("002", lambda: "done").result(timeout=5) == "done"
+    assert not slow.done()
+    gate.set()
+    assert slow.result(timeout=5) is True
+
+
+def test_error_does_not_stall_the_key():
+    executor = KeyedExecutor(1)
+
+    def fail():
+        raise ValueError("write failed")
+
+    failed = executor.submit("001", fail)
+    after = executor.submit("001", lambda: "next")
+    with pytest.raises(ValueError):
+        failed.result(timeout=5)
+    assert after.result(timeout=5) == "next"
@@ -0,0 +1,41 @@
+"""SqliteLogStore: Cache ของดัชนีตาม PRAGMA data_version"""
+import sqlite3
+from datetime import date
+
+from log_storage import SqliteLogStore
+
+DAY = date(2025, 1, 2)
+
+
+def advance_data_version(store, path, times):
+    """commit จาก Connection อื่นสลับกับ load_index times ครั้ง (data_version เพิ่มเมื่อผู้อ่านเห็นการ commit)"""
+    with sqlite3.connect(path, isolation_level=None) as conn:
+        for _ in range(times):
+            conn.execute("INSERT INTO time_logs (Employee_ID, Date, Start_Time, Activity_Type) "
+                         "VALUES ('Z', '2025-02-01', '08:00:00', 'Break')") # นอกช่วงวันที่ที่โหลด
+            store.load_index(DAY, DAY)
+
+
+def test_index_reused_without_commits_after_many_versions(tmp_path):
+    path = str(tmp_path / "logs.sqlite3")
+    store = SqliteLogStore(path)
+    store.prepare()
+    store.start_activity("A", str(DAY), "08:00:00", "Break")
+    advance_data_version(store, path, 300) # data_version > 256: int คนละ object แม้ค่าเท่ากัน
+
+    first = store.load_index(DAY, DAY)
+    assert store._reader.execute("PRAGMA data_version").fetchone()[0] > 256
+    assert all(store.load_index(DAY, DAY) is first for _ in range(5))
+
+
+def test_index_rebuilt_after_commit(tmp_path):
+    path = str(tmp_path / "logs.sqlite3")
+    store = SqliteLogStore(path)
+    store.prepare()
+    store.start_activity("A", str(DAY), "08:00:00", "Break")
+    first = store.load_index(DAY, DAY)
+
+    store.start_activity("B", str(DAY), "08:05:00", "Toilet")
+    second = store.load_index(DAY, DAY)
+    assert second is not first
+    assert sorted(second.frame["Employee_ID"]) == ["A", "B"]
@@ -0,0 +1,222 @@
+"""SupabaseEventWriter บนฐานข้อมูลจำลอง SQLite
+
+คำสั่ง SQL เฉพาะ Postgres (claim event_id ด้วย unnest, SQL_ACTIVITY_BATCH) ถูกแทนด้วยคำสั่งที่ความหมายเดียวกันบน SQLite
+ส่วนที่ทดสอบคือลำดับ Transaction ของ SupabaseEventWriter เอง: idempotency, การแยก event ที่ผิดถาวร, Error ชั่วคราว
+และลำดับของ _enqueue_log_event เมื่อคิวยังมี event ค้าง (คิวจำลอง ไม่ต่อ DB)
+"""
+import json
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+import Time_app_Break_Supabase_data as app
+from time_log_core import WriteAheadQueue
+
+SQLITE_EVENT_SCHEMA = "CREATE TABLE time_log_events (event_id TEXT PRIMARY KEY, applied_at REAL)" # แทน Migration
+SQLITE_EVENT_SCHEMA_CHECK = "SELECT EXISTS (SELECT 1 FROM sqlite_master WHERE name = 'time_log_events')"
+SQLITE_CLAIM_EVENTS = """
+INSERT INTO time_log_events (event_id) SELECT value FROM json_each(:event_ids) WHERE true
+ON CONFLICT (event_id) DO NOTHING
+RETURNING event_id
+"""
+
+
+class SqliteConnection:
+    """แทน st.connection("supabase"): .session คืน Session ใหม่ทุกครั้ง"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    @property
+    def session(self):
+        return Session(self.engine)
+
+
+def sqlite_engine(path, migrated=True):
+    engine = create_engine(f"sqlite:///{path}")
+
+    # pysqlite: ให้ SQLAlchemy คุม BEGIN/SAVEPOINT เอง (begin_nested ทำงานถูกต้อง)
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, _):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    # พารามิเตอร์ Array ของ Postgres -> JSON (อ่านด้วย json_each)
+    @event.listens_for(engine, "before_cursor_execute", retval=True)
+    def _arrays_to_json(conn, cursor, statement, parameters, context, executemany):
+        if isinstance(parameters, (list, tuple)) and not executemany:
+            parameters = tuple(json.dumps(p) if isinstance(p, list) else p for p in parameters)
+        return statement, parameters
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE time_logs (id INTEGER PRIMARY KEY, employee_id TEXT NOT NULL, "
+            "date TEXT NOT NULL CHECK (date(date) IS NOT NULL), time TEXT, op TEXT)"
+        )
+        if migrated:
+            connection.exec_driver_sql(SQLITE_EVENT_SCHEMA)
+    return engine
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = sqlite_engine(tmp_path / "supabase.sqlite3")
+    applied_batches = []
+    down = {"remaining": 0}
+
+    def execute_activity_batch(session, payloads):
+        if down["remaining"]:
+            down["remaining"] -= 1
+            raise OperationalError("INSERT", {}, ConnectionError("server closed the connection unexpectedly"))
+        results = []
+        for payload in payloads:
+            new_id = session.execute(
+                text("INSERT INTO time_logs (employee_id, date, time, op) VALUES (:e, :d, :t, :op) RETURNING id"),
+                {"e": payload["Employee_ID"], "d": payload["Date"], "t": payload["Time"], "op": payload["op"]},
+            ).scalar_one()
+            results.append(SimpleNamespace(new_id=new_id, closed_id=None))
+        return results
+
+    monkeypatch.setattr(app, "SQL_EVENT_SCHEMA_CHECK", SQLITE_EVENT_SCHEMA_CHECK)
+    monkeypatch.setattr(app, "SQL_CLAIM_EVENTS", SQLITE_CLAIM_EVENTS)
+    monkeypatch.setattr(app, "_execute_activity_batch", execute_activity_batch)
+    monkeypatch.setattr(app, "_after_activity_batch", lambda payloads, results: applied_batches.append(payloads))
+    return SimpleNamespace(engine=engine, conn=SqliteConnection(engine), applied_batches=applied_batches, down=down)
+
+
+def rows(engine):
+    with engine.connect() as connection:
+        return [tuple(r) for r in connection.exec_driver_sql("SELECT employee_id, date, time FROM time_logs ORDER BY id")]
+
+
+def make_events(*payloads):
+    return [(seq, f"event-{seq}", payload) for seq, payload in enumerate(payloads, start=1)]
+
+
+def start(employee_id, date_str="2025-01-05", time_str="08:00:00"):
+    return {"op": "start", "Employee_ID": employee_id, "Date": date_str, "Time": time_str, "Activity_Type": "Break"}
+
+
+def test_batch_is_written_and_claimed(db):
+    writer = app.SupabaseEventWriter(db.conn)
+    outcomes = writer(make_events(start("001"), start("002")))
+    assert outcomes == [None, None]
+    assert rows(db.engine) == [("001", "2025-01-05", "08:00:00"), ("002", "2025-01-05", "08:00:00")]
+    assert [p["Employee_ID"] for p in db.applied_batches[-1]] == ["001", "002"]
+
+
+def test_replayed_events_are_skipped(db):
+    writer = app.SupabaseEventWriter(db.conn)
+    events = make_events(start("001"), start("002"))
+    writer(events[:1])
+    assert writer(events) == [None, None] # event-1 ส่งซ้ำ (เช่น _finish ของคิวล้มเหลว)
+    assert [r[0] for r in rows(db.engine)] == ["001", "002"]
+    assert [p["Employee_ID"] for p in db.applied_batches[-1]] == ["002"]
+
+
+def test_permanent_error_isolates_only_the_bad_event(db):
+    writer = app.SupabaseEventWriter(db.conn)
+    outcomes = writer(make_events(start("001"), start("002", date_str="not-a-date"), start("003")))
+    assert outcomes[0] is None and outcomes[2] is None
+    assert "IntegrityError" in outcomes[1]
+    assert [r[0] for r in rows(db.engine)] == ["001", "003"]
+    # event ที่ผิดไม่ถูก claim: แก้ข้อมูลแล้วส่ง event_id เดิมใหม่ได้
+    with db.engine.connect() as connection:
+        claimed = {r[0] for r in connection.exec_driver_sql("SELECT event_id FROM time_log_events")}
+    assert claimed == {"event-1", "event-3"}
+
+
+def test_transient_error_is_raised_without_partial_writes(db):
+    writer = app.SupabaseEventWriter(db.conn)
+    db.down["remaining"] = 1
+    with pytest.raises(OperationalError):
+        writer(make_events(start("001")))
+    assert rows(db.engine) == []
+    assert db.applied_batches == [] # Cache ไม่ถูกแพตช์ก่อน commit
+    assert writer(make_events(start("001"))) == [None]
+    assert [r[0] for r in rows(db.engine)] == ["001"]
+
+
+def test_missing_event_table_keeps_events_queued(db, tmp_path):
+    engine = sqlite_engine(tmp_path / "not-migrated.sqlite3", migrated=False)
+    writer = app.SupabaseEventWriter(SqliteConnection(engine))
+    with pytest.raises(RuntimeError, match="time_log_events"):
+        writer(make_events(start("001"))) # คิวเก็บ event ไว้และลองใหม่ภายหลัง
+    assert rows(engine) == []
+    with engine.begin() as connection:
+        connection.exec_driver_sql(SQLITE_EVENT_SCHEMA) # รัน Migration แล้ว
+    assert writer(make_events(start("001"))) == [None]
+    assert [r[0] for r in rows(engine)] == ["001"]
+
+
+def test_queue_delivers_through_writer_exactly_once(db, tmp_path):
+    db.down["remaining"] = 2
+    queue = WriteAheadQueue(
+        str(tmp_path / "queue.sqlite3"), app.SupabaseEventWriter(db.conn), retry_seconds=0.01, max_retry_seconds=0.05
+    )
+    try:
+        for employee_id in ("001", "002", "003"):
+            queue.enqueue(start(employee_id))
+        queue.enqueue(start("004", date_str="not-a-date"))
+        assert queue.flush(timeout=10)
+        assert queue.failed_count() == 1
+    finally:
+        queue.close()
+    assert [r[0] for r in rows(db.engine)] == ["001", "002", "003"]
+
+
+class FakeQueue:
+    """แทน WriteAheadQueue: เก็บ event ไว้เฉย ๆ (ยังไม่ส่ง = ค้างในคิว)"""
+
+    def __init__(self):
+        self.events = []
+        self.last_error = None
+
+    def enqueue(self, payload):
+        self.events.append(payload)
+        return len(self.events), f"event-{len(self.events)}"
+
+    def pending_count(self):
+        return len(self.events)
+
+
+@pytest.fixture
+def queue_mode(monkeypatch):
+    queue, calls = FakeQueue(), {"loads": 0, "db_closes": []}
+
+    def load_open_activities(conn, date_str):
+        calls["loads"] += 1
+        return [] # DB ยังไม่เห็น start ที่ค้างในคิว
+
+    def close_in_db(employee_id, date_str, end_time_str):
+        calls["db_closes"].append(employee_id)
+        return False
+
+    index = app.OpenActivityIndex()
+    monkeypatch.setattr(app.st, "connection", lambda *args, **kwargs: None)
+    monkeypatch.setattr(app, "OPEN_INDEX_MAX_AGE", 0) # ดัชนีหมดอายุทุกครั้ง
+    monkeypatch.setattr(app, "get_write_queue", lambda: queue)
+    monkeypatch.setattr(app, "get_open_activity_index", lambda: index)
+    monkeypatch.setattr(app, "_load_open_activities", load_open_activities)
+    monkeypatch.setattr(app, "_close_in_db", close_in_db)
+    return SimpleNamespace(queue=queue, index=index, calls=calls)
+
+
+def test_close_follows_pending_start_through_queue(queue_mode):
+    assert app._enqueue_log_event("start", "001", "2025-01-05", "08:00:00", "Break")
+    assert app._enqueue_log_event("close", "001", "2025-01-05", "08:15:00")
+    assert [e["op"] for e in queue_mode.queue.events] == ["start", "close"]
+    assert queue_mode.calls["db_closes"] == []
+    assert queue_mode.calls["loads"] == 1 # โหลดเฉพาะตอนคิวว่าง (ก่อน start)
+
+
+def test_close_without_open_activity_asks_db_when_queue_is_empty(queue_mode):
+    assert app._enqueue_log_event("close", "001", "2025-01-05", "08:15:00") is False
+    assert queue_mode.calls["db_closes"] == ["001"]
+    assert queue_mode.queue.events == []
@@ -0,0 +1,143 @@
+"""WriteAheadQueue กับปลายทางจำลองบน SQLite (event_id เป็น idempotency key แบบเดียวกับ time_log_events)"""
+import sqlite3
+import threading
+
+import pytest
+
+from time_log_core import WriteAheadQueue
+
+
+class SqliteTarget:
+    """ปลายทางจำลอง: เขียน event ลงตาราง applied (ข้าม event_id ที่เคยเขียนแล้ว)"""
+
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self.db.execute("CREATE TABLE applied (event_id TEXT PRIMARY KEY, value INTEGER)")
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.transient_failures = 0 # จำนวนครั้งแรกที่จะโยน Exception (เหมือนฐานข้อมูลล่ม)
+
+    def __call__(self, events):
+        with self.lock:
+            self.calls += 1
+            if self.transient_failures:
+                self.transient_failures -= 1
+                raise ConnectionError("database unavailable")
+            outcomes = []
+            with self.db:
+                for _, event_id, payload in events:
+                    if payload.get("bad"):
+                        outcomes.append("invalid payload")
+                        continue
+                    self.db.execute("INSERT OR IGNORE INTO applied VALUES (?, ?)", (event_id, payload["value"]))
+                    outcomes.append(None)
+            return outcomes
+
+    def values(self):
+        with self.lock:
+            return [v for (v,) in self.db.execute("SELECT value FROM applied ORDER BY rowid")]
+
+
+@pytest.fixture
+def target():
+    return SqliteTarget()
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(apply_batch, **kwargs):
+        kwargs.setdefault("retry_seconds", 0.01)
+        kwargs.setdefault("max_retry_seconds", 0.05)
+        queue = WriteAheadQueue(str(tmp_path / "queue.sqlite3"), apply_batch, **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+
+
+def test_enqueue_is_applied_in_order(make_queue, target):
+    queue = make_queue(target, batch_size=3)
+    for value in range(10):
+        queue.enqueue({"value": value})
+    assert queue.flush(timeout=5)
+    assert target.values() == list(range(10))
+    assert queue.pending_count() == 0 and queue.failed_count() == 0
+
+
+def test_transient_error_keeps_events_and_retries(make_queue, target):
+    target.transient_failures = 3
+    queue = make_queue(target)
+    queue.enqueue({"value": 1})
+    assert queue.flush(timeout=5)
+    assert target.values() == [1]
+    assert target.calls >= 4
+    assert queue.last_error is None
+
+
+def test_permanent_failure_moves_event_to_failed_events(make_queue, target):
+    queue = make_queue(target)
+    queue.enqueue({"value": 1})
+    queue.enqueue({"value": 2, "bad": True})
+    queue.enqueue({"value": 3})
+    assert queue.flush(timeout=5)
+    assert target.values() == [1, 3]
+    assert queue.failed_count() == 1
+    error, = queue._db.execute("SELECT error FROM failed_events").fetchone()
+    assert error == "invalid payload"
+
+
+def test_replay_after_finish_failure_is_idempotent(make_queue, target, monkeypatch):
+    finish_failures = []
+    original_finish = WriteAheadQueue._finish
+
+    def flaky_finish(self, events, outcomes):
+        if not finish_failures:
+            finish_failures.append(events)
+            raise sqlite3.OperationalError("disk I/O error")
+        original_finish(self, events, outcomes)
+
+    monkeypatch.setattr(WriteAheadQueue, "_finish", flaky_finish)
+    queue = make_queue(target)
+    queue.enqueue({"value": 1})
+    queue.enqueue({"value": 2})
+    assert queue.flush(timeout=5) # Thread ยังทำงานต่อหลัง _finish ล้มเหลว
+    assert finish_failures
+    assert target.calls >= 2 # ชุดเดิมถูกส่งซ้ำ
+    assert target.values() == [1, 2] # แต่เขียนครั้งเดียว
+    assert queue.last_error is None
+
+
+def test_local_queue_error_does_not_stop_flusher(make_queue, target, monkeypatch):
+    failures = [sqlite3.OperationalError("database is locked")] * 2
+    original_next_batch = WriteAheadQueue._next_batch
+
+    def flaky_next_batch(self):
+        if failures:
+            raise failures.pop()
+        return original_next_batch(self)
+
+    monkeypatch.setattr(WriteAheadQueue, "_next_batch", flaky_next_batch)
+    queue = make_queue(target)
+    queue.enqueue({"value": 7})
+    assert queue.flush(timeout=5)
+    assert queue._thread.is_alive()
+    assert target.values() == [7]
+
+
+def test_pending_events_survive_reopen(tmp_path, target):
+    target.transient_failures = 10 ** 6
+    queue = WriteAheadQueue(str(tmp_path / "queue.sqlite3"), target, retry_seconds=0.01, max_retry_seconds=0.01)
+    queue.enqueue({"value": 1})
+    queue.close()
+
+    target.transient_failures = 0
+    reopened = WriteAheadQueue(str(tmp_path / "queue.sqlite3"), target, retry_seconds=0.01)
+    try:
+        assert reopened.flush(timeout=5)
+    finally:
+        reopened.close()
+    assert target.values() == [1]
@@ -0,0 +1,68 @@
+"""WriteCoalescer: รวมชุด, แยกรายการที่ผิดถาวร และไม่มี Future ค้าง"""
+import threading
+
+import pytest
+
+from time_log_core import WriteCoalescer
+
+
+class Recorder:
+    """flush_batch จำลอง: op ที่ติดลบผิดถาวร (ทั้งชุด rollback), คืนผล op * 10"""
+
+    def __init__(self, down=False):
+        self.calls = []
+        self.down = down
+        self.lock = threading.Lock()
+
+    def __call__(self, ops):
+        with self.lock:
+            self.calls.append(list(ops))
+        if self.down:
+            raise ConnectionError("database unavailable")
+        if any(op < 0 for op in ops):
+            raise ValueError(f"bad op in {ops}")
+        return [op * 10 for op in ops]
+
+
+def submit_together(coalescer, ops):
+    return [coalescer.submit(op) for op in ops]
+
+
+def test_concurrent_ops_share_one_batch():
+    flush = Recorder()
+    coalescer = WriteCoalescer(flush, window_seconds=0.05)
+    futures = submit_together(coalescer, [1, 2, 3])
+    assert [f.result(timeout=5) for f in futures] == [10, 20, 30]
+    assert flush.calls == [[1, 2, 3]]
+
+
+def test_bad_op_is_retried_alone():
+    flush = Recorder()
+    coalescer = WriteCoalescer(flush, window_seconds=0.05)
+    futures = submit_together(coalescer, [1, -2, 3])
+    assert futures[0].result(timeout=5) == 10
+    assert futures[2].result(timeout=5) == 30
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    assert flush.calls == [[1, -2, 3], [1], [-2], [3]]
+
+
+def test_unsplittable_error_fails_whole_batch_once():
+    flush = Recorder(down=True)
+    coalescer = WriteCoalescer(flush, window_seconds=0.05, split_on_error=lambda e: not isinstance(e, ConnectionError))
+    futures = submit_together(coalescer, [1, 2])
+    for future in futures:
+        with pytest.raises(ConnectionError):
+            future.result(timeout=5)
+    assert flush.calls == [[1, 2]]
+
+
+def test_short_results_fail_leftover_futures():
+    coalescer = WriteCoalescer(lambda ops: [op * 10 for op in ops[:1]], window_seconds=0.05)
+    futures = submit_together(coalescer, [1, 2, 3])
+    assert futures[0].result(timeout=5) == 10
+    for future in futures[1:]:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    # Thread ยังรับชุดถัดไปได้
+    assert coalescer.submit(4).result(timeout=5) == 40
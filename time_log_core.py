@@ -0,0 +1,733 @@
+import bisect
+import json
+import logging
+import sqlite3
+import tempfile
+import threading
+import time as _time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------
+# 💥 [NEW] ฟังก์ชัน/คลาสส่วนกลางที่ใช้ร่วมกันระหว่าง Time_Break_app.py (CSV)
+# และ Time_app_Break_Supabase_data.py (Supabase) — ไม่มีการเรียก streamlit ในไฟล์นี้
+# -----------------------------------------------------------------
+
+SECONDS_PER_DAY = 24 * 60 * 60
+TIME_MISSING = -1 # ค่าใน Array วินาทีของวัน สำหรับเวลาที่ว่าง/อ่านไม่ได้
+
+# รูปแบบเดียวกับ datetime.strptime('%H:%M:%S') / ('%H:%M'): ชั่วโมง/นาที/วินาที 1-2 หลัก (เฉพาะเลข ASCII)
+_TIME_HMS_PATTERN = r"^([01]?[0-9]|2[0-3]):([0-5]?[0-9]):([0-5]?[0-9])$"
+_TIME_HM_PATTERN = r"^([01]?[0-9]|2[0-3]):([0-5]?[0-9])()$"
+
+
+def time_to_seconds(values, allow_hhmm=False):
+    """แปลงคอลัมน์เวลา ('HH:MM:SS') ทั้งคอลัมน์เป็น Array int32 ของวินาทีนับจากเที่ยงคืน
+
+    ค่าว่าง/อ่านไม่ได้ = TIME_MISSING (ตรงกับกรณีที่ calculate_duration คืน NaN)
+    allow_hhmm=True ยอมรับ 'HH:MM' ด้วย (เหมือน calculate_duration ของเวอร์ชัน Supabase)
+    """
+    series = pd.Series(values, dtype=object)
+    missing = series.isna().to_numpy()
+    text = series.where(~missing, "").astype(str)
+    seconds = np.full(len(text), TIME_MISSING, dtype=np.int32)
+    if not len(text):
+        return seconds
+
+    # ทางลัด: 'HH:MM:SS' ความยาว 8 ตัวอักษร (รูปแบบที่แอปเขียนเอง) คำนวณจากรหัสตัวอักษรด้วย NumPy ทั้งก้อน
+    lengths = text.str.len().to_numpy()
+    fast = (lengths == 8) & ~missing
+    if fast.any():
+        codes = np.array(text[fast].tolist(), dtype="U8").view(np.int32).reshape(-1, 8) - ord("0")
+        digits = codes[:, [0, 1, 3, 4, 6, 7]]
+        hours = digits[:, 0] * 10 + digits[:, 1]
+        minutes = digits[:, 2] * 10 + digits[:, 3]
+        secs = digits[:, 4] * 10 + digits[:, 5]
+        valid = (
+            ((digits >= 0) & (digits <= 9)).all(axis=1)
+            & (codes[:, 2] == ord(":") - ord("0")) & (codes[:, 5] == ord(":") - ord("0"))
+            & (hours <= 23) & (minutes <= 59) & (secs <= 59)
+        )
+        seconds[np.flatnonzero(fast)[valid]] = (hours * 3600 + minutes * 60 + secs)[valid]
+
+    # รูปแบบอื่น ('8:05:00', 'HH:MM' ฯลฯ) ใช้ Regular expression
+    slow = ~fast & ~missing
+    if slow.any():
+        slow_text = text[slow]
+        parts = slow_text.str.extract(_TIME_HMS_PATTERN)
+        if allow_hhmm:
+            parts = parts.fillna(slow_text.str.extract(_TIME_HM_PATTERN))
+        parsed = parts.notna().iloc[:, :2].all(axis=1).to_numpy()
+        parts = parts.replace("", "0").fillna("0").astype(np.int32).to_numpy()
+        slow_seconds = parts[:, 0] * 3600 + parts[:, 1] * 60 + parts[:, 2]
+        seconds[np.flatnonzero(slow)[parsed]] = slow_seconds[parsed]
+    return seconds
+
+
+def calculate_duration_batch(start_times, end_times, allow_hhmm=False):
+    """คำนวณ Duration_Minutes ทั้งคอลัมน์ (ผลเท่ากับเรียก calculate_duration ทีละแถว)
+
+    เวลาจบน้อยกว่าเวลาเริ่ม = ข้ามเที่ยงคืน (+1 วัน), แถวที่เวลาว่าง/อ่านไม่ได้ = NaN
+    """
+    start_seconds = time_to_seconds(start_times, allow_hhmm).astype(np.int64)
+    end_seconds = time_to_seconds(end_times, allow_hhmm).astype(np.int64)
+    valid = (start_seconds != TIME_MISSING) & (end_seconds != TIME_MISSING)
+    elapsed = (end_seconds - start_seconds) % SECONDS_PER_DAY
+    return np.where(valid, elapsed / 60, np.nan)
+
+
+# ป้าย 'HH:MM' ของทุกนาทีในหนึ่งวัน (index = นาทีนับจากเที่ยงคืน)
+_HHMM_LABELS = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(SECONDS_PER_DAY // 60)], dtype=object)
+
+# คอลัมน์ข้อความสำหรับแสดงผล ที่คำนวณครั้งเดียวตอนโหลด/แพตช์ข้อมูล แล้ว Cache ไปพร้อมกับ DataFrame
+DISPLAY_COLUMNS = ['Start_Time_Display', 'End_Time_Display', 'Duration_Display']
+
+
+def format_duration_column(values):
+    """จัดรูปแบบคอลัมน์นาทีเป็น 'HH:MM' ทั้งคอลัมน์ (ความหมายเดียวกับ format_duration เดิม)
+
+    ค่าว่าง/แปลงเป็นตัวเลขไม่ได้ = "N/A", ติดลบ = "00:00", ปัดเศษนาทีทิ้ง
+    """
+    series = pd.Series(values)
+    numbers = pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+    valid = np.isfinite(numbers)
+    minutes = np.trunc(np.where(valid, numbers, 0)).astype(np.int64)
+
+    labels = np.full(len(numbers), "N/A", dtype=object)
+    labels[valid & (minutes < 0)] = "00:00"
+    within_day = valid & (minutes >= 0) & (minutes < len(_HHMM_LABELS))
+    labels[within_day] = _HHMM_LABELS[minutes[within_day]]
+    longer = np.flatnonzero(valid & (minutes >= len(_HHMM_LABELS)))
+    labels[longer] = [f"{m // 60:02d}:{m % 60:02d}" for m in minutes[longer]]
+    return pd.Series(labels, index=series.index, dtype=object)
+
+
+# -----------------------------------------------------------------
+# 💥 [NEW] รูปแบบข้อมูล Log ในหน่วยความจำแบบกะทัดรัด (compact)
+#   Date = datetime64[s] (pandas ไม่รองรับ datetime64[D]), Start_Time / End_Time = int32 วินาทีของวัน
+#   (TIME_MISSING = ว่าง), Employee_ID / Activity_Type = category, Duration_Minutes = float32
+#   ข้อความ (วันที่/เวลา) สร้างเฉพาะตอนแสดงผลหรือส่งออกไฟล์
+# -----------------------------------------------------------------
+_SS_LABELS = np.array([f"{s:02d}" for s in range(60)], dtype=object)
+# ป้ายของคอลัมน์แสดงผลเวลา = ทุกนาทีของวัน + "N/A" (category คงที่ ใช้พื้นที่แถวละ 2 ไบต์)
+_TIME_DISPLAY_DTYPE = pd.CategoricalDtype(list(_HHMM_LABELS) + ["N/A"])
+LOG_CATEGORY_COLUMNS = ['Employee_ID', 'Activity_Type'] + DISPLAY_COLUMNS
+
+
+def format_seconds_column(seconds):
+    """วินาทีของวัน (int) -> 'HH:MM' แบบ Categorical (TIME_MISSING = "N/A")"""
+    seconds = np.asarray(seconds)
+    codes = np.where(seconds == TIME_MISSING, len(_HHMM_LABELS), seconds // 60).astype(np.int16)
+    return pd.Categorical.from_codes(codes, dtype=_TIME_DISPLAY_DTYPE)
+
+
+def seconds_to_time_text(seconds):
+    """วินาทีของวัน (int) -> 'HH:MM:SS' (TIME_MISSING = NaN) สำหรับส่งออก/ใช้เป็นพารามิเตอร์"""
+    seconds = np.asarray(seconds)
+    present = seconds != TIME_MISSING
+    text = np.full(len(seconds), np.nan, dtype=object)
+    text[present] = _HHMM_LABELS[seconds[present] // 60] + ":" + _SS_LABELS[seconds[present] % 60]
+    return text
+
+
+def add_display_columns(df):
+    """เพิ่ม DISPLAY_COLUMNS (เวลาเริ่ม/จบ/ระยะเวลา ในรูปแบบ 'HH:MM') ให้ DataFrame แบบ compact"""
+    return df.assign(**{
+        'Start_Time_Display': format_seconds_column(df['Start_Time'].to_numpy()),
+        'End_Time_Display': format_seconds_column(df['End_Time'].to_numpy()),
+        'Duration_Display': pd.Categorical(format_duration_column(df['Duration_Minutes'].to_numpy()).astype('str')),
+    })
+
+
+def _time_column_to_seconds(values, allow_hhmm):
+    """คอลัมน์เวลา (ข้อความ หรือวินาทีที่เป็นตัวเลขอยู่แล้ว) -> int32 วินาทีของวัน"""
+    if pd.api.types.is_numeric_dtype(values):
+        return pd.Series(values).fillna(TIME_MISSING).to_numpy(dtype=np.int32)
+    return time_to_seconds(values, allow_hhmm)
+
+
+def compact_log_frame(df, allow_hhmm=False):
+    """แปลง DataFrame ของ Log (คอลัมน์ข้อความ) เป็นรูปแบบ compact + DISPLAY_COLUMNS
+
+    คอลัมน์อื่น (เช่น id) คงไว้ตามเดิม, Start_Time / End_Time ที่เป็นตัวเลขถือว่าเป็นวินาทีของวันแล้ว
+    """
+    return add_display_columns(df.assign(
+        Employee_ID=df['Employee_ID'].astype('str').astype('category'),
+        Date=pd.to_datetime(df['Date']).astype('datetime64[s]'),
+        Start_Time=_time_column_to_seconds(df['Start_Time'], allow_hhmm),
+        End_Time=_time_column_to_seconds(df['End_Time'], allow_hhmm),
+        Activity_Type=df['Activity_Type'].astype('str').astype('category'),
+        Duration_Minutes=pd.to_numeric(df['Duration_Minutes'], errors='coerce').astype(np.float32),
+    ))
+
+
+def concat_log_frames(frames):
+    """ต่อ DataFrame แบบ compact หลายก้อน โดยรวม category ของแต่ละคอลัมน์ (ไม่ให้กลายเป็น object)"""
+    non_empty = [frame for frame in frames if len(frame)]
+    if len(non_empty) <= 1:
+        return non_empty[0] if non_empty else frames[0]
+    combined = pd.concat(non_empty)
+    for col in LOG_CATEGORY_COLUMNS:
+        if col in combined.columns and not isinstance(combined[col].dtype, pd.CategoricalDtype):
+            combined[col] = union_categoricals(
+                [frame[col].astype('category') for frame in non_empty], ignore_order=True
+            )
+    return combined
+
+
+def upsert_log_rows(frame, rows):
+    """แทนที่/เพิ่มแถว (ตาม Index) ใน DataFrame แบบ compact คืน DataFrame ใหม่ (ไม่แก้ frame เดิม)"""
+    return concat_log_frames([frame.drop(index=rows.index, errors='ignore'), rows])
+
+
+def log_frame_to_text(df):
+    """แปลง DataFrame แบบ compact กลับเป็นคอลัมน์ข้อความ (สำหรับบันทึก/ดาวน์โหลด) โดยตัด DISPLAY_COLUMNS ออก
+
+    Duration_Minutes เก็บเป็น float32 จึงปัดเป็นทศนิยม 4 ตำแหน่งตอนส่งออก
+    """
+    return df.drop(columns=DISPLAY_COLUMNS, errors='ignore').assign(
+        Employee_ID=df['Employee_ID'].astype(object),
+        Date=df['Date'].dt.strftime('%Y-%m-%d'),
+        Start_Time=seconds_to_time_text(df['Start_Time'].to_numpy()),
+        End_Time=seconds_to_time_text(df['End_Time'].to_numpy()),
+        Activity_Type=df['Activity_Type'].astype(object),
+        Duration_Minutes=df['Duration_Minutes'].astype(np.float64).round(4),
+    )
+
+
+def sort_for_display(frame, tie_breaker=None):
+    """เรียงตามลำดับแสดงผล: Date, Start_Time (และ tie_breaker เช่น id) ล่าสุดก่อน"""
+    by = ['Date', 'Start_Time'] + ([tie_breaker] if tie_breaker else [])
+    return frame.sort_values(by=by, ascending=False, kind='stable')
+
+
+class LogFrameIndex:
+    """💥 [NEW] ดัชนีของ DataFrame แบบ compact ที่เรียงตามลำดับแสดงผลแล้ว (ดู sort_for_display)
+
+    กรองช่วงวันที่ด้วย searchsorted 2 ครั้ง (ได้ slice ของ frame ไม่ต้อง copy / สร้าง mask ทั้งตาราง)
+    และกรองพนักงานด้วยตำแหน่งแถวของแต่ละ Employee_ID ที่สร้างไว้ครั้งเดียว
+    ห้ามแก้ frame หลังสร้างดัชนี — ข้อมูลเปลี่ยนให้สร้าง LogFrameIndex ใหม่
+    """
+
+    def __init__(self, frame, presorted=False, tie_breaker=None):
+        self.frame = frame if presorted else sort_for_display(frame, tie_breaker)
+        days = self.frame['Date'].to_numpy().astype('datetime64[D]')
+        # Date เรียงจากมากไปน้อย -> ใช้ค่าติดลบให้ searchsorted ได้ Array จากน้อยไปมาก (NaT อยู่ท้ายสุด)
+        self._date_keys = np.where(np.isnat(days), np.iinfo(np.int64).max, -days.view(np.int64))
+        self._positions = None  # Employee_ID -> ตำแหน่งแถว (เรียงจากน้อยไปมาก) สร้างเมื่อใช้ครั้งแรก
+
+    @property
+    def employee_ids(self):
+        """Employee_ID ที่มีใน frame (เรียงแล้ว)"""
+        return sorted(self._employee_positions())
+
+    def date_bounds(self, date_from=None, date_to=None):
+        """ช่วงตำแหน่งแถว [start, stop) ของวันที่ date_from ถึง date_to (รวมทั้งสองวัน)"""
+        start = 0 if date_to is None else np.searchsorted(self._date_keys, -self._day_number(date_to), 'left')
+        stop = (len(self.frame) if date_from is None
+                else np.searchsorted(self._date_keys, -self._day_number(date_from), 'right'))
+        return int(start), int(max(start, stop))
+
+    def select(self, date_from=None, date_to=None, employee_id=None):
+        """แถวตาม Filter (ลำดับแสดงผล) — ไม่ระบุพนักงานจะได้ slice ของ frame โดยไม่ copy"""
+        start, stop = self.date_bounds(date_from, date_to)
+        if employee_id is None:
+            return self.frame.iloc[start:stop]
+        positions = self._employee_positions().get(employee_id, np.empty(0, dtype=np.intp))
+        positions = positions[np.searchsorted(positions, start):np.searchsorted(positions, stop)]
+        return self.frame.iloc[positions]
+
+    @staticmethod
+    def _day_number(value):
+        return np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64)
+
+    def _employee_positions(self):
+        if self._positions is None:
+            employee_ids = self.frame['Employee_ID'].astype('category')
+            codes = employee_ids.cat.codes.to_numpy()
+            order = np.argsort(codes, kind='stable') # ตำแหน่งในแต่ละกลุ่มยังเรียงจากน้อยไปมาก
+            bounds = np.searchsorted(codes[order], np.arange(len(employee_ids.cat.categories) + 1))
+            self._positions = {
+                category: order[bounds[i]:bounds[i + 1]]
+                for i, category in enumerate(employee_ids.cat.categories)
+                if bounds[i + 1] > bounds[i]
+            }
+        return self._positions
+
+
+# -----------------------------------------------------------------
+# 💥 [NEW] ส่งออก CSV แบบเป็นก้อน: แปลงเป็นข้อความทีละ EXPORT_CHUNK_ROWS แถวแล้วเขียนลงไฟล์ชั่วคราว
+# (หน่วยความจำสูงสุดขึ้นกับขนาดก้อน ไม่ใช่จำนวนแถวทั้งหมด) ใช้กับ st.download_button(data=callable)
+# -----------------------------------------------------------------
+EXPORT_CHUNK_ROWS = 50_000
+CSV_BOM = "\ufeff" # ให้ Excel อ่านภาษาไทยถูกต้อง (ใส่ครั้งเดียวที่ต้นไฟล์)
+
+
+def iter_frame_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """แบ่ง DataFrame เป็นก้อนละ chunk_rows แถว (slice ไม่ copy)"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def iter_csv_chunks(frames, columns, to_text=None):
+    """CSV (UTF-8 bytes) ทีละก้อน จาก iterable ของ DataFrame: BOM + Header ในก้อนแรกเท่านั้น
+
+    to_text(frame) แปลงแต่ละก้อนเป็นคอลัมน์ข้อความก่อนเขียน (เช่น log_frame_to_text)
+    """
+    header = True
+    for frame in frames:
+        if to_text is not None:
+            frame = to_text(frame)
+        text = frame.reindex(columns=columns).to_csv(index=False, header=header)
+        yield ((CSV_BOM if header else "") + text).encode("utf-8")
+        header = False
+    if header: # ไม่มีข้อมูลเลย: ไฟล์มีเฉพาะ Header
+        yield (CSV_BOM + pd.DataFrame(columns=columns).to_csv(index=False)).encode("utf-8")
+
+
+def spool_chunks(chunks):
+    """เขียนก้อน bytes ลงไฟล์ชั่วคราว คืนไฟล์ที่เปิดไว้ (อ่านจากต้นไฟล์) — ไฟล์ถูกลบเมื่อปิด"""
+    spooled = tempfile.TemporaryFile()
+    for chunk in chunks:
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+
+class OpenActivityIndex:
+    """ดัชนีกิจกรรมที่ยังไม่ปิด (End_Time ว่าง) แยกตาม (Employee_ID, Date)
+
+    ใช้ร่วมกันทุก Session ผ่าน st.cache_resource ทำให้การ Clock Out เป็นการค้นหาใน dict
+    แทนการสแกนทั้งตาราง ข้อมูลถูกโหลดทีละ "ขอบเขต" (scope) ผ่าน loader ที่ส่งเข้ามา
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._open = {}    # (Employee_ID, Date) -> [(sort_key, row_id, start_time), ...] เรียงจากเก่าไปใหม่
+        self._keys = {}    # row_id -> (Employee_ID, Date, scope)
+        self._scopes = {}  # scope -> เวลาที่โหลด (monotonic)
+
+    def ensure_scope(self, scope, loader, max_age=None):
+        """โหลดแถวที่เปิดอยู่ของขอบเขตนี้ (ถ้ายังไม่เคยโหลด หรือเก่ากว่า max_age วินาที)
+
+        loader() ต้องคืน iterable ของ (employee_id, date_str, sort_key, row_id, start_time)
+        """
+        with self._lock:
+            loaded_at = self._scopes.get(scope)
+            if loaded_at is not None and (max_age is None or _time.monotonic() - loaded_at < max_age):
+                return
+            self._drop_scope(scope)
+            for employee_id, date_str, sort_key, row_id, start_time in loader():
+                self._add(employee_id, date_str, sort_key, row_id, start_time, scope)
+            self._scopes[scope] = _time.monotonic()
+
+    def add(self, employee_id, date_str, row_id, start_time, sort_key, scope):
+        """เพิ่มกิจกรรมที่เพิ่งเริ่ม (scope เดียวกับที่ใช้ใน ensure_scope)"""
+        with self._lock:
+            self._add(employee_id, date_str, sort_key, row_id, start_time, scope)
+
+    def has_open(self, employee_id, date_str):
+        """มีกิจกรรมที่ยังเปิดอยู่ของพนักงานในวันนั้นหรือไม่"""
+        with self._lock:
+            return bool(self._open.get((str(employee_id), str(date_str))))
+
+    def pop_latest(self, employee_id, date_str):
+        """นำกิจกรรมล่าสุดที่ยังเปิดอยู่ออกจากดัชนี คืน (row_id, start_time) หรือ None"""
+        with self._lock:
+            key = (str(employee_id), str(date_str))
+            entries = self._open.get(key)
+            if not entries:
+                return None
+            _, row_id, start_time = entries.pop()
+            if not entries:
+                del self._open[key]
+            self._keys.pop(row_id, None)
+            return row_id, start_time
+
+    def discard(self, row_id):
+        """ลบแถวออกจากดัชนี (เช่น เมื่อ Log ถูกลบ) คืน True ถ้าพบ — ไม่มีผลถ้าไม่พบ"""
+        with self._lock:
+            entry_key = self._keys.pop(row_id, None)
+            if entry_key is None:
+                return False
+            key = entry_key[:2]
+            entries = [e for e in self._open.get(key, []) if e[1] != row_id]
+            if entries:
+                self._open[key] = entries
+            else:
+                self._open.pop(key, None)
+            return True
+
+    def invalidate(self, scope=None):
+        """ล้างดัชนี (ทั้งหมด หรือเฉพาะขอบเขต) เพื่อให้โหลดใหม่ครั้งถัดไป"""
+        with self._lock:
+            if scope is None:
+                self._open.clear()
+                self._keys.clear()
+                self._scopes.clear()
+            else:
+                self._drop_scope(scope)
+
+    # --- ภายใน (ต้องถือ lock อยู่แล้ว) ---
+
+    def _add(self, employee_id, date_str, sort_key, row_id, start_time, scope):
+        if row_id in self._keys:
+            return
+        key = (str(employee_id), str(date_str))
+        bisect.insort(self._open.setdefault(key, []), (sort_key, row_id, start_time))
+        self._keys[row_id] = key + (scope,)
+
+    def _drop_scope(self, scope):
+        self._scopes.pop(scope, None)
+        for row_id in [r for r, k in self._keys.items() if k[2] == scope]:
+            self.discard(row_id)
+
+
+class EmployeeDirectory:
+    """💥 [NEW] รายชื่อพนักงาน (user_data) ในหน่วยความจำ ใช้ร่วมกันทุก Session ผ่าน st.cache_resource
+
+    ค้นหาชื่อจาก ID ด้วย dict, มีรายการ ID ที่เรียงไว้แล้ว และบอกได้ว่า ID ใดมีอยู่แล้ว (ไม่ต้อง upsert ซ้ำ)
+    การเขียนจาก Process นี้อัปเดตผ่าน register / update ส่วนการเขียนจากที่อื่นจะเห็นเมื่อโหลดใหม่ตาม max_age
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = {}        # Employee_ID -> (Employee_Name, Employee_Surname)
+        self._ids = []          # Employee_ID เรียงแล้ว (สร้าง list ใหม่ทุกครั้งที่เปลี่ยน ไม่แก้ในที่)
+        self._loaded_at = None  # monotonic
+
+    def ensure_loaded(self, loader, max_age=None):
+        """โหลดรายชื่อ (ถ้ายังไม่เคยโหลด หรือเก่ากว่า max_age วินาที)
+
+        loader() ต้องคืน iterable ของ (employee_id, name, surname) — ID ซ้ำใช้แถวแรก
+        """
+        with self._lock:
+            if self._loaded_at is not None and (max_age is None or _time.monotonic() - self._loaded_at < max_age):
+                return
+            names = {}
+            for employee_id, name, surname in loader():
+                names.setdefault(str(employee_id), (name or "", surname or ""))
+            self._names = names
+            self._ids = sorted(names)
+            self._loaded_at = _time.monotonic()
+
+    def invalidate(self):
+        """ให้โหลดรายชื่อใหม่ในครั้งถัดไป"""
+        with self._lock:
+            self._loaded_at = None
+
+    @property
+    def ids(self):
+        """Employee_ID ทั้งหมด เรียงแล้ว (ห้ามแก้ list ที่ได้)"""
+        return self._ids
+
+    def __contains__(self, employee_id):
+        return str(employee_id) in self._names
+
+    def lookup(self, employee_id):
+        """(ชื่อ, นามสกุล) ของ ID หรือ None ถ้าไม่พบ"""
+        return self._names.get(str(employee_id))
+
+    def register(self, employee_id):
+        """เพิ่ม ID ใหม่ (ชื่อว่าง) คืน True ถ้าเป็น ID ใหม่"""
+        employee_id = str(employee_id)
+        with self._lock:
+            if employee_id in self._names:
+                return False
+            self._set(employee_id, ("", ""))
+            return True
+
+    def update(self, employee_id, name, surname):
+        """ตั้งชื่อ/นามสกุลของ ID (เพิ่มให้ถ้ายังไม่มี)"""
+        with self._lock:
+            self._set(str(employee_id), (name or "", surname or ""))
+
+    # --- ภายใน (ต้องถือ lock อยู่แล้ว) ---
+
+    def _set(self, employee_id, names):
+        if employee_id not in self._names:
+            position = bisect.bisect_left(self._ids, employee_id)
+            self._ids = self._ids[:position] + [employee_id] + self._ids[position:]
+        self._names[employee_id] = names
+
+
+class TableGenerations:
+    """ตัวนับรุ่น (generation) ของข้อมูลแยกตามตาราง
+
+    ฟังก์ชันที่ Cache ด้วย st.cache_data รับเลขรุ่นของตารางที่ตัวเองอ่านเป็นพารามิเตอร์
+    เมื่อเขียนตารางใดก็เพิ่มเลขรุ่นของตารางนั้น Cache ของตารางอื่นจึงไม่ถูกล้างไปด้วย
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generations = {}  # ชื่อตาราง -> เลขรุ่น
+
+    def current(self, table):
+        """เลขรุ่นปัจจุบันของตาราง (ใช้เป็นส่วนหนึ่งของ Cache key)"""
+        with self._lock:
+            return self._generations.get(table, 0)
+
+    def bump(self, table):
+        """เพิ่มเลขรุ่นหลังเขียนตาราง ทำให้ Cache เดิมของตารางนั้นไม่ถูกใช้อีก"""
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            return self._generations[table]
+
+
+class WriteAheadQueue:
+    """💥 [NEW] คิวเขียนล่วงหน้า (write-ahead) บนไฟล์ SQLite ในเครื่อง + Thread ส่งข้อมูลเบื้องหลัง
+
+    enqueue() บันทึก event ลงดิสก์ (commit แล้ว) และคืนทันที — ไม่รอฐานข้อมูลปลายทาง
+    Thread เบื้องหลังดึง event ที่ค้างตามลำดับ seq ทีละชุด แล้วส่งให้ apply_batch(events)
+    โดย events = [(seq, event_id, payload), ...] และต้องคืน list ผลลัพธ์ตามลำดับเดียวกัน:
+    None = สำเร็จ (หรือเคยสำเร็จแล้ว — ใช้ event_id เป็น idempotency key), ข้อความ = ล้มเหลวถาวร (ย้ายไป failed_events)
+    ถ้า apply_batch โยน Exception (เช่น ฐานข้อมูลล่ม) ทั้งชุดยังค้างอยู่และลองใหม่หลัง retry_seconds (เพิ่มขึ้นเรื่อย ๆ)
+    Error ของไฟล์คิวเอง (อ่าน/บันทึกผลไม่ได้) ถูก log แล้วลองใหม่แบบเดียวกัน — Thread ไม่หยุดจนกว่าจะ close()
+    """
+
+    def __init__(self, path, apply_batch, batch_size=100, retry_seconds=2.0, max_retry_seconds=60.0):
+        self.path = path
+        self._apply_batch = apply_batch
+        self._batch_size = batch_size
+        self._retry_seconds = retry_seconds
+        self._max_retry_seconds = max_retry_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL") # event ที่ enqueue แล้วต้องไม่หายแม้ไฟดับ
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS pending_events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT
+            );
+            CREATE TABLE IF NOT EXISTS failed_events (
+                seq INTEGER PRIMARY KEY,
+                event_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                failed_at REAL NOT NULL,
+                error TEXT
+            );
+        """)
+        self.last_error = None # ข้อความ Error ล่าสุดของการส่ง (None = ส่งได้ปกติ)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="write-ahead-flusher", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, payload):
+        """บันทึก event (dict ที่แปลงเป็น JSON ได้) คืน (seq, event_id)"""
+        event_id = uuid.uuid4().hex
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO pending_events (event_id, payload, created_at) VALUES (?, ?, ?)",
+                (event_id, json.dumps(payload), _time.time()),
+            )
+        self._wake.set()
+        return cursor.lastrowid, event_id
+
+    def pending_count(self):
+        """จำนวน event ที่ยังไม่ได้ส่ง"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pending_events").fetchone()[0]
+
+    def failed_count(self):
+        """จำนวน event ที่ส่งไม่สำเร็จถาวร (ต้องตรวจสอบเอง)"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM failed_events").fetchone()[0]
+
+    def flush(self, timeout=None):
+        """ปลุก Thread ให้ส่งทันที แล้วรอจนคิวว่าง (หรือครบ timeout วินาที) คืน True ถ้าคิวว่าง"""
+        deadline = None if timeout is None else _time.monotonic() + timeout
+        while self.pending_count():
+            if deadline is not None and _time.monotonic() >= deadline:
+                return False
+            self._wake.set()
+            _time.sleep(0.05)
+        return True
+
+    def close(self):
+        """หยุด Thread (event ที่ค้างยังอยู่ในไฟล์ ส่งต่อเมื่อเปิดคิวใหม่)"""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._db.close()
+
+    # --- ภายใน ---
+
+    def _next_batch(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, event_id, payload FROM pending_events ORDER BY seq LIMIT ?", (self._batch_size,)
+            ).fetchall()
+        return [(seq, event_id, json.loads(payload)) for seq, event_id, payload in rows]
+
+    def _finish(self, events, outcomes):
+        now = _time.time()
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            for (seq, event_id, payload), error in zip(events, outcomes):
+                if error is not None:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO failed_events (seq, event_id, payload, created_at, failed_at, error) "
+                        "SELECT seq, event_id, payload, created_at, ?, ? FROM pending_events WHERE seq = ?",
+                        (now, str(error), seq),
+                    )
+                self._db.execute("DELETE FROM pending_events WHERE seq = ?", (seq,))
+
+    def _record_attempt(self, events, error):
+        with self._lock:
+            self._db.executemany(
+                "UPDATE pending_events SET attempts = attempts + 1, last_error = ? WHERE seq = ?",
+                [(str(error), seq) for seq, _, _ in events],
+            )
+
+    def _run(self):
+        delay = self._retry_seconds
+        while not self._stop.is_set():
+            try:
+                events = self._next_batch()
+                if not events:
+                    self._wake.wait(self._retry_seconds) # ตรวจซ้ำเป็นระยะ (Process อื่นอาจเขียนคิวไฟล์เดียวกัน)
+                    self._wake.clear()
+                    continue
+                try:
+                    outcomes = self._apply_batch(events)
+                except Exception as e:
+                    # ปลายทางใช้ไม่ได้: event ยังค้างในคิว (ลำดับเดิม) รอส่งใหม่
+                    self.last_error = str(e)
+                    self._record_attempt(events, e)
+                    self._stop.wait(delay) # enqueue ระหว่างนี้ไม่เร่งการลองใหม่
+                    delay = min(delay * 2, self._max_retry_seconds)
+                    continue
+                self._finish(events, outcomes)
+            except Exception as e:
+                # ไฟล์คิวในเครื่องใช้ไม่ได้ชั่วคราว (ดิสก์เต็ม, ล็อกค้าง ฯลฯ): ถ้า _finish ล้มเหลวหลังส่งแล้ว
+                # ชุดนั้นยังค้างและถูกส่งซ้ำรอบถัดไป (ปลายทางข้ามด้วย event_id)
+                logger.exception("write-ahead queue %s: local queue error, retrying in %.1fs", self.path, delay)
+                self.last_error = str(e)
+                self._stop.wait(delay)
+                delay = min(delay * 2, self._max_retry_seconds)
+                continue
+            self.last_error = None
+            delay = self._retry_seconds
+
+
+class WriteCoalescer:
+    """💥 [NEW] รวมการเขียนที่เข้ามาพร้อมกันจากหลาย Session เป็นชุดเดียว (1 Transaction ต่อชุด)
+
+    submit(op) คืน concurrent.futures.Future ทันที Thread เบื้องหลังรอ window_seconds หลังรายการแรกของชุด
+    แล้วส่งรายการที่ค้างทั้งหมด (สูงสุด max_batch) ให้ flush_batch(ops) ซึ่งต้องคืน list ผลลัพธ์ตามลำดับ ops
+    ถ้า flush_batch โยน Exception (ทั้งชุดต้องไม่ถูก commit) จะส่งใหม่ทีละรายการ: รายการที่ผิดได้ Exception ของตัวเอง
+    รายการอื่นยังสำเร็จได้ — ยกเว้น split_on_error(e) คืน False (เช่น ฐานข้อมูลล่ม) ทุก Future ในชุดได้ Exception นั้นเลย
+    ทุก Future ได้ผลเสมอ (flush_batch คืนผลไม่ครบ = รายการที่เหลือได้ RuntimeError)
+    """
+
+    def __init__(self, flush_batch, window_seconds=0.02, max_batch=500, split_on_error=None):
+        self._flush_batch = flush_batch
+        self._split_on_error = split_on_error
+        self._window_seconds = window_seconds
+        self._max_batch = max_batch
+        self._cond = threading.Condition()
+        self._pending = []   # [(op, Future), ...] ตามลำดับที่ submit
+        self.batches = 0     # จำนวนครั้งที่เรียก flush_batch (= จำนวน Transaction)
+        self.ops = 0         # จำนวนรายการที่ส่งแล้ว
+        self._thread = threading.Thread(target=self._run, name="write-coalescer", daemon=True)
+        self._thread.start()
+
+    def submit(self, op):
+        """เพิ่มรายการเข้าชุดถัดไป คืน Future ของผลลัพธ์"""
+        future = Future()
+        with self._cond:
+            self._pending.append((op, future))
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            _time.sleep(self._window_seconds) # รอรายการอื่นที่กำลังตามมา
+            with self._cond:
+                batch, self._pending = self._pending[:self._max_batch], self._pending[self._max_batch:]
+            try:
+                self._deliver(batch)
+            except Exception as e: # ไม่ควรเกิด: ไม่ให้ Thread ตายและไม่ให้ Future ค้าง
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self.ops += len(batch)
+
+    def _deliver(self, batch):
+        """ส่ง [(op, Future), ...] ผ่าน flush_batch แล้วตั้งผลให้ทุก Future"""
+        self.batches += 1
+        try:
+            results = list(self._flush_batch([op for op, _ in batch]))
+        except Exception as e:
+            if len(batch) == 1 or (self._split_on_error is not None and not self._split_on_error(e)):
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+            # รายการเดียวที่ผิดทำให้ทั้งชุด rollback: ส่งใหม่ทีละรายการ ให้รายการอื่นสำเร็จได้
+            for item in batch:
+                self._deliver([item])
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+        for _, future in batch[len(results):]:
+            future.set_exception(RuntimeError(f"flush_batch returned {len(results)} results for {len(batch)} ops"))
+
+
+class KeyedExecutor:
+    """💥 [NEW] Thread pool ที่งานของ key เดียวกัน (เช่น Employee_ID) รันทีละงานตามลำดับที่ submit
+
+    งานต่าง key รันพร้อมกันได้สูงสุด max_workers งาน — key ที่มีงานค้างหลายงานใช้ Thread ครั้งละ 1 ตัว
+    และส่งงานถัดไปกลับเข้า Pool หลังงานก่อนหน้าเสร็จ (ไม่ยึด Thread ไว้จนงานของ key นั้นหมด)
+    """
+
+    def __init__(self, max_workers, thread_name_prefix=""):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self._lanes = {} # key -> deque ของงานที่รองานก่อนหน้า (มี key = มีงานของ key นั้นกำลังรัน)
+
+    def submit(self, key, fn, *args, **kwargs):
+        """ส่ง fn(*args, **kwargs) ต่อท้ายงานของ key คืน concurrent.futures.Future ของผลลัพธ์"""
+        task = (Future(), fn, args, kwargs)
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is not None:
+                lane.append(task)
+                return task[0]
+            self._lanes[key] = deque()
+        self._pool.submit(self._run, key, task)
+        return task[0]
+
+    def _run(self, key, task):
+        future, fn, args, kwargs = task
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            with self._lock:
+                lane = self._lanes[key]
+                next_task = lane.popleft() if lane else None
+                if next_task is None:
+                    del self._lanes[key]
+            if next_task is not None:
+                self._pool.submit(self._run, key, next_task)